@@ -0,0 +1,209 @@
+"""Generator of synthetic VL logs used to benchmark formatting.
+
+Logs are deterministic for a given seed, so benchmarks of the same size and seed format the
+same logs. Each log contains nested suite, test case and step headers, a mix of log types,
+API requests and responses and tracebacks following errors, using either the standard or
+the AT2 timestamp format.
+
+.. code-block:: bash
+
+    python -m benchmarks.loggen bench.log --size 100MB
+    python -m benchmarks.loggen bench_at2.log --size 1GB --at2 --seed 7
+"""
+
+import argparse
+import json
+import random
+import re
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+BORDER_LEN = 105
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+# Relative weights of the logs generated within each step
+DEFAULT_MIX = OrderedDict([
+    ("DEBUG", 30),
+    ("INFO", 30),
+    ("NOTICE", 4),
+    ("WARNING", 4),
+    ("ERROR", 2),
+    ("CRITICAL", 0),
+    ("API", 30),  # An API request followed by its response
+])
+
+API_METHODS = [
+    ("GetAsyncResult", lambda r: {"asyncHandle": r.randint(1, 500)},
+     lambda r: {"status": r.choice(["running", "complete"])}),
+    ("CreateVolume", lambda r: {"name": "vol%d" % r.randint(1, 9999), "totalSize": 1073741824,
+                                "accountID": r.randint(1, 20), "enable512e": True},
+     lambda r: {"volumeID": r.randint(1, 9999), "volume": {"status": "active", "access":
+                                                           "readWrite", "qos": {"minIOPS": 50}}}),
+    ("ListVolumes", lambda r: {"startVolumeID": 0, "limit": 100},
+     lambda r: {"volumes": [{"volumeID": i, "name": "vol%d" % i, "totalSize": 1073741824}
+                            for i in range(r.randint(1, 8))]}),
+    ("GetClusterInfo", lambda r: {},
+     lambda r: {"clusterInfo": {"name": "cluster1", "mvip": "10.1.1.1", "svip": "10.1.2.1",
+                                "ensemble": ["10.1.3.%d" % i for i in range(1, 4)]}}),
+    ("DeleteVolume", lambda r: {"volumeID": r.randint(1, 9999)}, None),
+]
+
+EXCEPTIONS = [
+    ("ApiCallMethodException", "DoesNotExist. JSON response: {u'id': %d}"),
+    ("AssertionError", "Expected %d volumes"),
+    ("TimeoutError", "Timed out after %d seconds"),
+]
+
+MESSAGES = ["Waiting for sync to complete", "Checking the volume status", "Verifying results",
+            "Connecting to node %d", "Retrying request, attempt %d", "Created volume vol%d",
+            "Collected %d metrics", "Cleaning up test resources"]
+
+
+def parse_size(size):
+    """Return the number of bytes of a size such as ``512KB``, ``10MB`` or ``2GB``."""
+    m = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*$", str(size).upper())
+    if not m:
+        raise ValueError("Invalid size: {}".format(size))
+    return int(float(m.group(1)) * SIZE_UNITS[m.group(2)])
+
+
+class LogGenerator(object):
+    """Deterministic generator of the lines of a synthetic VL log."""
+
+    def __init__(self, seed=0, at2=False, mix=None, test_cases_per_suite=20,
+                 steps_per_test_case=4, logs_per_step=100, traceback_frames=4):
+        """Initializes ``LogGenerator``
+
+        :param int seed: Seed of the random choices, the same seed generates the same log.
+        :param bool at2: Use the AT2 format, which has a millisecond timestamp and no thread.
+        :param dict mix: Relative weights of each log type, ``API`` being a request and response.
+        :param int logs_per_step: Average number of logs within each step.
+        """
+        self._random = random.Random(seed)
+        self._at2 = at2
+        mix = mix or DEFAULT_MIX
+        self._log_types = list(mix.keys())
+        self._weights = [mix[log_type] for log_type in self._log_types]
+        self._test_cases_per_suite = test_cases_per_suite
+        self._steps_per_test_case = steps_per_test_case
+        self._logs_per_step = logs_per_step
+        self._traceback_frames = traceback_frames
+        self._time = datetime(2017, 10, 30, 19, 13, 0)
+        self._api_id = 0
+
+    def lines(self):
+        """Generate log lines indefinitely, one suite after another."""
+        suite_num = 0
+        while True:
+            suite_num += 1
+            for line in self._suite("TsBenchmark%d" % suite_num):
+                yield line
+
+    def write(self, filepath, size):
+        """Write a log of at least ``size`` bytes, ending after the step in progress.
+
+        :param str filepath: Filepath of the log.
+        :param int size: Number of bytes of the log.
+        :returns: Number of lines written.
+        """
+        written = 0
+        count = 0
+        with open(filepath, "w") as f:
+            for line in self.lines():
+                if written >= size and line.startswith("-" * BORDER_LEN):
+                    break
+                f.write(line)
+                written += len(line)
+                count += 1
+            for line in self._header("=", ["Final Report"]):
+                f.write(line)
+                count += 1
+            f.write(self._std_log("INFO", "report:1", "Done"))
+        return count + 1
+
+    def _suite(self, name):
+        for line in self._header("=", ["Test Suite: Starting Setup of %s" % name]):
+            yield line
+        yield self._std_log("INFO", "suite.setup:10", "Setting up %s" % name)
+        for tc_num in range(self._test_cases_per_suite):
+            tc_name = "TcBenchmark%d" % tc_num
+            for line in self._header("=", ["Test Case %d: Starting Test of %s" % (tc_num, tc_name)]):
+                yield line
+            yield self._std_log("INFO", "tc:10", "Starting %s" % tc_name)
+            for step_num in range(1, self._steps_per_test_case + 1):
+                for line in self._step(tc_name, step_num):
+                    yield line
+
+    def _step(self, tc_name, step_num):
+        for line in self._header("-", ["Starting Step %d for %s: Run step %d." % (
+                step_num, tc_name, step_num), "Expect: Step %d passes." % step_num]):
+            yield line
+        count = self._random.randint(self._logs_per_step // 2, self._logs_per_step * 3 // 2)
+        for log_type in self._random.choices(self._log_types, self._weights, k=count):
+            if log_type == "API":
+                for line in self._api_call():
+                    yield line
+                continue
+            message = self._random.choice(MESSAGES)
+            if "%d" in message:
+                message = message % self._random.randint(1, 100)
+            yield self._std_log(log_type, "tc:%d" % self._random.randint(10, 999), message)
+            if log_type in ("ERROR", "CRITICAL"):
+                for line in self._traceback():
+                    yield line
+
+    def _header(self, border, lines):
+        yield border * BORDER_LEN + "\n"
+        for line in lines:
+            yield line + "\n"
+        yield border * BORDER_LEN + "\n"
+
+    def _std_log(self, log_type, source, details):
+        self._time += timedelta(microseconds=self._random.randint(1000, 500000))
+        if self._at2:
+            timestamp = self._time.strftime("%Y-%m-%d %H:%M:%S,") + \
+                "%03d" % (self._time.microsecond // 1000)
+            return "%s %s [%s] %s\n" % (timestamp, log_type, source, details)
+        timestamp = self._time.strftime("%Y-%m-%d %H:%M:%S.%f")
+        return "%s %s [%s] [MainProcess:MainThread] %s\n" % (timestamp, log_type, source, details)
+
+    def _api_call(self):
+        method, params, result = self._random.choice(API_METHODS)
+        self._api_id += 1
+        request = json.dumps(OrderedDict([("params", params(self._random)), ("method", method),
+                                          ("id", self._api_id)]))
+        yield self._std_log("DEBUG", "res.core:636",
+                            "Sending HTTP POST request to server_url: "
+                            "https://10.1.1.1:443/json-rpc/10.0; %s." % request)
+        if result is None:
+            payload = OrderedDict([("id", self._api_id), ("error", OrderedDict([
+                ("name", "xUnknownError"), ("code", 500)]))])
+        else:
+            payload = OrderedDict([("id", self._api_id), ("result", result(self._random))])
+        yield self._std_log("DEBUG", "res.core:640",
+                            "JSON-RPC-POST response: %s" % json.dumps(payload))
+
+    def _traceback(self):
+        yield "Traceback (most recent call last):\n"
+        for i in range(self._random.randint(1, self._traceback_frames)):
+            yield '  File "/home/testing/module%d.py", line %d, in function%d\n' % (
+                i, self._random.randint(1, 2000), i)
+            yield "    call_function%d(arg)\n" % i
+        exception, description = self._random.choice(EXCEPTIONS)
+        yield "%s: %s\n" % (exception, description % self._random.randint(1, 100))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic VL log for benchmarks.")
+    parser.add_argument("output", help="Filepath of the generated log")
+    parser.add_argument("--size", default="10MB", help="Size of the log, such as 512KB or 2GB "
+                                                       "(default: 10MB)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the log (default: 0)")
+    parser.add_argument("--at2", action="store_true", help="Use the AT2 log format")
+    args = parser.parse_args()
+    count = LogGenerator(seed=args.seed, at2=args.at2).write(args.output, parse_size(args.size))
+    print("Wrote {} lines to {}".format(count, args.output))
+
+
+if __name__ == '__main__':
+    main()
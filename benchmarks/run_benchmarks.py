@@ -0,0 +1,264 @@
+"""Throughput benchmarks of formatting VL logs with ``LollygagLogger`` and ``VFormatter``.
+
+Each mode formats a generated log the way the matching vlogger option does, in a separate
+process so its peak RSS is its own. The lines/s, MB/s, peak RSS and time to the first output
+line of each mode can be stored as a JSON baseline and compared against later runs.
+
+.. code-block:: bash
+
+    python -m benchmarks.run_benchmarks --size 50MB --save baseline.json
+    python -m benchmarks.run_benchmarks --size 50MB --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+from benchmarks.loggen import LogGenerator, parse_size
+
+# vlogger options matching each mode
+MODES = OrderedDict([
+    ("default", ""),
+    ("unformatted", "(use_unformatted in .vlogger.ini)"),
+    ("api", "-a"),
+    ("testcase", "-t 1"),
+    ("save", "-s"),
+    ("summary", "--summary-only"),
+])
+
+# Results where a higher value is better, the others being better when lower
+THROUGHPUT_FIELDS = ["lines_per_s", "mb_per_s"]
+COMPARED_FIELDS = ["lines_per_s", "mb_per_s", "peak_rss_mb", "first_line_s"]
+
+
+def run_mode(mode, log_file, work_dir):
+    """Format the log file in the mode and return the results.
+
+    Must be run in a new process, as the configuration is set at the class level and the
+    peak RSS is that of the whole process.
+
+    :param str mode: Key of ``MODES``.
+    :param str log_file: Filepath of the log.
+    :param str work_dir: Directory of the default config file and any output files.
+    :rtype: OrderedDict
+    """
+    import resource
+    from bin.lollygag_logger import LollygagLogger
+    from bin.vconfiginterface import VConfigInterface
+    from bin.vformatter import VFormatter
+    from bin.vmodes import SummaryFormatter
+    from bin.vutils import is_at2_formatting
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    start = time.time()
+    first_line = []
+
+    config = VConfigInterface(file_directory=work_dir)
+    config.use_console_width(False)
+    log_lines = None
+    if mode == "unformatted":
+        config.use_unformatted()
+    elif mode == "testcase":
+        config.use_unformatted()
+        log_lines = VFormatter(config).extract_logs(log_file, tc_num=1)
+        config.load_config_file()
+    if is_at2_formatting(log_file):
+        config.at2_format()
+    if mode == "api":
+        config.format_api()
+    elif mode == "save":
+        with open(log_file) as f:
+            word_count = sum(1 for _ in f)
+        config.save_file(os.path.join(work_dir, "fmt_benchmark.log"), word_count)
+    elif mode == "summary":
+        config.display_summary()
+
+    formatter_class = SummaryFormatter if mode == "summary" else VFormatter
+
+    class _TimedFormatter(formatter_class):
+        def _write_output(self, output):
+            if not first_line:
+                first_line.append(time.time())
+            super(_TimedFormatter, self)._write_output(output)
+
+    formatter = _TimedFormatter(config)
+    try:
+        if log_lines is not None:
+            LollygagLogger(log_lines, formatter).run()
+        else:
+            with open(log_file) as f:
+                LollygagLogger(f, formatter).run()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    elapsed = time.time() - start
+
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss /= 1024.0 ** 2 if sys.platform == "darwin" else 1024.0
+    size_mb = os.path.getsize(log_file) / 1024.0 ** 2
+    # Both rates are of the whole log, as some modes only format part of it
+    line_count = count_lines(log_file)
+    return OrderedDict([
+        ("lines", line_count),
+        ("seconds", round(elapsed, 3)),
+        ("lines_per_s", round(line_count / elapsed, 1)),
+        ("mb_per_s", round(size_mb / elapsed, 3)),
+        ("peak_rss_mb", round(peak_rss, 1)),
+        ("first_line_s", round(first_line[0] - start, 4) if first_line else None),
+    ])
+
+
+def count_lines(filepath):
+    """Return the number of lines of the file."""
+    count = 0
+    last = b"\n"
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            count += chunk.count(b"\n")
+            last = chunk[-1:]
+    return count + (last != b"\n")
+
+
+def run_benchmarks(log_file, modes=None, repeat=1, progress=None):
+    """Return the results of each mode, each run in a new process.
+
+    The best of ``repeat`` runs of each mode is kept, as slower runs are due to other load.
+
+    :param str log_file: Filepath of the log.
+    :param list(str) modes: Keys of ``MODES`` to run, all by default.
+    :rtype: OrderedDict
+    """
+    results = OrderedDict()
+    for mode in modes or MODES:
+        for _ in range(repeat):
+            if progress:
+                progress(mode)
+            result = _run_child(mode, log_file)
+            if mode not in results or result["seconds"] < results[mode]["seconds"]:
+                results[mode] = result
+    return results
+
+
+def _run_child(mode, log_file):
+    work_dir = tempfile.mkdtemp(prefix="vlogger_bench_")
+    try:
+        env = dict(os.environ)
+        env.pop("COLUMNS", None)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output(
+            [sys.executable, "-m", "benchmarks.run_benchmarks", "--child", mode, log_file,
+             work_dir], cwd=root, env=env, stdin=subprocess.DEVNULL, universal_newlines=True)
+        return json.loads(output, object_pairs_hook=OrderedDict)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def compare(baseline, results, tolerance=0.1):
+    """Return a report comparing the results to the baseline, and the regressions found.
+
+    A regression is a result worse than the baseline by more than ``tolerance``, a fraction.
+
+    :rtype: (str, list(str))
+    """
+    output = ["{:<12} {:<13} {:>12} {:>12} {:>8}".format(
+        "mode", "result", "baseline", "current", "change")]
+    regressions = []
+    for mode, result in results.items():
+        base = baseline["results"].get(mode)
+        if not base:
+            continue
+        for field in COMPARED_FIELDS:
+            if not base.get(field) or result.get(field) is None:
+                continue
+            change = (result[field] - base[field]) / float(base[field])
+            worse = -change if field in THROUGHPUT_FIELDS else change
+            flag = ""
+            if worse > tolerance:
+                flag = "  REGRESSION"
+                regressions.append("{} {}".format(mode, field))
+            output.append("{:<12} {:<13} {:>12} {:>12} {:>+7.1%}{}".format(
+                mode, field, base[field], result[field], change, flag))
+    return "\n".join(output), regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark formatting generated VL logs.")
+    parser.add_argument("--log", help="Log to format instead of generating one")
+    parser.add_argument("--size", default="10MB", help="Size of the generated log (default: 10MB)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated log")
+    parser.add_argument("--at2", action="store_true", help="Generate an AT2 formatted log")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), help="Modes to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of each mode, keeping the best")
+    parser.add_argument("--save", metavar="FILE", help="Store the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="Compare the results to a JSON baseline "
+                                                          "and exit with 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Fraction a result may be worse than the baseline (default: 0.1)")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "LOG", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(*args.child)))
+        return
+
+    tmp_dir = None
+    log_file = args.log
+    log_info = OrderedDict([("log", args.log)])
+    if not log_file:
+        tmp_dir = tempfile.mkdtemp(prefix="vlogger_bench_")
+        log_file = os.path.join(tmp_dir, "benchmark.log")
+        print("Generating {} log...".format(args.size))
+        LogGenerator(seed=args.seed, at2=args.at2).write(log_file, parse_size(args.size))
+        log_info = OrderedDict([("size", args.size), ("seed", args.seed), ("at2", args.at2)])
+    log_info["bytes"] = os.path.getsize(log_file)
+
+    try:
+        results = run_benchmarks(log_file, args.modes, args.repeat,
+                                 progress=lambda mode: print("Running {}...".format(mode)))
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir)
+
+    print("\n{:<12} {:>9} {:>12} {:>8} {:>10} {:>12}".format(
+        "mode", "seconds", "lines/s", "MB/s", "RSS (MB)", "first line"))
+    for mode, result in results.items():
+        print("{:<12} {:>9} {:>12} {:>8} {:>10} {:>12}".format(
+            mode, result["seconds"], result["lines_per_s"], result["mb_per_s"],
+            result["peak_rss_mb"], result["first_line_s"]))
+
+    report = OrderedDict([
+        ("log", log_info),
+        ("python", platform.python_version()),
+        ("platform", platform.platform()),
+        ("date", time.strftime("%Y-%m-%dT%H:%M:%S")),
+        ("results", results),
+    ])
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print("\nSaved baseline to {}".format(args.save))
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f, object_pairs_hook=OrderedDict)
+        if baseline["log"] != log_info:
+            print("\nWarning: the baseline was run with a different log: {}".format(
+                json.dumps(baseline["log"])))
+        comparison, regressions = compare(baseline, results, args.tolerance)
+        print("\n" + comparison)
+        if regressions:
+            print("\n{} regressions: {}".format(len(regressions), ", ".join(regressions)))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Soak test checking that formatting very long logs runs with flat memory.
+
+The generated log lines are streamed straight to ``LollygagLogger``, so logs much larger than
+the disk can be formatted, with the summary enabled as it is the output holding the most
+state. The RSS is sampled as the log is formatted and the run fails if it grows by more than
+the allowed amount after the first sample.
+
+.. code-block:: bash
+
+    python -m benchmarks.soak --size 50GB --sample-every 1GB
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.loggen import BORDER_LEN, LogGenerator, parse_size
+
+
+def current_rss_mb():
+    """Return the current resident set size of the process in MB.
+
+    Falls back to the peak RSS where /proc isn't available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024.0 ** 2
+    except (IOError, OSError, ValueError):
+        from bin.vprofile import peak_rss_mb
+        return peak_rss_mb()
+
+
+class _SampledLines(object):
+    """Lines of a generated log of at least ``size`` bytes, sampling the RSS as they are read."""
+
+    def __init__(self, generator, size, sample_every, sample):
+        self._generator = generator
+        self._size = size
+        self._sample_every = sample_every
+        self._sample = sample
+        self.bytes_read = 0
+
+    def __iter__(self):
+        next_sample = self._sample_every
+        for line in self._generator.lines():
+            if self.bytes_read >= self._size and line.startswith("-" * BORDER_LEN):
+                return
+            self.bytes_read += len(line)
+            if self.bytes_read >= next_sample:
+                self._sample(self.bytes_read)
+                next_sample += self._sample_every
+            yield line
+
+
+def soak(size, sample_every, at2=False, seed=0, progress=None):
+    """Format a generated log of ``size`` bytes and return the RSS samples.
+
+    :param int size: Number of bytes of the log.
+    :param int sample_every: Number of bytes formatted between RSS samples.
+    :returns: List of (bytes formatted, RSS in MB) tuples.
+    """
+    from bin.lollygag_logger import LollygagLogger
+    from bin.vconfiginterface import VConfigInterface
+    from bin.vformatter import VFormatter
+
+    samples = []
+
+    def sample(bytes_read):
+        samples.append((bytes_read, current_rss_mb()))
+        if progress:
+            progress(*samples[-1])
+
+    work_dir = tempfile.mkdtemp(prefix="vlogger_soak_")
+    config = VConfigInterface(file_directory=work_dir)
+    config.use_console_width(False)
+    config.display_summary()
+    if at2:
+        config.at2_format()
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        lines = _SampledLines(LogGenerator(seed=seed, at2=at2), size, sample_every, sample)
+        LollygagLogger(lines, VFormatter(config)).run()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+        os.remove(config.config_path)
+        os.rmdir(work_dir)
+    sample(lines.bytes_read)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check formatting a long log runs with flat RSS.")
+    parser.add_argument("--size", default="1GB", help="Size of the generated log (default: 1GB)")
+    parser.add_argument("--sample-every", default="100MB",
+                        help="Size formatted between RSS samples (default: 100MB)")
+    parser.add_argument("--max-growth", type=float, default=20.0,
+                        help="MB the RSS may grow after the first sample (default: 20)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated log")
+    parser.add_argument("--at2", action="store_true", help="Generate an AT2 formatted log")
+    args = parser.parse_args()
+
+    start = time.time()
+    samples = soak(parse_size(args.size), parse_size(args.sample_every), args.at2, args.seed,
+                   progress=lambda bytes_read, rss: sys.stderr.write(
+                       "{:>10.1f} MB formatted, RSS {:.1f} MB\n".format(bytes_read / 1024.0 ** 2,
+                                                                          rss)))
+    growth = samples[-1][1] - samples[0][1]
+    print("Formatted {:.1f} MB in {:.0f} s, RSS grew by {:.1f} MB".format(
+        samples[-1][0] / 1024.0 ** 2, time.time() - start, growth))
+    if growth > args.max_growth:
+        print("RSS grew by more than {} MB".format(args.max_growth))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-from queue import Queue
+from queue import Full, Queue
 import abc
 from threading import Thread
 
@@ -15,9 +15,12 @@ class LollygagLogger(object):
     LogFormatter used.
     """
 
-    def __init__(self, stream_handle, log_formatter):
+    def __init__(self, stream_handle, log_formatter, max_queued_lines=10000):
         """Stores the components necessary for the run function.
 
+        The read thread waits once ``max_queued_lines`` lines are queued, so a stream read
+        faster than it is formatted isn't held in memory. 0 means no limit.
+
         :ivar stream_handle: an iterable that iterates line by line
         :ivar LogFormatter log_formatter: an instance extended from
             LogFormatter that formats the passed LogLine.
@@ -31,13 +34,15 @@ class LollygagLogger(object):
 
         self.stream_handle = stream_handle
         self.log_formatter = log_formatter
-        self.queue = Queue()
+        self.queue = Queue(maxsize=max_queued_lines)
         self.read_complete = False
         self.kill_logging = False
+        self._format_thread = None
 
     def run(self):
         """Executes the read and format threads concurrently."""
-        threads = [Thread(target=self.read), Thread(target=self.format)]
+        self._format_thread = Thread(target=self.format)
+        threads = [Thread(target=self.read), self._format_thread]
         for thread in threads:
             thread.start()
         for thread in threads:
@@ -48,12 +53,23 @@ class LollygagLogger(object):
         """Continuously reads logs line by line from the stream_handle and
         stores them as LogLine objects to the queue."""
         for unformatted_log_line in self.stream_handle:
-            self.queue.put(unformatted_log_line, block=True)
+            self._put(unformatted_log_line)
             if self.kill_logging:
                 exit(0)
         else:
             # Send signal through the queue indicating stream completion
-            self.queue.put(COMPLETED_SIGNAL)
+            self._put(COMPLETED_SIGNAL)
+
+    def _put(self, item):
+        """Queue the item, waiting while the queue is full unless formatting has stopped."""
+        while True:
+            try:
+                self.queue.put(item, block=True, timeout=0.1)
+                return
+            except Full:
+                if self.kill_logging or (self._format_thread is not None
+                                         and not self._format_thread.is_alive()):
+                    exit(0)
 
     def format(self):
         """Continuously looks for LogLine objects within the queue and then
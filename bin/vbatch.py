@@ -0,0 +1,213 @@
+"""Module containing the processing of many log files in parallel."""
+
+import multiprocessing
+import os
+from collections import OrderedDict, namedtuple
+
+from anytree import Node, RenderTree
+
+from bin.vformatter import VFormatter
+from bin.vutils import OUTPUT_PREFIX, find_logs, is_at2_formatting
+
+BatchResult = namedtuple("BatchResult", ["output", "records", "error"])
+
+_config = None  # Configuration of the worker process
+
+
+def map_logs(func, filepaths, processes=None, initializer=None, initargs=()):
+    """Generate the results of calling the function on each log file, using a process pool.
+
+    Each worker process has its own copy of the class level configuration, so the function
+    must only depend on its argument and any state set by the initializer. Results are
+    generated in the order they complete, as ``(filepath, result)``.
+    Log files are processed in the current process if there is only one of them, or if
+    ``processes`` is 1.
+
+    :param func: Picklable function called with the filepath of each log file.
+    :param list(str) filepaths: Filepaths of the log files.
+    :param int processes: Number of worker processes, the number of CPUs by default.
+    :param initializer: Picklable function called with ``initargs`` when each worker starts.
+    """
+    filepaths = list(filepaths)
+    if processes == 1 or len(filepaths) <= 1:
+        if initializer:
+            initializer(*initargs)
+        for filepath in filepaths:
+            yield filepath, func(filepath)
+        return
+
+    pool = multiprocessing.Pool(processes, initializer, initargs)
+    try:
+        for result in pool.imap_unordered(_Call(func), filepaths):
+            yield result
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+class _Call(object):
+    """Picklable wrapper returning the filepath along with the result of the function."""
+
+    def __init__(self, func):
+        self._func = func
+
+    def __call__(self, filepath):
+        return filepath, self._func(filepath)
+
+
+class FileFormatter(VFormatter):
+    """Formatter writing the formatted logs to an open file instead of printing them."""
+
+    def __init__(self, config_interface, stream):
+        """Initializes ``FileFormatter``
+
+        :param stream: Text stream the formatted logs are written to.
+        """
+        super(FileFormatter, self).__init__(config_interface)
+        self._stream = stream
+
+    def _write_output(self, output):
+        self._stream.write(str(output) + "\n")
+
+
+def init_worker(options):
+    """Load the configuration of the worker process from the config file and the options.
+
+    :param dict options: ``format_api``, ``api_methods`` and ``api_exclude`` options of vlogger.
+    """
+    from bin.vconfiginterface import VConfigInterface
+    global _config
+    _config = VConfigInterface()
+    # Header statuses and runtimes are needed for the roll-up summary
+    _config.display_summary()
+    if options.get("format_api") or options.get("api_methods") or options.get("api_exclude"):
+        _config.format_api()
+        _config.filter_api_methods(include=options.get("api_methods"),
+                                   exclude=options.get("api_exclude"))
+
+
+def format_log(log_file):
+    """Format the log file to a file next to it, prefixed with ``OUTPUT_PREFIX``.
+
+    Errors are returned rather than raised so a single log can't stop the batch.
+
+    :rtype: BatchResult
+    """
+    output = os.path.join(os.path.dirname(log_file), OUTPUT_PREFIX + os.path.basename(log_file))
+    try:
+        _config.at2_format(bool(is_at2_formatting(log_file)))
+        with open(log_file) as f, open(output, "w") as out:
+            formatter = FileFormatter(_config, out)
+            for line in f:
+                formatter.send(formatter.format(line))
+            formatter.complete()
+        return BatchResult(output, formatter.summary_records(), None)
+    except Exception as e:
+        return BatchResult(output, [], "{}: {}".format(type(e).__name__, e))
+
+
+def batch_logs(log_dir):
+    """Return the filepaths of the log files within the directory, excluding formatted logs."""
+    return list(find_logs(log_dir))
+
+
+class BatchSummary(object):
+    """Roll-up of the header summaries of many log files.
+
+    Headers with the same ids in each log, such as the same test case run every night, are
+    merged into a single tree along with the number of logs they passed and failed in, and
+    their average and max runtimes.
+    """
+
+    def __init__(self, title="Batch Summary", unit="logs"):
+        """
+        :param str unit: What the log files are, such as ``suites``.
+        """
+        self._title = title
+        self._unit = unit
+        self._root = Node(_MergedHeader(title))
+        self._nodes = {(): self._root}
+        self._logs = OrderedDict()  # log name -> root record or error
+
+    def add(self, log_name, result):
+        """Add the ``BatchResult`` of a log file."""
+        if result.error:
+            self._logs[log_name] = result.error
+            return
+        for record in result.records:
+            path = tuple(record["path"])
+            if path not in self._nodes:
+                parent = self._nodes[path[:-1]]
+                self._nodes[path] = Node(_MergedHeader(path[-1]), parent=parent)
+            self._nodes[path].name.add(log_name, record)
+        self._logs[log_name] = result.records[0]
+
+    def generate_summary(self):
+        """Return a string containing the status of each log and the merged header tree."""
+        statuses = OrderedDict()
+        log_lines = []
+        for log_name in sorted(self._logs):
+            record = self._logs[log_name]
+            if not isinstance(record, dict):
+                status = "Error"
+                log_lines.append("  {}: Error: {}".format(log_name, record))
+            else:
+                status = record["status"]
+                runtime = " in {}".format(record["runtime"]) if record["runtime"] else ""
+                log_lines.append("  {}: {}{}".format(log_name, status, runtime))
+            statuses[status] = statuses.get(status, 0) + 1
+
+        output = [self._title]
+        output.append("  {} {}: {}".format(len(self._logs), self._unit, ", ".join(
+            "{} {}".format(count, status) for status, count in statuses.items())))
+        output.extend(log_lines)
+        output.append("_" * 75)
+
+        for pre, fill, node in RenderTree(self._root):
+            if node is self._root:
+                continue
+            header = node.name
+            output.append("%s%s" % (pre, header.name))
+            output.append("%s  Status: %s" % (fill, header.status_counts()))
+            if header.runtimes:
+                output.append("%s  Runtime: avg %s, max %s" % (
+                    fill, header.average_runtime(), max(header.runtimes)))
+            if header.failed_logs:
+                output.append("%s  Failed in: %s" % (fill, ", ".join(header.failed_logs)))
+            for exception, count in header.exceptions.items():
+                output.append("%s   %dx %s" % (fill, count, exception))
+            output.append("%s%s" % (fill, "_" * (75 - len(fill))))
+        return "\n".join(output)
+
+
+class _MergedHeader(object):
+    """Status counts and runtimes of a header merged across log files."""
+
+    def __init__(self, name):
+        self.name = name
+        self.statuses = OrderedDict()
+        self.runtimes = []
+        self.failed_logs = []
+        self.exceptions = OrderedDict()
+
+    def add(self, log_name, record):
+        status = record["status"]
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if record["runtime"] is not None:
+            self.runtimes.append(record["runtime"])
+        if status == "Failed":
+            self.failed_logs.append(log_name)
+        for exception in record["exceptions"]:
+            self.exceptions[exception] = self.exceptions.get(exception, 0) + 1
+
+    def status_counts(self):
+        return ", ".join("{} {}".format(count, status) for status, count in self.statuses.items())
+
+    def average_runtime(self):
+        total = self.runtimes[0]
+        for runtime in self.runtimes[1:]:
+            total += runtime
+        return total / len(self.runtimes)
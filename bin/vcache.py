@@ -0,0 +1,482 @@
+"""Module containing caches of log files: files extracted from them and AT2 step logs."""
+
+import contextlib
+import errno
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
+TEMP_SUFFIX = ".tmp"
+
+
+@contextlib.contextmanager
+def locked(directory):
+    """Context manager holding an exclusive lock of the directory.
+
+    Processes sharing a cache directory hold its lock while reading and writing its manifest,
+    so their changes aren't lost. The directory isn't locked where ``fcntl`` isn't available.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # Releases the lock
+
+
+def make_temp_path(directory, name):
+    """Return a new temporary filepath in the directory, named after the file and process.
+
+    The id of the process is part of the name, so ``remove_stale_temp_files`` can tell the
+    temporary files of a killed process from those still being written.
+    """
+    fd, temp_path = tempfile.mkstemp(prefix=".%s.%d." % (name, os.getpid()),
+                                     suffix=TEMP_SUFFIX, dir=directory)
+    os.close(fd)
+    return temp_path
+
+
+def remove_stale_temp_files(directory):
+    """Remove the temporary files in the directory left by processes no longer running."""
+    for name in os.listdir(directory):
+        if not name.startswith(".") or not name.endswith(TEMP_SUFFIX):
+            continue
+        try:
+            pid = int(name.rsplit(".", 3)[1])
+        except (IndexError, ValueError):
+            pid = None
+        if pid is None or not _process_exists(pid):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def _process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Such as a process of another user
+    return True
+
+
+class ExtractionCache(object):
+    """Cache of files extracted from source log files, such as the test case logs in tc_logs.
+
+    Extracted files are written to a temporary file and renamed into place once complete, so
+    an interrupted extraction never leaves a truncated file behind.
+    A manifest stored in the cache directory records the fingerprint of the source each file
+    was extracted from, in least recently used order. A cached file is only used if it was
+    extracted from the same source and the source hasn't changed since.
+    When the total size of the cached files exceeds ``max_size``, the least recently used files
+    are removed. The manifest is locked while it's changed, so processes can extract to the
+    same directory at once, and temporary files left by killed processes are removed when the
+    cache is opened.
+    """
+
+    MANIFEST = ".manifest.json"
+    SAMPLE_SIZE = 65536  # Bytes hashed from the start, middle and end of the source
+
+    def __init__(self, cache_dir, max_size=0):
+        """Initialize the cache. The cache directory is created once a file is written to it.
+
+        :param str cache_dir: Directory where the extracted files are stored.
+        :param int max_size: Max total size in bytes of the cached files. 0 means no limit.
+        """
+        self._cache_dir = cache_dir
+        self._max_size = max_size
+        self._manifest_path = os.path.join(cache_dir, self.MANIFEST)
+        self._fingerprints = {}
+        self._entries = self._load_manifest()
+        if os.path.isdir(cache_dir):
+            remove_stale_temp_files(cache_dir)
+
+    def path(self, filename):
+        """Return the filepath of the cached file."""
+        return os.path.join(self._cache_dir, filename)
+
+    def lookup(self, filename, source):
+        """Return the filepath of the cached file if it's valid for the source, otherwise None.
+
+        :param str filename: Name of the extracted file.
+        :param str source: Filepath of the file the extracted file was parsed from.
+        """
+        if not os.path.isdir(self._cache_dir):
+            return None
+        filepath = self.path(filename)
+        with locked(self._cache_dir):
+            self._entries = self._load_manifest()
+            entry = self._entries.get(filename)
+            if entry is None or not os.path.exists(filepath) \
+                    or entry.get("source") != os.path.abspath(source) \
+                    or entry.get("fingerprint") != self.fingerprint(source):
+                return None
+            self._entries.move_to_end(filename)
+            self._save_manifest()
+        return filepath
+
+    def temp_path(self, filename):
+        """Return a new temporary filepath in the cache directory for writing the file to."""
+        if not os.path.exists(self._cache_dir):
+            os.makedirs(self._cache_dir)
+        return make_temp_path(self._cache_dir, filename)
+
+    def commit(self, filename, source, temp_path):
+        """Atomically move the completed temporary file into place and record it.
+
+        :param str filename: Name of the extracted file.
+        :param str source: Filepath of the file the extracted file was parsed from.
+        :param str temp_path: Filepath of the completed temporary file.
+        :returns: Filepath of the cached file.
+        """
+        filepath = self.path(filename)
+        with locked(self._cache_dir):
+            self._entries = self._load_manifest()
+            os.replace(temp_path, filepath)
+            self._entries.pop(filename, None)
+            self._entries[filename] = {
+                "source": os.path.abspath(source),
+                "fingerprint": self.fingerprint(source),
+                "size": os.path.getsize(filepath),
+            }
+            self._evict(keep=filename)
+            self._save_manifest()
+        return filepath
+
+    @contextlib.contextmanager
+    def writer(self, filename, source):
+        """Context manager yielding a file to write the extracted logs to.
+
+        The file is committed to the cache if the block completes, otherwise it's discarded.
+
+        Example::
+
+            with cache.writer("TcExample.log", "~/logs/test.log") as f:
+                f.write(line)
+        """
+        temp_path = self.temp_path(filename)
+        try:
+            with open(temp_path, "w") as f:
+                yield f
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.commit(filename, source, temp_path)
+
+    def fingerprint(self, source):
+        """Return the size, mtime and sampled hash identifying the contents of the source."""
+        stat = os.stat(source)
+        key = (os.path.abspath(source), stat.st_size, stat.st_mtime)
+        if key not in self._fingerprints:
+            sha = hashlib.sha1()
+            with open(source, "rb") as f:
+                for offset in (0, stat.st_size // 2, stat.st_size - self.SAMPLE_SIZE):
+                    f.seek(max(offset, 0))
+                    sha.update(f.read(self.SAMPLE_SIZE))
+            self._fingerprints[key] = [stat.st_size, stat.st_mtime, sha.hexdigest()]
+        return self._fingerprints[key]
+
+    @property
+    def total_size(self):
+        """Return the total size in bytes of the cached files."""
+        return sum(entry["size"] for entry in self._entries.values())
+
+    def _evict(self, keep=None):
+        """Remove the least recently used files until the total size is within the max size."""
+        if self._max_size <= 0:
+            return
+        total_size = self.total_size
+        for filename, entry in list(self._entries.items()):
+            if total_size <= self._max_size:
+                break
+            if filename == keep:
+                continue
+            try:
+                os.remove(self.path(filename))
+            except OSError:
+                pass
+            del self._entries[filename]
+            total_size -= entry["size"]
+
+    def _load_manifest(self):
+        """Return the manifest entries, dropping entries whose files no longer exist."""
+        try:
+            with open(self._manifest_path) as f:
+                entries = json.load(f, object_pairs_hook=OrderedDict)
+        except (IOError, OSError, ValueError):
+            return OrderedDict()
+        return OrderedDict((filename, entry) for filename, entry in entries.items()
+                           if os.path.exists(self.path(filename)))
+
+    def _save_manifest(self):
+        """Atomically write the manifest."""
+        temp_path = self.temp_path(self.MANIFEST)
+        with open(temp_path, "w") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(temp_path, self._manifest_path)
+
+
+class AT2LogCache(object):
+    """Cache of the logs of AT2 task instance steps, so a step viewed again is read locally.
+
+    Logs are stored once by the SHA-256 hash of their contents in ``objects/``, and each step
+    is a hard link to its log in a directory of its own in ``steps/``, where the formatted,
+    split and test case logs of the step are written next to it. An index records the hash
+    of each step in least recently used order, along with the hit and miss counts.
+    The logs of a step don't change once it has run, so a cached step is never fetched again
+    unless refreshed. When the total size of the stored logs exceeds ``max_size``, the log of
+    the least recently used steps is removed, along with the stored log once no other step
+    uses it. The outputs written next to an evicted log are kept.
+    The index is locked while it's changed, so several runs can share the cache, and files
+    left by killed runs are removed when the cache is opened.
+    """
+
+    INDEX = "index.json"
+    CHUNK_SIZE = 1024 * 1024
+    # Errors of os.link where the file system doesn't support hard links, so logs are copied
+    NO_LINK_ERRNOS = (errno.EPERM, errno.EXDEV, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP)
+
+    def __init__(self, cache_dir, max_size=0):
+        """Initialize the cache. The cache directory is created once a log is stored in it.
+
+        :param str cache_dir: Directory where the logs are stored.
+        :param int max_size: Max total size in bytes of the stored logs. 0 means no limit.
+        """
+        self._cache_dir = cache_dir
+        self._max_size = max_size
+        self._index_path = os.path.join(cache_dir, self.INDEX)
+        self._steps, self.stats = self._load_index()
+        if os.path.isdir(cache_dir):
+            self._remove_stale_files()
+
+    def path(self, step_id):
+        """Return the filepath of the log of the step."""
+        step_id = str(step_id)
+        return os.path.join(self._cache_dir, "steps", step_id, step_id + ".log")
+
+    def object_path(self, digest):
+        """Return the filepath of the log with the SHA-256 hex digest."""
+        return os.path.join(self._cache_dir, "objects", digest + ".log")
+
+    def lookup(self, step_id):
+        """Return the filepath of the cached log of the step if any, otherwise None."""
+        step_id = str(step_id)
+        entry = self._steps.get(step_id)
+        filepath = self.path(step_id)
+        try:
+            if entry is None or os.path.getsize(filepath) != entry["size"]:
+                return None
+        except OSError:
+            return None
+        return filepath
+
+    def get(self, step_id, fetch, refresh=False):
+        """Return the filepath of the log of the step, fetching it if it isn't cached.
+
+        :param str step_id: AT2 task instance step ID.
+        :param fetch: Function writing the log of a step ID to a filepath, such as an
+            ``HttpFetcher``. Only called on a miss.
+        :param bool refresh: Fetch the log even if it's cached.
+        """
+        step_id = str(step_id)
+        with self._locked():
+            self._steps, self.stats = self._load_index()
+            filepath = None if refresh else self.lookup(step_id)
+            if filepath:
+                self.stats["hits"] += 1
+                self._steps.move_to_end(step_id)
+            else:
+                self.stats["misses"] += 1
+            self._save_index()
+        if filepath:
+            return filepath
+
+        # Fetch without holding the lock, so other runs aren't blocked meanwhile
+        temp_path = self._temp_path()
+        try:
+            fetch(step_id, temp_path)
+            digest, size = self.digest(temp_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        with self._locked():
+            self._steps, self.stats = self._load_index()
+            object_path = self.object_path(digest)
+            if os.path.exists(object_path):
+                os.remove(temp_path)  # Same log as a step already cached
+            else:
+                os.replace(temp_path, object_path)
+            self.stats["bytes_fetched"] += size
+
+            filepath = self.path(step_id)
+            if not os.path.exists(os.path.dirname(filepath)):
+                os.makedirs(os.path.dirname(filepath))
+            link_path = filepath + TEMP_SUFFIX
+            if os.path.lexists(link_path):
+                os.remove(link_path)  # Left by a killed run
+            try:
+                os.link(object_path, link_path)
+            except OSError as e:
+                if e.errno not in self.NO_LINK_ERRNOS:
+                    raise
+                shutil.copyfile(object_path, link_path)  # Hard links aren't supported
+            os.replace(link_path, filepath)
+
+            previous = self._steps.pop(step_id, None)
+            self._steps[step_id] = {"hash": digest, "size": size}
+            if previous and previous["hash"] != digest:
+                self._remove_unused_object(previous["hash"])
+            self._evict(keep=step_id)
+            self._save_index()
+        return filepath
+
+    def digest(self, filepath):
+        """Return the SHA-256 hex digest and size of the file."""
+        sha = hashlib.sha256()
+        size = 0
+        with open(filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                sha.update(chunk)
+                size += len(chunk)
+        return sha.hexdigest(), size
+
+    @property
+    def total_size(self):
+        """Return the total size in bytes of the stored logs, counting shared logs once."""
+        return sum(dict((entry["hash"], entry["size"]) for entry in self._steps.values())
+                   .values())
+
+    def generate_statistics(self):
+        """Return a string with the hit rate and size of the cache."""
+        hits, misses = self.stats["hits"], self.stats["misses"]
+        lookups = hits + misses
+        return "AT2 log cache: {} hits, {} misses ({:.1%} hit rate), {} steps, {:.1f} MB " \
+               "stored, {:.1f} MB fetched, {} evicted".format(
+                   hits, misses, hits / lookups if lookups else 0, len(self._steps),
+                   self.total_size / 1024.0 ** 2, self.stats["bytes_fetched"] / 1024.0 ** 2,
+                   self.stats["evictions"])
+
+    def _evict(self, keep=None):
+        """Remove the least recently used steps until the total size is within the max size."""
+        if self._max_size <= 0:
+            return
+        total_size = self.total_size
+        for step_id, entry in list(self._steps.items()):
+            if total_size <= self._max_size:
+                break
+            if step_id == keep:
+                continue
+            del self._steps[step_id]
+            self._remove_step_log(step_id)
+            self.stats["evictions"] += 1
+            if self._remove_unused_object(entry["hash"]):
+                total_size -= entry["size"]
+
+    def _remove_unused_object(self, digest):
+        """Remove the log with the digest if no step uses it, and return True if removed."""
+        if any(entry["hash"] == digest for entry in self._steps.values()):
+            return False
+        try:
+            os.remove(self.object_path(digest))
+        except OSError:
+            pass
+        return True
+
+    def _remove_step_log(self, step_id):
+        """Remove the log of the step, and its directory unless outputs were written to it."""
+        filepath = self.path(step_id)
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
+        try:
+            os.rmdir(os.path.dirname(filepath))
+        except OSError:  # Holds the formatted, split or test case logs of the step
+            pass
+
+    def _remove_stale_files(self):
+        """Remove the temporary files of killed runs, and the logs no step uses."""
+        objects_dir = os.path.dirname(self.object_path(""))
+        with self._locked():
+            self._steps, self.stats = self._load_index()
+            remove_stale_temp_files(self._cache_dir)
+            if not os.path.isdir(objects_dir):
+                return
+            remove_stale_temp_files(objects_dir)
+            digests = set(entry["hash"] for entry in self._steps.values())
+            for name in os.listdir(objects_dir):
+                if not name.startswith(".") and os.path.splitext(name)[0] not in digests:
+                    os.remove(os.path.join(objects_dir, name))
+
+    def _locked(self):
+        """Return a context manager holding the lock of the cache directory."""
+        if not os.path.exists(self._cache_dir):
+            os.makedirs(self._cache_dir)
+        return locked(self._cache_dir)
+
+    def _temp_path(self):
+        """Return a new temporary filepath in the objects directory."""
+        objects_dir = os.path.dirname(self.object_path(""))
+        if not os.path.exists(objects_dir):
+            os.makedirs(objects_dir)
+        return make_temp_path(objects_dir, "fetch")
+
+    def _load_index(self):
+        """Return the steps and stats of the index, dropping steps whose logs no longer exist."""
+        stats = OrderedDict([("hits", 0), ("misses", 0), ("bytes_fetched", 0), ("evictions", 0)])
+        try:
+            with open(self._index_path) as f:
+                index = json.load(f, object_pairs_hook=OrderedDict)
+        except (IOError, OSError, ValueError):
+            return OrderedDict(), stats
+        stats.update(index.get("stats", {}))
+        steps = OrderedDict((step_id, entry) for step_id, entry in index.get("steps", {}).items()
+                            if os.path.exists(self.object_path(entry["hash"])))
+        return steps, stats
+
+    def _save_index(self):
+        """Atomically write the index."""
+        if not os.path.exists(self._cache_dir):
+            os.makedirs(self._cache_dir)
+        temp_path = make_temp_path(self._cache_dir, self.INDEX)
+        with open(temp_path, "w") as f:
+            json.dump(OrderedDict([("stats", self.stats), ("steps", self._steps)]), f, indent=2)
+        os.replace(temp_path, self._index_path)
+
+
+class HttpFetcher(object):
+    """Fetches the log of an AT2 step over HTTP, for use with ``AT2LogCache``.
+
+    .. code-block:: python
+
+        fetch = HttpFetcher("https://at2.example.com/api/steps/{step_id}/log")
+        logfile = AT2LogCache(cache_dir).get("123456", fetch)
+    """
+
+    def __init__(self, url, headers=None, timeout=60):
+        """
+        :param str url: URL of the log of a step, with ``{step_id}`` replaced by the step ID.
+        :param dict headers: Headers of each request, such as an Authorization header.
+        :param float timeout: Seconds to wait for the server before failing.
+        """
+        self._url = url
+        self._headers = headers or {}
+        self._timeout = timeout
+
+    def __call__(self, step_id, filepath):
+        """Stream the log of the step to the filepath."""
+        from urllib.request import Request, urlopen
+        request = Request(self._url.format(step_id=step_id), headers=self._headers)
+        with urlopen(request, timeout=self._timeout) as response, open(filepath, "wb") as f:
+            shutil.copyfileobj(response, f, AT2LogCache.CHUNK_SIZE)
@@ -0,0 +1,149 @@
+"""Module containing the capture of the output of live runs, such as ``vl run``."""
+
+import codecs
+import errno
+import os
+import subprocess
+import sys
+
+CHUNK_SIZE = 65536
+VL_RUN_COMMAND = ["vl", "run"]
+
+
+def decode_lines(chunks, encoding="utf-8", errors="replace"):
+    """Generate the lines of text of the chunks of bytes read from a stream.
+
+    Chunks are decoded incrementally, so characters split across chunks are decoded whole.
+    Lines end with ``\\n`` like the lines of a file, ``\\r\\n`` being replaced by ``\\n``, and the
+    last line doesn't if the stream didn't end with one.
+
+    :param chunks: Iterable of ``bytes`` of any size.
+    :param str errors: How undecodable bytes are handled, see ``codecs``.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    pending = ""
+    for chunk in chunks:
+        text = pending + decoder.decode(chunk)
+        lines = text.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield (line[:-1] if line.endswith("\r") else line) + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def read_chunks(fd, chunk_size=CHUNK_SIZE):
+    """Generate the chunks read from the file descriptor until the end of the stream.
+
+    Each chunk is whatever was available, up to ``chunk_size`` bytes, so lines aren't delayed
+    until a full buffer is read. The EIO raised by a pty once the child exits ends the stream.
+    """
+    while True:
+        try:
+            chunk = os.read(fd, chunk_size)
+        except OSError as e:
+            if e.errno == errno.EIO:
+                return
+            raise
+        if not chunk:
+            return
+        yield chunk
+
+
+class PtyCapture(object):
+    """Runs a command under a pseudo-terminal and iterates over the lines of its output.
+
+    Run through a pipe, the output of a Python command is block buffered and arrives in bursts
+    of several KB. Under a pseudo-terminal the command sees a terminal and flushes each line,
+    so lines are formatted as soon as they are written. The command is in the same process
+    group, so Ctrl-C stops it like it would if it was run directly.
+
+    .. code-block:: python
+
+        with PtyCapture(["vl", "run", "TsSuite"]) as capture:
+            LollygagLogger(capture, VFormatter(config)).run()
+        print(capture.returncode)
+    """
+
+    def __init__(self, argv, cwd=None, env=None, chunk_size=CHUNK_SIZE, encoding="utf-8",
+                 errors="replace"):
+        """
+        :param list(str) argv: Command and its arguments.
+        :param str errors: How undecodable output is handled, see ``codecs``.
+        """
+        import pty
+        self._chunk_size = chunk_size
+        self._encoding = encoding
+        self._errors = errors
+
+        self._master, slave = pty.openpty()
+        try:
+            _configure_pty(slave)
+            self._process = subprocess.Popen(argv, cwd=cwd, env=env, stdout=slave,
+                                             stderr=slave, close_fds=True)
+        except Exception:
+            os.close(self._master)
+            raise
+        finally:
+            os.close(slave)  # Only the child holds the slave, so its exit ends the stream
+
+    def __iter__(self):
+        for line in decode_lines(read_chunks(self._master, self._chunk_size),
+                                 self._encoding, self._errors):
+            yield line
+        self.close()  # Once the output ends, rather than when the iteration is stopped early
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.terminate()
+        self.close()
+
+    @property
+    def pid(self):
+        return self._process.pid
+
+    @property
+    def returncode(self):
+        return self._process.returncode
+
+    def terminate(self):
+        if self._process.poll() is None:
+            self._process.terminate()
+
+    def close(self):
+        """Close the pty and wait for the command to exit."""
+        if self._master is not None:
+            os.close(self._master)
+            self._master = None
+        return self._process.wait()
+
+
+def _configure_pty(fd):
+    """Keep newlines as written, and use the size of the terminal vlogger runs in if any."""
+    import fcntl
+    import termios
+    attrs = termios.tcgetattr(fd)
+    attrs[1] &= ~termios.ONLCR  # Output flags, don't translate \n to \r\n
+    termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    try:
+        size = fcntl.ioctl(sys.stdout.fileno(), termios.TIOCGWINSZ, b"\0" * 8)
+        fcntl.ioctl(fd, termios.TIOCSWINSZ, size)
+    except (AttributeError, ValueError, OSError):
+        pass
+
+
+def capture_vl_run(suite, backend="pty"):
+    """Return the lines of the output of ``vl run`` of the suite.
+
+    :param str backend: ``pty`` to run it under a pseudo-terminal, or ``pipe`` to run it through
+        the vl_run plugin. The pipe is used where ptys aren't available.
+    """
+    if backend == "pty" and os.name == "posix":
+        return PtyCapture(VL_RUN_COMMAND + [suite])
+    from plugins import vl_run
+    process = vl_run.execute_local_run(suite)
+    return decode_lines(read_chunks(process.stdout.fileno()))
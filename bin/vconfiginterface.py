@@ -1,5 +1,4 @@
 import os
-import re
 from collections import OrderedDict
 
 import configparser
@@ -7,9 +6,9 @@ import configparser
 from bin import vformatter
 from bin import vlogfield
 from bin import vlogline
+from bin import vutils
 from bin.vutils import VLogStdFields
 from bin.vutils import VLogType
-from bin.vutils import VPatterns
 
 DEFAULT_CONFIG_DIR = os.path.expanduser("~")
 FORMAT_CONFIG_FILE_NAME = ".vlogger.ini"
@@ -127,6 +126,13 @@ class VConfigInterface:
                 ("condense_line", "True"),
                 ("shorten_fields", "30"),
                 ("display_summary", "True"),
+                ("api_cache_size", "1024"),  # Max number of formatted API payloads to reuse
+                ("tc_logs_max_size", "1024"),  # Max MB of parsed test case logs kept per dir
+                ("max_stored_logs", "10000"),  # Max lines of a header or traceback stored
+                ("max_summary_headers", "1000"),  # Max summary headers kept in memory
+                ("max_header_errors", "100"),  # Max errors listed for each summary header
+                ("at2_cache_size", "2048"),  # Max MB of AT2 step logs kept in save_dir/at2_logs
+                ("at2_log_url", ""),  # URL of the log of an AT2 step, with {step_id}
                 ("use_console_len", "True"),  # Use console width for max log line length
             ("max_line_len", "200")]  # Max length to be printed if console width is not selected
 
@@ -134,7 +140,7 @@ class VConfigInterface:
                 self._format_config.add_section(section)
                 for option in options:
                     self._format_config.set(section, option[0], option[1])
-            with open(self._config_path, "wb") as configfile:
+            with open(self._config_path, "w") as configfile:
                 self._format_config.write(configfile)
 
     def load_config_file(self, file_directory=""):
@@ -144,6 +150,18 @@ class VConfigInterface:
         self._load_config_file_fields()
         self._load_config_file_general()
 
+    def reload_config_file(self):
+        """Load the config file again if it changed since last loaded, returning True if so."""
+        try:
+            mod_time = os.path.getmtime(self._config_path)
+        except OSError:
+            return False
+        if mod_time == self._config_ini_mod_time:
+            return False
+        self.load_config_file(self._file_directory)
+        return True
+
+
     def use_default(self):
         """Use the default settings as described below.
 
@@ -232,18 +250,24 @@ class VConfigInterface:
 
     def is_at2_formatting(self, filepath):
         """Determines if the logs are using the AT2 format."""
-        with open(filepath, 'r') as f:
-            for line in f:
-                if re.match(VPatterns.get_std(), line):
-                   if re.search(VPatterns.get_at2_time(), line):
-                       return True
-                   else:
-                       return False
+        return vutils.is_at2_formatting(filepath)
 
     def get_save_dir(self):
         """Return save directory from .ini file."""
         return self._format_config.get(GENERAL, "save_dir")
 
+    def get_at2_cache_size(self):
+        """Return the max total size in MB of the cached AT2 step logs, 0 for no limit."""
+        return self._format_config.getint(GENERAL, "at2_cache_size", fallback=2048)
+
+    def get_at2_log_url(self):
+        """Return the URL of the log of an AT2 step from the .ini file, empty if not set.
+
+        ``{step_id}`` in the URL is replaced by the step ID. If not set, logs are fetched
+        with the at2_task plugin.
+        """
+        return self._format_config.get(GENERAL, "at2_log_url", fallback="")
+
     def set_save_dir(self, filepath):
         """Store the Save directory path to the .ini file."""
         self._format_config.set(GENERAL, "save_dir", filepath)
@@ -316,6 +340,60 @@ class VConfigInterface:
     def display_summary(self, set=True):
         vformatter.VFormatter.display_summary(set)
 
+    def display_statistics(self, set=True):
+        """Append statistics describing the formatting run such as API cache hit rate."""
+        vformatter.VFormatter.display_statistics(set)
+
+    def filter_api_methods(self, include=None, exclude=None):
+        """Only display the API calls of the methods included and not excluded.
+
+        Filtered API calls are discarded before their payloads are parsed.
+
+        :param list(str) include: API methods to display. All are displayed if empty.
+        :param list(str) exclude: API methods to not display.
+        """
+        vformatter.VFormatter.filter_api_methods(include, exclude)
+
+    def api_statistics_file(self, filepath):
+        """Store the API call latency statistics as JSON in the given file.
+
+        API calls are only paired when they are formatted, see ``format_api()``.
+        """
+        vformatter.VFormatter.api_statistics_file(filepath)
+
+    def api_cache_size(self, size=1024):
+        """Set the max number of formatted API payloads reused for repeated API calls."""
+        vlogfield.Details.api_cache_size(size)
+
+    def tc_logs_max_size(self, size_mb=1024):
+        """Set the max total size in MB of parsed test case and step logs kept in tc_logs.
+
+        The least recently used logs are removed when exceeded. A size of 0 means no limit.
+        """
+        vformatter.VFormatter.tc_logs_max_size(size_mb * 1024 * 1024)
+
+    def max_stored_logs(self, count=10000):
+        """Set the max number of lines of a header or traceback stored until its last line.
+
+        A traceback never reaching its exception line is printed unclassified once exceeded.
+        A count of 0 means no limit.
+        """
+        vformatter.VFormatter.max_stored_logs(count)
+
+    def max_summary_headers(self, count=1000):
+        """Set the max number of summary headers kept in memory, 0 for no limit.
+
+        The summaries of completed headers are stored in temporary files once exceeded.
+        """
+        vformatter.VFormatter.max_summary_headers(count)
+
+    def max_header_errors(self, count=100):
+        """Set the max number of errors listed for each summary header, 0 for no limit.
+
+        Later errors are only counted in the summary.
+        """
+        vlogline.Header.max_errors(count)
+
     def at2_format(self, set=True):
         vlogline.Base.at2_format(set)
         vlogfield.Datetime.at2_format(set)
@@ -391,5 +469,14 @@ class VConfigInterface:
         self.condense_line(general_dict["condense_line"])
         self.shorten_fields(int(self._format_config.get(GENERAL, "shorten_fields")))
         self.display_summary(general_dict["display_summary"])
+        self.api_cache_size(self._format_config.getint(GENERAL, "api_cache_size", fallback=1024))
+        self.tc_logs_max_size(
+            self._format_config.getint(GENERAL, "tc_logs_max_size", fallback=1024))
+        self.max_stored_logs(
+            self._format_config.getint(GENERAL, "max_stored_logs", fallback=10000))
+        self.max_summary_headers(
+            self._format_config.getint(GENERAL, "max_summary_headers", fallback=1000))
+        self.max_header_errors(
+            self._format_config.getint(GENERAL, "max_header_errors", fallback=100))
         self.use_console_width(general_dict["use_console_len"])
         self.max_line_len(int(self._format_config.get(GENERAL, "max_line_len")))
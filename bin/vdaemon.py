@@ -0,0 +1,189 @@
+"""Module containing the warm daemon that formats logs for clients over a Unix socket.
+
+The daemon imports every module, loads the configuration and formats sample logs once, then
+forks a process for each request, so each request starts with warm imports, compiled patterns
+and caches without paying for them. State changed by a request, such as the class level
+configuration, is discarded along with its process.
+
+Protocol: the client sends a JSON object on a single line containing the command line
+arguments ``argv``, its working directory ``cwd`` and terminal width ``columns``. The daemon
+replies with frames of a 1 byte type and a 4 byte big endian length followed by the payload:
+``o`` for stdout, ``e`` for stderr and finally ``x`` containing the exit status.
+"""
+
+import io
+import json
+import os
+import signal
+import socketserver
+import struct
+import sys
+import traceback
+
+DEFAULT_SOCKET = os.path.join(os.path.expanduser("~"), ".vlogger.sock")
+
+FRAME_HEADER = struct.Struct(">cI")
+STDOUT = b"o"
+STDERR = b"e"
+EXIT = b"x"
+
+WARMUP_LINES = [
+    "=" * 105 + "\n",
+    "=Test Suite: Starting Setup of TsWarmup=\n",
+    "=" * 105 + "\n",
+    "2017-10-30 19:13:00.000000 INFO [tc:1] [MainProcess:MainThread] Warmup\n",
+    "2017-10-30 19:13:00.100000 DEBUG [res.core:636] [MainProcess:MainThread] Sending HTTP "
+    "POST request to server_url: https://10.0.0.1/json-rpc/9.0; "
+    "{\"method\": \"GetClusterInfo\", \"params\": {}, \"id\": 1}.\n",
+    "2017-10-30 19:13:00.200000 DEBUG [res.core:636] [MainProcess:MainThread] JSON-RPC-POST "
+    "response: {\"id\": 1, \"result\": {}}\n",
+    "2017-10-30 19:13:00.300000 ERROR [tc:2] [MainProcess:MainThread] Warmup failed\n",
+    "Traceback (most recent call last):\n",
+    "  File \"/home/warmup.py\", line 1, in warmup\n",
+    "    warmup()\n",
+    "ValueError: Warmup\n",
+]
+
+
+def send_frame(sock, frame_type, payload):
+    sock.sendall(FRAME_HEADER.pack(frame_type, len(payload)) + payload)
+
+
+def recv_frame(rfile):
+    """Return the type and payload of the next frame read from the file, None at EOF."""
+    header = rfile.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    frame_type, length = FRAME_HEADER.unpack(header)
+    return frame_type, rfile.read(length)
+
+
+class FrameWriter(io.TextIOBase):
+    """Text stream sending the text written to it as frames of the given type."""
+
+    BUFFER_SIZE = 65536
+
+    def __init__(self, sock, frame_type):
+        self._sock = sock
+        self._frame_type = frame_type
+        self._buffer = []
+        self._buffered = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.BUFFER_SIZE:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            data = "".join(self._buffer).encode("utf-8", "replace")
+            self._buffer = []
+            self._buffered = 0
+            send_frame(self._sock, self._frame_type, data)
+
+    def isatty(self):
+        return False
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        request = json.loads(self.rfile.readline().decode("utf-8"))
+        stdout = FrameWriter(self.request, STDOUT)
+        stderr = FrameWriter(self.request, STDERR)
+        sys.stdout, sys.stderr = stdout, stderr
+        status = 0
+        try:
+            os.chdir(request["cwd"])
+            if request.get("columns"):
+                os.environ["COLUMNS"] = str(request["columns"])
+            self.server.main(request["argv"])
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                status = e.code
+            elif e.code is not None:
+                stderr.write("{}\n".format(e.code))
+                status = 1
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        try:
+            stdout.flush()
+            stderr.flush()
+            send_frame(self.request, EXIT, str(status).encode("ascii"))
+        except (IOError, OSError):
+            pass  # The client disconnected
+
+
+class _ForkingUnixServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    pass
+
+
+def warm_up(config_interface):
+    """Import the modules and fill the pattern and parse caches used when formatting."""
+    # Modules only imported by the features that use them, such as summaries and API calls
+    import anytree, colorama, hashlib, json, pprint  # noqa: F401
+    from bin import vcache, vexport, vmodes  # noqa: F401
+    from bin.vformatter import VFormatter
+
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        formatter = VFormatter(config_interface)
+        for line in WARMUP_LINES:
+            formatter.send(formatter.format(line))
+        formatter.complete()
+    finally:
+        sys.stdout = stdout
+
+
+def make_server(socket_path, main):
+    """Return the server listening on the Unix socket, only accessible by the current user.
+
+    :param str socket_path: Filepath of the Unix socket, replaced if it already exists.
+    :param main: Function called with the command line arguments of each request.
+    """
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    # The socket is created with the permissions of the umask, so it's never accessible by others
+    umask = os.umask(0o177)
+    try:
+        server = _ForkingUnixServer(socket_path, _RequestHandler)
+    finally:
+        os.umask(umask)
+    server.main = main
+    return server
+
+
+def serve(main, socket_path=DEFAULT_SOCKET, config_interface=None):
+    """Serve requests until interrupted, forking a process to run ``main`` for each request.
+
+    :param main: Function called with the command line arguments of each request, and the
+        ``config_interface`` keyword argument if a configuration is given.
+    :param str socket_path: Filepath of the Unix socket, replaced if it already exists.
+    :param config_interface: Configuration loaded once, used to warm up the formatter and
+        passed to ``main``. The configuration file is only loaded again once it changes.
+    """
+    if config_interface is not None:
+        warm_up(config_interface)
+        serve_main = main
+
+        def main(argv):
+            config_interface.reload_config_file()
+            return serve_main(argv, config_interface=config_interface)
+
+    server = make_server(socket_path, main)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print("vlogger daemon listening on {}".format(socket_path))
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
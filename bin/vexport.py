@@ -0,0 +1,272 @@
+"""Module containing formatters that export the parsed logs as records for other tools."""
+
+import abc
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+from bin import vlogline
+from bin.vformatter import VFormatter
+from bin.vmanagers import HeaderManager, LogManager
+from bin.vutils import VLogType
+
+
+class RecordFormatter(VFormatter):
+    """Base formatter that exports each classified log as a record of its parsed fields.
+
+    Records are ``dict`` objects created by the ``as_dict()`` method of the log line along with
+    a ``context`` entry identifying the enclosing headers, see
+    ``HeaderManager.current_context()``. Every log type is exported. Unclassified lines
+    such as blank lines are skipped.
+    Subclasses implement ``write_record()`` and optionally ``close()``.
+    """
+
+    SUMMARY = False
+    STORE_CONTEXT = True
+
+    def __init__(self, config_interface):
+        super(RecordFormatter, self).__init__(config_interface)
+        self._lm = LogManager(display_log_types=list(VLogType))
+        self.record_count = 0
+
+    def send(self, fmt_logs):
+        """Exports each of the classified logs passed.
+
+        :param list(``LogLine``|str|None) fmt_logs: The formatted log lines after ``format()``.
+        """
+        for log in fmt_logs:
+            if isinstance(log, vlogline.Base):
+                record = log.as_dict()
+                record["context"] = log.context
+                self.write_record(record)
+                self.record_count += 1
+
+    def complete(self):
+        """Exports the remaining logs and closes the output."""
+        self.send(self._lm.flush_logs())
+        self.close()
+
+        if self.API_STATS_FILE:
+            self._am.write_json(self.API_STATS_FILE)
+
+        if self.OUTPUT_FILE:
+            self._prog.progress(self._log_count, "Complete")
+            print("\nSave complete.")
+
+    @abc.abstractmethod
+    def write_record(self, record):
+        """Subclasses must export a single record.
+
+        :param dict record: Parsed fields of the log.
+        """
+        pass
+
+    def close(self):
+        """Complete exporting the records."""
+        pass
+
+
+class NdjsonFormatter(RecordFormatter):
+    """Exports each classified log as a JSON object on its own line (NDJSON).
+
+    Records are encoded and written to a buffered stream, which is the output file if one is
+    specified, otherwise stdout.
+
+    Example Output::
+
+        {"type":"INFO","timestamp":"2017-10-30T19:13:00.301000","source":{"module":"tc", ...
+    """
+
+    BUFFER_SIZE = 1 << 20
+
+    def __init__(self, config_interface, stream=None):
+        """Initializes ``NdjsonFormatter``
+
+        :param stream: Text stream written to instead of the output file or stdout.
+        """
+        super(NdjsonFormatter, self).__init__(config_interface)
+        self._owns_stream = False
+        if stream is not None:
+            self._stream = stream
+        elif self.OUTPUT_FILE:
+            self._stream = open(self.OUTPUT_FILE, "a", buffering=self.BUFFER_SIZE)
+            self._owns_stream = True
+        else:
+            self._stream = sys.stdout
+        self._encode = json.JSONEncoder(separators=(",", ":"), default=str).encode
+
+    def write_record(self, record):
+        self._stream.write(self._encode(record))
+        self._stream.write("\n")
+
+    def close(self):
+        if self._owns_stream:
+            self._stream.close()
+        else:
+            self._stream.flush()
+
+
+class SqliteFormatter(RecordFormatter):
+    """Ingests the parsed logs of a run into normalized tables of a SQLite database.
+
+    Each ingest is a row in ``runs``, and every other row is tagged with its ``run_id`` and
+    the path of its header node, such as ``TsSuite/TcTest/Step 1``. Headers are stored with
+    the times of the first and last logs within them so runs can be compared.
+
+    Rows are buffered and inserted with ``executemany`` in batches of ``BATCH_SIZE`` within a
+    single transaction, and indexes are built once the load completes.
+    """
+
+    BATCH_SIZE = 5000
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY, source TEXT, ingested_at TEXT, record_count INTEGER)""",
+        """CREATE TABLE IF NOT EXISTS headers (
+            run_id INTEGER, seq INTEGER, parent_seq INTEGER, path TEXT, type TEXT, name TEXT,
+            number INTEGER, description TEXT, start_time TEXT, end_time TEXT,
+            PRIMARY KEY (run_id, seq))""",
+        """CREATE TABLE IF NOT EXISTS logs (
+            run_id INTEGER, seq INTEGER, header_seq INTEGER, path TEXT, type TEXT,
+            timestamp TEXT, module TEXT, line INTEGER, process TEXT, thread TEXT, details TEXT,
+            PRIMARY KEY (run_id, seq))""",
+        """CREATE TABLE IF NOT EXISTS tracebacks (
+            run_id INTEGER, log_seq INTEGER, path TEXT, exception TEXT, description TEXT)""",
+        """CREATE TABLE IF NOT EXISTS traceback_frames (
+            run_id INTEGER, log_seq INTEGER, frame INTEGER, file TEXT, line INTEGER,
+            function TEXT, code TEXT)""",
+        """CREATE TABLE IF NOT EXISTS api_calls (
+            run_id INTEGER, log_seq INTEGER, path TEXT, call TEXT, api_id INTEGER,
+            method TEXT, url TEXT, response_type TEXT, payload TEXT)""",
+        """CREATE VIEW IF NOT EXISTS errors AS
+            SELECT * FROM logs WHERE type IN ('ERROR', 'CRITICAL')""",
+    ]
+    INDEXES = [
+        "CREATE INDEX IF NOT EXISTS logs_path ON logs (path, run_id)",
+        "CREATE INDEX IF NOT EXISTS logs_type ON logs (type, run_id)",
+        "CREATE INDEX IF NOT EXISTS headers_path ON headers (path, run_id)",
+        "CREATE INDEX IF NOT EXISTS tracebacks_exception ON tracebacks (exception, run_id)",
+        "CREATE INDEX IF NOT EXISTS api_calls_method ON api_calls (method, run_id)",
+    ]
+
+    def __init__(self, config_interface, db_path, source=""):
+        """Initializes ``SqliteFormatter`` and starts a new run in the database.
+
+        :param str db_path: Filepath of the SQLite database, created if it doesn't exist.
+        :param str source: Log source identifying the run.
+        """
+        super(SqliteFormatter, self).__init__(config_interface)
+        # Logs are formatted and completed in separate threads, but never concurrently
+        self._conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA synchronous = OFF")
+        for statement in self.SCHEMA:
+            self._conn.execute(statement)
+        self._conn.execute("BEGIN")
+        cursor = self._conn.execute(
+            "INSERT INTO runs (source, ingested_at) VALUES (?, ?)",
+            (os.path.abspath(source) if source else "", datetime.now().isoformat()))
+        self.run_id = cursor.lastrowid
+
+        self._rows = dict((table, []) for table in
+                          ["logs", "tracebacks", "traceback_frames", "api_calls"])
+        self._headers = []  # Header rows, stored once their times are known
+        self._header_seqs = {}  # Header path -> seq
+        self._context = None
+        self._path = ""
+        self._chain = []  # Seqs of the header of the current context and its ancestors
+
+    def write_record(self, record):
+        self._set_context(record["context"])
+        seq = self.record_count
+        log_type = record["type"]
+
+        if log_type.endswith("_H"):
+            self._add_header(record)
+            return
+
+        header_seq = self._chain[0] if self._chain else None
+        timestamp = record.get("timestamp")
+        if timestamp:
+            for ancestor in self._chain:
+                header = self._headers[ancestor]
+                if not header[8]:
+                    header[8] = timestamp
+                header[9] = timestamp
+
+        source = record.get("source") or {}
+        thread = record.get("thread") or {}
+        self._rows["logs"].append((
+            self.run_id, seq, header_seq, self._path, log_type, timestamp,
+            source.get("module"), source.get("line"), thread.get("process"),
+            thread.get("thread"), record.get("details", record.get("text"))))
+
+        tracebacks = record.get("tracebacks", [])
+        if log_type == "TRACEBACK":
+            tracebacks = [record]
+        for traceback in tracebacks:
+            self._add_traceback(seq, traceback)
+
+        api_call = record.get("api")
+        if api_call:
+            payload = api_call.get("params", api_call.get("result"))
+            self._rows["api_calls"].append((
+                self.run_id, seq, self._path, api_call["call"], api_call["id"],
+                api_call.get("method"), api_call.get("url"), api_call.get("response_type"),
+                json.dumps(payload, default=str)))
+
+        if len(self._rows["logs"]) >= self.BATCH_SIZE:
+            self._flush_rows()
+
+    def close(self):
+        """Insert the remaining rows, build the indexes and commit the run."""
+        self._flush_rows()
+        self._conn.executemany(
+            "INSERT INTO headers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._headers)
+        self._conn.execute("UPDATE runs SET record_count = ? WHERE id = ?",
+                           (self.record_count, self.run_id))
+        for statement in self.INDEXES:
+            self._conn.execute(statement)
+        self._conn.execute("COMMIT")
+        self._conn.close()
+
+    def _set_context(self, context):
+        """Update the header path and chain of header seqs when the context changes."""
+        if context is self._context:
+            return
+        self._context = context
+        self._path = HeaderManager.context_path(context)
+        self._chain = []
+        path = self._path
+        while path:
+            if path in self._header_seqs:
+                self._chain.append(self._header_seqs[path])
+            path = path.rpartition("/")[0]
+
+    def _add_header(self, record):
+        seq = len(self._headers)
+        self._header_seqs[self._path] = seq
+        parent_seq = self._chain[0] if self._chain else None
+        self._chain = [seq] + self._chain
+        name = record.get("name", record.get("test_case"))
+        description = record.get("description", record.get("action"))
+        self._headers.append([self.run_id, seq, parent_seq, self._path, record["type"], name,
+                              record.get("number"), description, None, None])
+
+    def _add_traceback(self, log_seq, traceback):
+        exception = traceback["exception"]
+        self._rows["tracebacks"].append((self.run_id, log_seq, self._path,
+                                         exception["type"], exception["description"]))
+        for i, frame in enumerate(traceback["frames"]):
+            self._rows["traceback_frames"].append((
+                self.run_id, log_seq, i, frame["file"], frame["line"], frame["function"],
+                frame["code"]))
+
+    def _flush_rows(self):
+        """Insert the buffered rows of each table."""
+        for table, rows in self._rows.items():
+            if rows:
+                placeholders = ", ".join("?" * len(rows[0]))
+                self._conn.executemany(
+                    "INSERT INTO {} VALUES ({})".format(table, placeholders), rows)
+                del rows[:]
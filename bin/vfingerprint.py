@@ -0,0 +1,251 @@
+"""Module containing the fingerprinting and clustering of tracebacks across log files.
+
+Tracebacks sharing a root cause are identified by a fingerprint of their exception type and the
+files and functions of their frames, so failures can be grouped across many runs.
+The clusters of each log file are built independently and merged, so log files can be
+processed in parallel with ``vbatch.map_logs``.
+"""
+
+import hashlib
+import os
+import re
+from collections import namedtuple
+
+from bin import vlogfield
+from bin import vlogline
+from bin.vformatter import VFormatter
+from bin.vmanagers import HeaderManager, LogManager
+from bin.vutils import VLogType
+from bin.vutils import is_at2_formatting
+
+ID_PATTERN = re.compile("0x[0-9a-fA-F]+|\d+")
+
+Location = namedtuple("Location", ["log_file", "context", "time", "description"])
+
+
+def normalize_frame(step):
+    """Return the file and function of a ``vlogfield.TracebackStep``, with ids in the file
+    path such as build or run numbers replaced by ``N``.
+    """
+    return ID_PATTERN.sub("N", step.file), step.function
+
+
+def fingerprint(traceback):
+    """Return the fingerprint identifying the root cause of a ``vlogline.Traceback``.
+
+    The fingerprint is a hash of the exception type and the normalized frames. Line numbers and
+    the exception description are ignored.
+    """
+    parts = [traceback.exception.exception]
+    for step in traceback.steps:
+        parts.extend(normalize_frame(step))
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _time_key(location):
+    """Sort key of locations by time, locations without a time last."""
+    return (location.time is None, location.time or 0, location.log_file)
+
+
+class ExceptionCluster(object):
+    """Tracebacks sharing a fingerprint along with where and when they occurred."""
+
+    MAX_EXAMPLES = 3
+
+    def __init__(self, key, exception, frames):
+        """Initialize an empty cluster.
+
+        :param str key: Fingerprint of the tracebacks.
+        :param str exception: Exception type of the tracebacks.
+        :param list(tuple) frames: Normalized file and function of each frame.
+        """
+        self.key = key
+        self.exception = exception
+        self.frames = frames
+        self.count = 0
+        self.log_files = set()
+        self.first_seen = None
+        self.last_seen = None
+        self.examples = []  # Earliest locations
+
+    def add(self, location):
+        """Add an occurrence of the traceback at the ``Location``."""
+        self.count += 1
+        self.log_files.add(location.log_file)
+        self._add_locations([location], [location])
+
+    def merge(self, other):
+        """Add the occurrences of another cluster with the same fingerprint."""
+        self.count += other.count
+        self.log_files.update(other.log_files)
+        seen = [loc for loc in (other.first_seen, other.last_seen) if loc]
+        self._add_locations(other.examples, seen)
+
+    def _add_locations(self, examples, seen):
+        self.examples = sorted(self.examples + list(examples),
+                               key=_time_key)[:self.MAX_EXAMPLES]
+        for location in seen:
+            if location.time is None:
+                continue
+            if self.first_seen is None or location.time < self.first_seen.time:
+                self.first_seen = location
+            if self.last_seen is None or location.time >= self.last_seen.time:
+                self.last_seen = location
+
+
+class ExceptionClusters(object):
+    """Mergeable aggregate of the tracebacks of one or more log files clustered by fingerprint."""
+
+    def __init__(self):
+        self._clusters = {}
+        self.log_count = 0  # Log files processed, including those without tracebacks
+
+    def __len__(self):
+        return len(self._clusters)
+
+    def __iter__(self):
+        """Iterate over the clusters from the most to least tracebacks."""
+        return iter(sorted(self._clusters.values(),
+                           key=lambda cluster: (-cluster.count, cluster.exception, cluster.key)))
+
+    @property
+    def traceback_count(self):
+        return sum(cluster.count for cluster in self._clusters.values())
+
+    def add(self, traceback, location):
+        """Add the ``vlogline.Traceback`` that occurred at the ``Location``."""
+        key = fingerprint(traceback)
+        if key not in self._clusters:
+            frames = [normalize_frame(step) for step in traceback.steps]
+            self._clusters[key] = ExceptionCluster(key, traceback.exception.exception, frames)
+        self._clusters[key].add(location)
+
+    def merge(self, other):
+        """Merge the clusters of another aggregate into this one."""
+        self.log_count += other.log_count
+        for key, cluster in other._clusters.items():
+            if key not in self._clusters:
+                self._clusters[key] = ExceptionCluster(key, cluster.exception, cluster.frames)
+            self._clusters[key].merge(cluster)
+
+    def generate_report(self):
+        """Return a string describing each cluster from the most to least tracebacks."""
+        str_format = "%Y-%m-%d %H:%M:%S.%f"
+
+        def describe(location):
+            output = location.log_file
+            if location.context:
+                output += " [{}]".format(location.context)
+            if location.time:
+                output = "{} in {}".format(location.time.strftime(str_format), output)
+            return output
+
+        output = ["Exception Clusters"]
+        output.append("  {} tracebacks in {} clusters across {} logs".format(
+            self.traceback_count, len(self), self.log_count))
+        output.append("_" * 75)
+        for cluster in self:
+            output.append("{} ({})".format(cluster.exception or "Unknown exception", cluster.key))
+            output.append("  Count: {} in {} logs".format(cluster.count, len(cluster.log_files)))
+            if cluster.first_seen:
+                output.append("  First seen: {}".format(describe(cluster.first_seen)))
+                output.append("  Last seen: {}".format(describe(cluster.last_seen)))
+            output.append("  Frames:")
+            for filename, function in cluster.frames:
+                output.append("    {} in {}".format(filename, function))
+            output.append("  Examples:")
+            for location in cluster.examples:
+                output.append("    {}".format(describe(location)))
+                output.append("      {}: {}".format(cluster.exception, location.description))
+            output.append("_" * 75)
+        return "\n".join(output)
+
+
+class TracebackFormatter(VFormatter):
+    """Collects the tracebacks of a log file into ``ExceptionClusters`` without displaying logs.
+
+    Every log type is processed so tracebacks are attached to the log they follow, whose time
+    and enclosing headers are used as the location of the traceback.
+    """
+
+    SUMMARY = False
+    STORE_CONTEXT = True
+
+    def __init__(self, config_interface, log_file, clusters=None):
+        """Initializes ``TracebackFormatter``
+
+        :param str log_file: Name of the log file used in the location of the tracebacks.
+        :param ExceptionClusters clusters: Aggregate the tracebacks are added to.
+        """
+        super(TracebackFormatter, self).__init__(config_interface)
+        self._lm = LogManager(display_log_types=list(VLogType))
+        self._log_file = log_file
+        self.clusters = clusters if clusters is not None else ExceptionClusters()
+
+    def send(self, fmt_logs):
+        """Adds the tracebacks within the logs passed to the clusters.
+
+        :param list(``LogLine``|str|None) fmt_logs: The formatted log lines after ``format()``.
+        """
+        for log in fmt_logs:
+            if isinstance(log, vlogline.Standard):
+                for traceback in log.get_additional_logs():
+                    self._add(traceback, log.datetime, log.context)
+            elif isinstance(log, vlogline.Traceback):
+                self._add(log, self.curr_time, log.context)
+
+    def complete(self):
+        """Adds the tracebacks of the remaining logs."""
+        self.send(self._lm.flush_logs())
+        self.clusters.log_count += 1
+
+    def _add(self, traceback, time, context):
+        location = Location(self._log_file, HeaderManager.context_path(context), time,
+                            traceback.exception.desc)
+        self.clusters.add(traceback, location)
+
+
+def fingerprint_log(log_file, log_name=None):
+    """Return the ``ExceptionClusters`` of the tracebacks within the log file.
+
+    :param str log_file: Filepath of the log file.
+    :param str log_name: Name of the log file used in locations, the filepath by default.
+    """
+    at2 = bool(is_at2_formatting(log_file))
+    vlogline.Base.at2_format(at2)
+    vlogfield.Datetime.at2_format(at2)
+
+    formatter = TracebackFormatter(None, log_name or log_file)
+    with open(log_file) as f:
+        for line in f:
+            formatter.send(formatter.format(line))
+    formatter.complete()
+    return formatter.clusters
+
+
+class _FingerprintLog(object):
+    """Picklable function fingerprinting a log file named relative to a directory."""
+
+    def __init__(self, log_dir):
+        self._log_dir = log_dir
+
+    def __call__(self, log_file):
+        return fingerprint_log(log_file, os.path.relpath(log_file, self._log_dir))
+
+
+def cluster_logs(log_dir, processes=None):
+    """Return the merged ``ExceptionClusters`` of every log file within the directory.
+
+    :param str log_dir: Directory of the log files, which may be within subdirectories.
+    :param int processes: Number of worker processes, the number of CPUs by default.
+    """
+    from bin.vbatch import map_logs
+    from bin.vutils import find_logs
+
+    # Merged in the order of the log files rather than as they complete, so ties between the
+    # first and last seen times are resolved the same way on every run
+    results = dict(map_logs(_FingerprintLog(log_dir), find_logs(log_dir), processes))
+    clusters = ExceptionClusters()
+    for log_file in sorted(results):
+        clusters.merge(results[log_file])
+    return clusters
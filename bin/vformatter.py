@@ -1,14 +1,17 @@
 import os
 import re
 import sys
+from collections import OrderedDict
 
 from bin import vlogfield
 from bin import vlogline
 from bin.lollygag_logger import LogFormatter
-from bin.vmanagers import HeaderManager, LogManager
+from bin.vmanagers import ApiCallManager, HeaderManager, LogManager
+from bin.vutils import ApiMethodFilter
 from bin.vutils import VLogType
 from bin.vutils import VPatterns
 from bin.vutils import ProgressBar
+from bin.vutils import WriterPool
 
 
 class VFormatter(LogFormatter):
@@ -45,9 +48,21 @@ class VFormatter(LogFormatter):
     DISPLAY_TESTCASE_NUM = -1
     DISPLAY_STEP_NUM = -1
     SUMMARY = False
+    STATISTICS = False
 
     OUTPUT_FILE = ""
     LOG_FILE_WC = 0
+    API_STATS_FILE = ""
+    API_INCLUDE_METHODS = []
+    API_EXCLUDE_METHODS = []
+    TC_LOGS_MAX_SIZE = 0
+    MAX_STORED_LOGS = 0
+    MAX_SUMMARY_HEADERS = 0
+
+    # Substring of the first line of a traceback, for prefix checks of raw log lines
+    TRACEBACK_TOKEN = "Traceback (most recent call last)"
+    # Store the headers each log line is within as its ``context``, set by the subclasses using it
+    STORE_CONTEXT = False
 
     def __init__(self, config_interface):
         """Initializes ``VFormatter``
@@ -74,8 +89,15 @@ class VFormatter(LogFormatter):
 
         self._hm = HeaderManager(tc_name=self.DISPLAY_TESTCASE_NAME,
                                  tc_num=self.DISPLAY_TESTCASE_NUM,
-                                 step=self.DISPLAY_STEP_NUM)
-        self._lm = LogManager(display_log_types=self.DISPLAY_LOG_TYPES)
+                                 step=self.DISPLAY_STEP_NUM,
+                                 max_headers=self.MAX_SUMMARY_HEADERS)
+        self._lm = LogManager(display_log_types=self.DISPLAY_LOG_TYPES,
+                              max_held_logs=self.MAX_STORED_LOGS)
+        self._am = ApiCallManager()
+        self._api_filter = None
+        if self.API_INCLUDE_METHODS or self.API_EXCLUDE_METHODS:
+            self._api_filter = ApiMethodFilter(include=self.API_INCLUDE_METHODS,
+                                               exclude=self.API_EXCLUDE_METHODS)
         self._config_interface = config_interface
 
         self._prev_fmt_log = None
@@ -98,7 +120,7 @@ class VFormatter(LogFormatter):
         if self.OUTPUT_FILE:
             if self._log_count % 100 == 0:
                 self._prog.progress(self._log_count, "Logs Processed")
-            self._log_count += 1
+        self._log_count += 1
 
         if unf_str.isspace():
             self._lm.enqueue_log("")  # Print a blank line
@@ -113,6 +135,11 @@ class VFormatter(LogFormatter):
         if not self._display_log(unf_str):
             return []  # Don't print anything
 
+        # Discard API calls of methods not specified before their payloads are parsed
+        if self._api_filter and self._lm.curr_log_type in VPatterns.std_log_types() \
+                and self._api_filter.reject(unf_str):
+            return []
+
         # Create LogLine objects
         fmt_log = self._create_log_line(unf_str, self._lm.curr_log_type)
         if fmt_log:
@@ -136,14 +163,10 @@ class VFormatter(LogFormatter):
                     self.last_line_empty = True
                     output = ""
 
-            if self.OUTPUT_FILE:
-                with open(self.OUTPUT_FILE, 'a') as f:
-                    f.write(str(output) + "\n")
-            else:
-                print(output)
+            self._write_output(output)
 
     def complete(self):
-        """Prints summary if requested."""
+        """Prints summary and run statistics if requested."""
 
         # Print any remaining logs
         self.send(self._lm.flush_logs())
@@ -152,22 +175,44 @@ class VFormatter(LogFormatter):
             try:
                 self._hm.end_time(self.curr_time, root=True)
                 summary = self._hm.generate_summary()
-                output = "".join(["\n", summary])
-
-                if self.OUTPUT_FILE:
-                    with open(self.OUTPUT_FILE, 'a') as f:
-                        f.write(str(output) + "\n")
-                else:
-                    print(output)
+                self._write_output("".join(["\n", summary]))
             # except AttributeError:
             except Exception as e:
                 print(e.with_traceback())
                 print("Error generating summary. Log may be incomplete.")
 
+        if self.SUMMARY and self._am.has_calls():
+            self._write_output("".join(["\n", self._am.generate_summary()]))
+
+        if self.API_STATS_FILE:
+            self._am.write_json(self.API_STATS_FILE)
+
+        if self.STATISTICS:
+            self._write_output("".join(["\n", self.generate_statistics()]))
+
         if self.OUTPUT_FILE:
             self._prog.progress(self._log_count, "Complete")
             print("\nSave complete.")
 
+    def generate_statistics(self):
+        """Return a string describing the work done while formatting the log."""
+        api_cache = vlogfield.Details.API_CACHE
+        output = ["Run Statistics"]
+        output.append("  Log lines processed: {}".format(self._log_count))
+        output.append("  API format cache: {} hits, {} misses ({:.1%} hit rate)".format(
+            api_cache.hits, api_cache.misses, api_cache.hit_rate))
+        if self._api_filter:
+            output.append("  API calls filtered: {}".format(self._api_filter.rejected))
+        return "\n".join(output)
+
+    def summary_records(self):
+        """Return the status and runtime of each header once the log is complete.
+
+        See ``HeaderManager.summary_records()``. Statuses only reflect errors if ``SUMMARY``.
+        """
+        self._hm.end_time(self.curr_time, root=True)
+        return self._hm.summary_records()
+
     @property
     def curr_time(self):
         return self._curr_time
@@ -218,14 +263,72 @@ class VFormatter(LogFormatter):
     def display_summary(cls, value=True):
         cls.SUMMARY = value
 
+    @classmethod
+    def display_statistics(cls, value=True):
+        cls.STATISTICS = value
+
+    @classmethod
+    def filter_api_methods(cls, include=None, exclude=None):
+        """Only display the API calls of the methods included and not excluded.
+
+        :param list(str) include: API methods to display. All are displayed if empty.
+        :param list(str) exclude: API methods to not display.
+        """
+        cls.API_INCLUDE_METHODS = list(include or [])
+        cls.API_EXCLUDE_METHODS = list(exclude or [])
+
+    @classmethod
+    def api_statistics_file(cls, filepath):
+        """Store the API call latency statistics as JSON in the given file when complete."""
+        cls.API_STATS_FILE = filepath
+
+    @classmethod
+    def tc_logs_max_size(cls, size):
+        """Set the max total size in bytes of the parsed logs kept in tc_logs, 0 for no limit."""
+        cls.TC_LOGS_MAX_SIZE = size
+
+    @classmethod
+    def max_stored_logs(cls, count):
+        """Set the max number of lines of a header or traceback stored until its last line.
+
+        Once exceeded, the lines are printed unclassified. A count of 0 means no limit.
+        """
+        cls.MAX_STORED_LOGS = count
+
+    @classmethod
+    def max_summary_headers(cls, count):
+        """Set the max number of headers of the summary kept in memory, 0 for no limit.
+
+        Once exceeded, the summaries of completed headers are stored in temporary files.
+        """
+        cls.MAX_SUMMARY_HEADERS = count
+
     @classmethod
     def output_file(cls, filepath, log_file_wc):
         """Save formatted STDOUT to a file with progress bar."""
         cls.OUTPUT_FILE = filepath
         cls.LOG_FILE_WC = log_file_wc
 
+    def _write_output(self, output):
+        """Print the output or append it to the output file if one is specified."""
+        if self.OUTPUT_FILE:
+            with open(self.OUTPUT_FILE, 'a') as f:
+                f.write(str(output) + "\n")
+        else:
+            print(output)
+
     def _store_log(self, unf_str):
         self.stored_logs.append(unf_str)
+        if self.MAX_STORED_LOGS and len(self.stored_logs) > self.MAX_STORED_LOGS:
+            # A header or traceback missing its last line, print its lines unclassified
+            self.border_flag = ""
+            self.traceback_flag = False
+            self.tb_leading_char = ""
+            self._lm.hold = False
+            if self._hm.std_log_in_specified_testcase():
+                self._lm.enqueue_log(self._pull_logs())
+            else:
+                self.stored_logs = []
 
     def _pull_logs(self):
         logs = "\n".join(self.stored_logs)
@@ -242,8 +345,16 @@ class VFormatter(LogFormatter):
             return True
 
     def _set_log_len(self):
+        """Use the console width as the max line length if specified.
+
+        The ``COLUMNS`` environment variable is used if set, such as by the daemon for the
+        console of its client, otherwise the width is read with ``stty``.
+        """
         console_width = 0
-        if self.CONSOLE_WIDTH and sys.stdin.isatty():
+        columns = os.environ.get("COLUMNS", "")
+        if self.CONSOLE_WIDTH and columns.isdigit():
+            console_width = int(columns)
+        elif self.CONSOLE_WIDTH and sys.stdin.isatty():
             widths_tuple = os.popen('stty size', 'r').read().split()
             if widths_tuple:
                 _, console_width = widths_tuple
@@ -273,6 +384,10 @@ class VFormatter(LogFormatter):
             # Associate Error with Header
             if self.SUMMARY and output and output.logtype == VLogType.ERROR:
                 self._hm.add_error(output)
+
+            # Pair API requests with their responses
+            if output.FORMAT_API:
+                self._am.add_log(output)
         # Traceback Log Lines
         elif log_type == VLogType.TRACEBACK and self._hm.std_log_in_specified_testcase():
             output = vlogline.Traceback(unf_str)
@@ -298,6 +413,8 @@ class VFormatter(LogFormatter):
 
         if output:
             self._prev_fmt_log = output
+        if self.STORE_CONTEXT and isinstance(output, vlogline.Base):
+            output.context = self._hm.current_context()
 
         return output
 
@@ -415,19 +532,24 @@ class VFormatter(LogFormatter):
                 m = re.match(pattern, log)
                 if m and m.group(1):
                     self._curr_time = vlogfield.Datetime(m.group(1)).datetime
-            else:
+            elif log is not None:  # None while the lines of a header are being stored
                 self._curr_time = log.datetime
 
             if isinstance(self._prev_fmt_log, vlogline.Header) or set_root:
                 self._hm.start_time(self._curr_time, root=set_root)
 
+    def _tc_logs_cache(self, tc_dir):
+        """Return the cache of parsed logs stored in the tc_logs directory ``tc_dir``."""
+        from bin.vcache import ExtractionCache
+        return ExtractionCache(tc_dir, max_size=self.TC_LOGS_MAX_SIZE)
+
     def parse_test_case(self, log_file, tc_name=None, tc_num=None):
         """Parses test case logs from a log file.
 
         The specified test case logs are placed into a file labelled with the tc info,
         and the file will be located in a directory labelled tc_logs in the same directory as the
         log file.
-        If the file already exists, the method will return.
+        If the file was already parsed from the same, unchanged log file, the method will return.
 
         Example::
 
@@ -442,16 +564,25 @@ class VFormatter(LogFormatter):
         :returns: String filepath to parsed log file.
         """
 
-        dir = os.path.dirname(log_file)
-        tc_dir = os.path.join(dir, "tc_logs")
-        if not os.path.exists(tc_dir):
-            os.mkdir(tc_dir)
+        cache = self._tc_logs_cache(os.path.join(os.path.dirname(log_file), "tc_logs"))
         tc_filename = "%s.log" % (tc_name) if tc_name else ("Tc-%d.log" % (tc_num))
-        tc_file = os.path.join(tc_dir, tc_filename)
-        if os.path.exists(tc_file):
+        tc_file = cache.lookup(tc_filename, log_file)
+        if tc_file:
             return tc_file
-        else:
-            open(tc_file, "w").close()
+        with cache.writer(tc_filename, log_file) as f:
+            f.writelines(self.iter_test_case(log_file, tc_name, tc_num))
+        return cache.path(tc_filename)
+
+    def iter_test_case(self, log_file, tc_name=None, tc_num=None):
+        """Generate the lines of the specified test case from a log file.
+
+        The lines are the same as those written by ``parse_test_case``, including the newline.
+        Reading the log file stops once the end of the test case is reached.
+
+        :param str log_file: Filepath of log file to be parsed.
+        :param str tc_name: Name of test case to be parsed, will supercede tc_num if specified
+        :param int tc_num: Number of test case to be parsed.
+        """
 
         step_regex = VPatterns.get_step_header()
         tc_regex = VPatterns.get_test_case_header()
@@ -478,7 +609,7 @@ class VFormatter(LogFormatter):
                     if tc_name and tc_name == tc.test_case_name:
                         in_specified_tc = True
                     # TC number matches current line
-                    elif tc_num >= 0 and tc_num == tc.number:
+                    elif tc_num is not None and tc_num == tc.number:
                         in_specified_tc = True
                     # New TC is reached
                     elif in_specified_tc:
@@ -486,14 +617,13 @@ class VFormatter(LogFormatter):
                         in_specified_tc = False
 
                     if in_specified_tc:
-                        with open(tc_file, "a") as f:
-                            f.write(str(tc) + "\n")
+                        for header_line in self._raw_header_lines(line):
+                            yield header_line
 
                 # Line is a step header
                 elif step_match and in_specified_tc:
-                    step = vlogline.StepHeader(line)
-                    with open(tc_file, "a") as f:
-                        f.write(str(step) + "\n")
+                    for header_line in self._raw_header_lines(line):
+                        yield header_line
 
                 # New General or Suite header found to signal end of specified test case
                 elif header_match and in_specified_tc:
@@ -501,12 +631,10 @@ class VFormatter(LogFormatter):
 
                 # Logs in specified test case
                 elif in_specified_tc:
-                    with open(tc_file, "a") as f:
-                        f.write(str(line) + "\n")
+                    yield str(line) + "\n"
 
                 if completed_specified_tc:
-                    return tc_file
-        return tc_file
+                    return
 
     def parse_step(self, tc_log_file, step_num):
         """Parses step logs from a test case log file.
@@ -514,7 +642,7 @@ class VFormatter(LogFormatter):
         The specified step logs are placed into a file labelled with the step info,
         and the file will be located in a directory labelled tc_logs in the same directory as the
         log file.
-        If the file already exists, the method will return.
+        If the file was already parsed from the same, unchanged log file, the method will return.
 
         Example::
 
@@ -527,55 +655,213 @@ class VFormatter(LogFormatter):
         :param int step_num: Number of step to be parsed.
         """
 
-        tc_dir = os.path.dirname(tc_log_file)
+        cache = self._tc_logs_cache(os.path.dirname(tc_log_file))
         tc_filename = re.search("(Tc-?\w+).log", tc_log_file)
         step_filename = "%s_Step-%d.log" % (tc_filename.group(1), step_num)
-        step_file = os.path.join(tc_dir, step_filename)
-        if os.path.exists(step_file):
+        step_file = cache.lookup(step_filename, tc_log_file)
+        if step_file:
             return step_file
-        else:
-            open(step_file, "w").close()
+        with cache.writer(step_filename, tc_log_file) as f:
+            with open(tc_log_file) as tc_file:
+                f.writelines(self.iter_step(tc_file, step_num))
+        return cache.path(step_filename)
+
+    def iter_step(self, tc_lines, step_num):
+        """Generate the lines of the specified step from the lines of a test case.
+
+        The lines are the same as those written by ``parse_step``, including the newline.
+        Reading the test case lines stops once the end of the step is reached.
+
+        :param iter(str) tc_lines: Lines of the test case such as from ``iter_test_case``.
+        :param int step_num: Number of step to be parsed.
+        """
 
         step_regex = VPatterns.get_step_header()
         tc_regex = VPatterns.get_test_case_header()
         in_specified_step = False
         completed_specified_step = False
 
-        with open(tc_log_file) as original_file:
-            for line in original_file:
-                line = self._handle_raw_header(line.rstrip("\n"))
-                if line is None:
-                    continue
+        for line in tc_lines:
+            line = self._handle_raw_header(line.rstrip("\n"))
+            if line is None:
+                continue
 
-                tc_match = re.match(tc_regex, line)
-                step_match = re.match(step_regex, line)
-
-                # Line is step
-                if step_match:
-                    step = vlogline.StepHeader(line)
-
-                    # Step number matches current line
-                    if step_num == step.number:
-                        in_specified_step = True
-                    # New step is reached
-                    elif in_specified_step:
-                        completed_specified_step = True
-                        in_specified_step = False
+            tc_match = re.match(tc_regex, line)
+            step_match = re.match(step_regex, line)
 
-                    if in_specified_step:
-                        with open(step_file, "a") as f:
-                            f.write(str(step) + "\n")
+            # Line is step
+            if step_match:
+                step = vlogline.StepHeader(line)
 
-                # Next Test Case reached
-                elif tc_match and in_specified_step:
+                # Step number matches current line
+                if step_num == step.number:
+                    in_specified_step = True
+                # New step is reached
+                elif in_specified_step:
                     completed_specified_step = True
                     in_specified_step = False
 
-                # Logs in specified step
-                elif in_specified_step:
-                    with open(step_file, "a") as f:
-                        f.write(str(line) + "\n")
+                if in_specified_step:
+                    for header_line in self._raw_header_lines(line):
+                        yield header_line
+
+            # Next Test Case reached
+            elif tc_match and in_specified_step:
+                completed_specified_step = True
+                in_specified_step = False
 
-                if completed_specified_step:
-                    return step_file
-        return step_file
+            # Logs in specified step
+            elif in_specified_step:
+                yield str(line) + "\n"
+
+            if completed_specified_step:
+                return
+
+    def extract_logs(self, log_file, tc_name=None, tc_num=None, step_num=None, cache=False):
+        """Return an iterator of the lines of the specified test case or step of a log file.
+
+        Test case and step logs parsed previously into tc_logs are used if they're valid for the
+        log file. Otherwise, the logs are streamed directly from the log file without writing
+        them to tc_logs unless ``cache`` is True.
+
+        :param str log_file: Filepath of log file to be parsed.
+        :param str tc_name: Name of test case to be parsed, will supercede tc_num if specified
+        :param int tc_num: Number of test case to be parsed.
+        :param int step_num: Number of step to be parsed, or None for the entire test case.
+        :param bool cache: Store the parsed logs in tc_logs for later use.
+        :rtype: iter(str)
+        """
+        if cache:
+            logfile = self.parse_test_case(log_file, tc_name=tc_name, tc_num=tc_num)
+            if step_num is not None:
+                logfile = self.parse_step(logfile, step_num)
+            return self._iter_file(logfile)
+
+        tc_cache = self._tc_logs_cache(os.path.join(os.path.dirname(log_file), "tc_logs"))
+        tc_label = tc_name if tc_name else "Tc-%d" % tc_num
+        tc_file = tc_cache.lookup("%s.log" % tc_label, log_file)
+        if step_num is None:
+            if tc_file:
+                return self._iter_file(tc_file)
+            return self.iter_test_case(log_file, tc_name=tc_name, tc_num=tc_num)
+
+        if tc_file:
+            step_file = tc_cache.lookup("%s_Step-%d.log" % (tc_label, step_num), tc_file)
+            if step_file:
+                return self._iter_file(step_file)
+            return VFormatter(self._config_interface).iter_step(self._iter_file(tc_file),
+                                                                step_num)
+        # Steps are parsed by a separate formatter as header parsing state can't be shared
+        tc_lines = self.iter_test_case(log_file, tc_name=tc_name, tc_num=tc_num)
+        return VFormatter(self._config_interface).iter_step(tc_lines, step_num)
+
+    @staticmethod
+    def _raw_header_lines(header_str):
+        """Return the lines of the header as found in a raw log from ``_handle_raw_header()``.
+
+        Example::
+
+            '=Test Case 0: Starting Test of TcTest=' -> [
+                '=====...=====\\n',
+                'Test Case 0: Starting Test of TcTest\\n',
+                '=====...=====\\n']
+        """
+        border = header_str[0] * 105 + "\n"
+        desc_lines = [desc[1:-1] + "\n" for desc in header_str.split("\n")]
+        return [border] + desc_lines + [border]
+
+    @staticmethod
+    def _iter_file(filepath):
+        """Generate the lines of the file, closing it once complete."""
+        with open(filepath) as f:
+            for line in f:
+                yield line
+
+    def split_log(self, log_file, max_open_files=64):
+        """Splits every test case and step of a log file into separate files in a single pass.
+
+        The files are placed in a directory labelled tc_logs in the same directory as the log
+        file and contain the same logs as the files created by ``parse_test_case`` and
+        ``parse_step``, which will use them if the log file is unchanged.
+        Existing files are overwritten.
+
+        Example::
+
+            split_log("~/logs/test.log")
+
+            # File locations
+            ~/logs/tc_logs/TcExample.log
+            ~/logs/tc_logs/TcExample_Step-0.log
+            ~/logs/tc_logs/TcExample_Step-1.log
+
+        :param str log_file: Filepath of log file to be parsed.
+        :param int max_open_files: Max number of files open at once while writing.
+        :returns: List of filepaths to the parsed log files.
+        """
+
+        cache = self._tc_logs_cache(os.path.join(os.path.dirname(log_file), "tc_logs"))
+        step_regex = VPatterns.get_step_header()
+        tc_regex = VPatterns.get_test_case_header()
+        header_regex = "".join([VPatterns.get_suite_header(), "|",
+                                VPatterns.get_general_header()])
+        tc_filename = None
+        step_filename = None
+        # Parsed logs are written to temp files and committed to the cache once complete
+        temp_paths = OrderedDict()
+        step_sources = {}
+
+        def write(filename, text):
+            if filename not in temp_paths:
+                temp_paths[filename] = cache.temp_path(filename)
+            writers.write(temp_paths[filename], text)
+
+        try:
+            with WriterPool(max_open=max_open_files) as writers:
+                with open(log_file) as original_file:
+                    for line in original_file:
+                        line = self._handle_raw_header(line.rstrip("\n"))
+                        if line is None:
+                            continue
+
+                        # Line is test case
+                        if re.match(tc_regex, line):
+                            tc = vlogline.TestCaseHeader(line)
+                            tc_filename = "%s.log" % tc.test_case_name
+                            step_filename = None
+                            write(tc_filename, "".join(self._raw_header_lines(line)))
+
+                        # Line is a step header
+                        elif re.match(step_regex, line) and tc_filename:
+                            step = vlogline.StepHeader(line)
+                            step_filename = "%s_Step-%d.log" % (tc_filename[:-len(".log")],
+                                                                step.number)
+                            step_sources[step_filename] = tc_filename
+                            header = "".join(self._raw_header_lines(line))
+                            write(tc_filename, header)
+                            write(step_filename, header)
+
+                        # New General or Suite header found to signal end of test case
+                        elif re.match(header_regex, line):
+                            tc_filename = None
+                            step_filename = None
+
+                        # Logs in test case and step
+                        elif tc_filename:
+                            write(tc_filename, line + "\n")
+                            if step_filename:
+                                write(step_filename, line + "\n")
+
+            # Steps are parsed from their test case log, so test cases are committed first
+            filepaths = []
+            for filename, temp_path in temp_paths.items():
+                if filename not in step_sources:
+                    filepaths.append(cache.commit(filename, log_file, temp_path))
+            for filename, temp_path in temp_paths.items():
+                if filename in step_sources:
+                    filepaths.append(cache.commit(filename, cache.path(step_sources[filename]),
+                                                  temp_path))
+            return filepaths
+        finally:
+            for temp_path in temp_paths.values():
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
@@ -1,15 +1,15 @@
 """This module defines all of the VL field objects found in standard logs."""
 
 import abc
-import json
 import os
-import pprint
 import re
 
 import six
+from collections import OrderedDict
 from datetime import datetime
 
 from bin.vutils import Colorize
+from bin.vutils import LRUCache
 from bin.vutils import VLogType
 from bin.vutils import VPatterns
 
@@ -258,7 +258,14 @@ class Thread(LogField):
 
 
 class Details(LogField):
-    """Represents the details field."""
+    """Represents the details field.
+
+    Parsed and pretty-printed API payloads are shared through ``API_CACHE`` so that
+    identical requests and responses, such as those logged while polling, are only
+    processed once.
+    """
+
+    API_CACHE = LRUCache(max_size=1024)
 
     def __init__(self, details_token):
         """Initialize thread field from ``str`` token."""
@@ -271,8 +278,10 @@ class Details(LogField):
         self._request_url = None
         self._request_id = None
         self._request_params = None
+        self._request_params_str = None
         self._response_id = None
         self._response_result = None
+        self._response_result_str = None
         self._response_type = None
 
     def __str__(self):
@@ -289,6 +298,10 @@ class Details(LogField):
 
     def format_api_calls(self):
         """When converted to string, the API requests and responses will be formatted."""
+        # Only needed when formatting API calls, so imported here rather than on startup
+        import json
+        import pprint
+
         request1 = re.match(VPatterns.get_std_details_request()[0], self._details)
         request2 = re.match(VPatterns.get_std_details_request()[1], self._details)
         response = re.match(VPatterns.get_std_details_response(), self._details)
@@ -296,11 +309,21 @@ class Details(LogField):
         if request1:
             # "Sending HTTP POST request to server_url: ..."
             if request1.group(2) != 'None':
-                request_json = json.loads(request1.group(2))
+                key, api_id = self._api_cache_key(request1.group(2), request1.group(1))
+                cached = self.API_CACHE.get(key)
+                if cached is None:
+                    request_json = json.loads(request1.group(2))
+                    params = request_json['params']
+                    cached = (request_json['method'],
+                              params,
+                              pprint.pformat(params) if params else None,
+                              int(request_json['id']))
+                    self.API_CACHE.put(key, cached)
                 self._request_url = request1.group(1)
-                self._request_id = int(request_json['id'])
-                self._request_method = request_json['method']
-                self._request_params = request_json['params']
+                (self._request_method, self._request_params, self._request_params_str,
+                 parsed_id) = cached
+                # The cached id is only the id of this request if it's part of the key
+                self._request_id = parsed_id if api_id is None else api_id
         elif request2:
             # "JSON-RPC-POST: method= ..."
             self._request_url = request2.group(2)
@@ -310,14 +333,91 @@ class Details(LogField):
         elif response:
             # "JSON-RPC-POST response: ..."
             string = response.group(1)
-            json_response = json.loads(string)
-            self._response_id = json_response['id']
-            if 'result' in json_response:
-                self._response_result = json_response['result']
-                self._response_type = 'Result'
-            elif 'error' in json_response:
-                self._response_result = json_response['error']
-                self._response_type = 'Error'
+            key, api_id = self._api_cache_key(string)
+            cached = self.API_CACHE.get(key)
+            if cached is None:
+                json_response = json.loads(string)
+                response_type = None
+                result = None
+                if 'result' in json_response:
+                    result = json_response['result']
+                    response_type = 'Result'
+                elif 'error' in json_response:
+                    result = json_response['error']
+                    response_type = 'Error'
+                cached = (result,
+                          response_type,
+                          pprint.pformat(result) if result else None,
+                          json_response['id'])
+                self.API_CACHE.put(key, cached)
+            (self._response_result, self._response_type, self._response_result_str,
+             parsed_id) = cached
+            self._response_id = parsed_id if api_id is None else api_id
+
+    @classmethod
+    def api_cache_size(cls, size=1024):
+        """Set the max number of formatted API payloads kept in ``API_CACHE``."""
+        cls.API_CACHE.max_size = size
+
+    @staticmethod
+    def _api_cache_key(payload, *extra):
+        """Return the ``API_CACHE`` key for the raw API payload along with its id.
+
+        The JSON-RPC id differs between otherwise identical calls, so when it is found at
+        the start or end of the payload (where it can only belong to the top level object)
+        it is removed from the key and returned separately. Otherwise the id is ``None``,
+        the key includes the id and the id must be taken from the parsed payload.
+
+        :param str payload: Raw JSON payload of the request or response.
+        :param str extra: Additional strings the formatted output depends on.
+        :rtype: (bytes, int | None)
+        """
+        import hashlib
+
+        api_id = None
+        m = re.search(VPatterns.get_api_id(), payload)
+        if m:
+            api_id = int(m.group(1) or m.group(2))
+            payload = "".join([payload[:m.start()], payload[m.end():]])
+        key = "\n".join((payload,) + extra)
+        return hashlib.sha1(key.encode("utf-8")).digest(), api_id
+
+    @property
+    def text(self):
+        """Return the unformatted details."""
+        return self._details
+
+    def api_call(self):
+        """Return the parsed API request or response as a ``dict``, None if not an API call.
+
+        Only available once ``format_api_calls()`` is called.
+        """
+        if self._is_api_request():
+            return OrderedDict([("call", "request"),
+                                ("id", self._request_id),
+                                ("method", self._request_method),
+                                ("url", self._request_url),
+                                ("params", self._request_params)])
+        if self._is_api_response():
+            return OrderedDict([("call", "response"),
+                                ("id", self._response_id),
+                                ("response_type", self._response_type),
+                                ("result", self._response_result)])
+        return None
+
+    @property
+    def request_id(self):
+        """Return the id of the API request, ``None`` if not a formatted API request."""
+        return self._request_id
+
+    @property
+    def request_method(self):
+        return self._request_method
+
+    @property
+    def response_id(self):
+        """Return the id of the API response, ``None`` if not a formatted API response."""
+        return self._response_id
 
     def _is_api_request(self):
         """Return ``True`` if detail contains an API request."""
@@ -344,8 +444,7 @@ class Details(LogField):
         output = ["\n  {}{} ({})".format(json_post, req, id)]
         output.append("    Method: {}".format(self._request_method))
         output.append("    URL: {}".format(self._request_url))
-        params = pprint.pformat(self._request_params) if self._request_params else None
-        output.append("""    Params: {}""".format(params))
+        output.append("""    Params: {}""".format(self._request_params_str))
         return "\n".join(output)
 
     def _api_response_str(self):
@@ -359,8 +458,7 @@ class Details(LogField):
             id = Colorize.apply(id, 'api-id')
 
         output = ["\n  {}{} ({}): {}".format(json_post, res, id, self._response_type)]
-        result = pprint.pformat(self._response_result) if self._response_result else None
-        output.append("""    {}""".format(result))
+        output.append("""    {}""".format(self._response_result_str))
         return "\n".join(output)
 
 
@@ -2,6 +2,7 @@
 
 import abc
 import re
+from collections import OrderedDict
 
 import six
 from bin.vutils import Colorize
@@ -34,6 +35,7 @@ class Base(LogLine):
     ]
 
     # Other Settings
+    context = None  # Enclosing headers of the log, only set by formatters that use them
     UNF_LINE_SPLIT_COUNT = 5
     FIELDS = [vlogfield.Datetime,
               vlogfield.Type,
@@ -214,6 +216,29 @@ class Standard(Base):
     def datetime(self):
         return self._datetime.datetime
 
+    @property
+    def details(self):
+        return self._details
+
+    def as_dict(self):
+        """Return the parsed fields as a ``dict`` that can be serialized to JSON."""
+        record = OrderedDict()
+        record["type"] = self.logtype.name
+        record["timestamp"] = self.datetime.isoformat() if self.datetime else None
+        record["source"] = OrderedDict([("module", self._source.module),
+                                        ("line", self._source.line_number)])
+        record["thread"] = None
+        if not self.AT2_FORMAT:
+            record["thread"] = OrderedDict([("process", self._thread.process),
+                                            ("thread", self._thread.thread)])
+        record["details"] = self._details.text
+        api_call = self._details.api_call()
+        if api_call:
+            record["api"] = api_call
+        if self._additional_logs:
+            record["tracebacks"] = [log.as_dict() for log in self._additional_logs]
+        return record
+
     def add_additional_logs(self, logs):
         self._additional_logs.append(logs)
 
@@ -277,6 +302,18 @@ class Traceback(Base):
         fmt_exception = vlogfield.TracebackException(unf_exception, self.leading_chars)
         return fmt_steps, fmt_exception
 
+    def as_dict(self):
+        """Return the parsed frames and exception as a ``dict`` that can be serialized to JSON."""
+        record = OrderedDict()
+        record["type"] = self.logtype.name
+        record["frames"] = [OrderedDict([("file", step.file),
+                                         ("line", step.line_num),
+                                         ("function", step.function),
+                                         ("code", step.line)]) for step in self.steps]
+        record["exception"] = OrderedDict([("type", self.exception.exception),
+                                           ("description", self.exception.desc)])
+        return record
+
     def _remove_leading_chars(self, line):
         """Removes the leading characters from given string."""
         return line[len(self.leading_chars):]
@@ -298,12 +335,16 @@ class Header(Base):
     """Abstract base class for all other header log line elements."""
 
     BORDER_CHAR = "="
+    MAX_ERRORS = 0
 
     def __init__(self):
         self._type = None
         self._start_time = None
         self._end_time = None
         self._errors = []
+        self._dropped_errors = 0
+        self._dropped_error = None  # Last error dropped, until its tracebacks are known
+        self._dropped_failed = False
         self._status = "Passed"
 
     def _add_border(self, header_str):
@@ -322,8 +363,31 @@ class Header(Base):
         """Return the character used for the border."""
         return cls.BORDER_CHAR
 
+    @classmethod
+    def max_errors(cls, value=0):
+        """Set the max number of errors stored by each header, 0 for no limit.
+
+        Later errors are only counted, along with whether they were followed by tracebacks.
+        """
+        cls.MAX_ERRORS = value
+
     def add_error(self, error):
-        self._errors.append(error)
+        if not self.MAX_ERRORS or len(self._errors) < self.MAX_ERRORS:
+            self._errors.append(error)
+            return
+        # Tracebacks are added to an error after it, so check the previous dropped error now
+        if self._dropped_error is not None and self._dropped_error.get_additional_logs():
+            self._dropped_failed = True
+        self._dropped_error = error
+        self._dropped_errors += 1
+
+    def has_failed_error(self):
+        """Return True if any error of the header was followed by a traceback."""
+        if self._dropped_failed:
+            return True
+        if self._dropped_error is not None and self._dropped_error.get_additional_logs():
+            return True
+        return any(error.get_additional_logs() for error in self._errors)
 
     @abc.abstractmethod
     def get_id(self):
@@ -350,6 +414,11 @@ class Header(Base):
     def errors(self):
         return self._errors
 
+    @property
+    def dropped_errors(self):
+        """Return the number of errors not stored once the max number of errors was reached."""
+        return self._dropped_errors
+
     @property
     def status(self):
         status = self._status
@@ -369,6 +438,11 @@ class Header(Base):
     def status(self, status):
         self._status = status
 
+    @property
+    def status_text(self):
+        """Return the status without console coloring."""
+        return self._status
+
     @property
     def logtype(self):
         return self._type
@@ -433,6 +507,12 @@ class SuiteHeader(Header):
         header_str = self._add_border(header_str)
         return header_str
 
+    def as_dict(self):
+        """Return the parsed fields as a ``dict`` that can be serialized to JSON."""
+        return OrderedDict([("type", self.logtype.name),
+                            ("name", self.suite_name),
+                            ("description", self.desc)])
+
     def get_id(self):
         """Return string identifying suite header."""
         suite_name = self.suite_name
@@ -519,6 +599,13 @@ class TestCaseHeader(Header):
         header_str = self._add_border(header_str)
         return header_str
 
+    def as_dict(self):
+        """Return the parsed fields as a ``dict`` that can be serialized to JSON."""
+        return OrderedDict([("type", self.logtype.name),
+                            ("name", self.test_case_name),
+                            ("number", self.number),
+                            ("description", self.desc)])
+
     def get_id(self):
         """Return string identifying test case header."""
         test_case_id = "Test Case {}".format(self.number)
@@ -607,6 +694,14 @@ class StepHeader(Header):
         header_str = self._add_border(header_str)
         return header_str
 
+    def as_dict(self):
+        """Return the parsed fields as a ``dict`` that can be serialized to JSON."""
+        return OrderedDict([("type", self.logtype.name),
+                            ("test_case", self.test_case_name),
+                            ("number", self.number),
+                            ("action", self.action),
+                            ("expected_results", self.expected_results)])
+
     def get_id(self):
         """Return string identifying step header."""
         step_id = "Step {}".format(self.number)
@@ -697,6 +792,11 @@ class GeneralHeader(Header):
         header_str = self._add_border(header_str)
         return header_str
 
+    def as_dict(self):
+        """Return the parsed fields as a ``dict`` that can be serialized to JSON."""
+        return OrderedDict([("type", self.logtype.name),
+                            ("description", self.desc)])
+
     def get_id(self):
         """Return string identifying step header."""
         header_id = "{}".format(self.desc)
@@ -722,6 +822,11 @@ class Other(Base):
     def _parse_fields(self, unf_str):
         pass
 
+    def as_dict(self):
+        """Return the log as a ``dict`` that can be serialized to JSON."""
+        return OrderedDict([("type", self.logtype.name),
+                            ("text", self.desc)])
+
     @property
     def logtype(self):
         return self._type
@@ -1,4 +1,8 @@
-from anytree import Node, RenderTree
+import pickle
+import tempfile
+from collections import OrderedDict
+
+from bin.vutils import LatencyHistogram
 from bin.vutils import VLogType
 
 from bin import vlogline
@@ -6,20 +10,24 @@ from bin import vlogline
 
 class HeaderManager(object):
 
-    def __init__(self, tc_name=None, tc_num=None, step=None):
+    def __init__(self, tc_name=None, tc_num=None, step=None, max_headers=0):
         """Intialize the HeaderManager.
 
         :param str tc_name: Name of test case to only be stored.
         :param int tc_num: Int of test case to only be stored.
         :param int step: Int of step to only be stored.
+        :param int max_headers: Max number of headers kept in memory, 0 for no limit. Once
+            reached, the summaries of completed headers are spilled to temporary files.
         """
+        self._max_headers = max_headers
         self._curr_general = None
         self._curr_suite = None
         self._curr_testcase = None
         self._curr_step = None
 
-        self._root = Node(vlogline.GeneralHeader("=Test Summary="))
+        self._root = _HeaderNode(vlogline.GeneralHeader("=Test Summary="))
         self._header_tree = [self._root]
+        self._context = None
 
 
         self._specified_tc = bool(tc_name)
@@ -30,55 +38,111 @@ class HeaderManager(object):
 
     def generate_summary(self):
         """Return a string containing a summary of all the headers."""
-        str_format = "%H:%M:%S.%f"
-
         self._calc_end_time()
+        self._update_failed_status()
+        return "\n".join(self._render_tree(self._root))
+
+    def _render_tree(self, node, pre="", fill="", indent=0):
+        """Generate the summary lines of the node and its descendants, drawn as a tree.
 
+        :param str pre: Tree lines drawn before the header id.
+        :param str fill: Tree lines drawn before the other lines of the header.
+        :param int indent: Length of the tree lines drawn before ``fill`` once the lines are
+            added to the summary, when rendering a subtree to spill it.
+        """
+        for line in self._node_summary(node, pre, fill, indent):
+            yield line
+        children = node.children
+        for i, child in enumerate(children):
+            if isinstance(child.name, _SpilledHeaders):
+                for line in child.name.lines():
+                    yield fill + line
+                continue
+            if i == len(children) - 1:
+                child_pre, child_fill = fill + "\u2514\u2500\u2500 ", fill + "    "
+            else:
+                child_pre, child_fill = fill + "\u251c\u2500\u2500 ", fill + "\u2502   "
+            for line in self._render_tree(child, child_pre, child_fill, indent):
+                yield line
+
+    def _node_summary(self, node, pre, fill, indent=0):
+        """Return the summary lines of the header of the node."""
+        str_format = "%H:%M:%S.%f"
         output = []
 
-        # Update status of failed headers
-        for _, _, node in RenderTree(self._root):
-            errors = node.name.errors
-            if errors:
-                for error in errors:
-                    tracebacks = error.get_additional_logs()
-                    if tracebacks:
-                        self._update_tree_status(node, "Failed")
-
-        # Generate Summary string
-        for pre, fill, node in RenderTree(self._root):
-            # Add Title
-            output.append("%s%s" % (pre, node.name.get_id()))
-
-            # Add Runtime
-            if not node.name.start_time:  # May not result in accurate time
-                node.name.start_time = self._root.name.start_time
-            if node.name.end_time:
-                runtime = node.name.end_time - node.name.start_time
-                output.append("%s%s" % (fill, "  Runtime: %s" % runtime))
-
-            # Add Status and Errors
-            status = node.name.status
-            errors = node.name.errors
-            if errors:
-                error_str = []
-                error_exceptions = []
-                for error in errors:
-                    tracebacks = error.get_additional_logs()
-                    if tracebacks:
-                        error_exceptions.append(str(tracebacks[0].exception))
-                    error_time = error.datetime.strftime(str_format)
-                    error_str.append(error_time)
-                error_times = ", ".join(error_str)
-                status = " ".join([status, "at", error_times])
-                if error_exceptions:
-                    status = ("\n" + fill + "   ").join([status] + error_exceptions)
-            output.append("%s%s" % (fill, "  Status: %s" % status))
-
-            # Add Separator
-            output.append("%s%s" % (fill, "_" * (75 - len(fill))))
+        # Add Title
+        output.append("%s%s" % (pre, node.name.get_id()))
+
+        # Add Runtime
+        if not node.name.start_time:  # May not result in accurate time
+            node.name.start_time = self._root.name.start_time
+        if node.name.end_time:
+            runtime = node.name.end_time - node.name.start_time
+            output.append("%s%s" % (fill, "  Runtime: %s" % runtime))
+
+        # Add Status and Errors
+        status = node.name.status
+        errors = node.name.errors
+        if errors:
+            error_str = []
+            error_exceptions = []
+            for error in errors:
+                tracebacks = error.get_additional_logs()
+                if tracebacks:
+                    error_exceptions.append(str(tracebacks[0].exception))
+                error_time = error.datetime.strftime(str_format)
+                error_str.append(error_time)
+            error_times = ", ".join(error_str)
+            if node.name.dropped_errors:
+                error_times += " and %d more" % node.name.dropped_errors
+            status = " ".join([status, "at", error_times])
+            if error_exceptions:
+                status = ("\n" + fill + "   ").join([status] + error_exceptions)
+        output.append("%s%s" % (fill, "  Status: %s" % status))
+
+        # Add Separator
+        output.append("%s%s" % (fill, "_" * (75 - indent - len(fill))))
+        return output
 
-        return "\n".join(output)
+    def summary_records(self):
+        """Return the status and runtime of each header in the tree, starting with the root.
+
+        Records can be pickled and merged across logs. Each header is identified by its
+        ``path``, the ids of the headers from the top level down to the header itself, which is
+        empty for the root.
+
+        :rtype: list(OrderedDict)
+        """
+        self._calc_end_time()
+        self._update_failed_status()
+
+        records = []
+        for node in self._iter_nodes(self._root, spilled=True):
+            if isinstance(node.name, _SpilledHeaders):
+                records.extend(node.name.records())
+            else:
+                records.append(self._node_record(node))
+        return records
+
+    @staticmethod
+    def _node_record(node):
+        header = node.name
+        runtime = None
+        if header.start_time and header.end_time:
+            runtime = header.end_time - header.start_time
+        exceptions = []
+        for error in header.errors:
+            tracebacks = error.get_additional_logs()
+            if tracebacks:
+                exceptions.append(str(tracebacks[0].exception))
+        return OrderedDict([
+            ("path", [ancestor.name.get_id() for ancestor in node.path[1:]]),
+            ("type", header.logtype.name),
+            ("status", header.status_text),
+            ("runtime", runtime),
+            ("errors", len(header.errors) + header.dropped_errors),
+            ("exceptions", exceptions),
+        ])
 
     def add_general(self, header):
 
@@ -92,21 +156,21 @@ class HeaderManager(object):
 
     def add_suite(self, header):
         if self._curr_general:
-            self._curr_suite = self._add_node(header, self._header_tree[self._curr_general])
-            self._curr_testcase = None
-            self._curr_step = None
+            self._curr_suite = self._add_node(header, self._curr_general)
         else:
             self._curr_suite = self._add_node(header, self._root)
+        self._curr_testcase = None
+        self._curr_step = None
         if self._specified_tc:
             return None
         return header
 
     def add_testcase(self, header):
         if self._curr_suite:
-            self._curr_testcase = self._add_node(header, self._header_tree[self._curr_suite])
-            self._curr_step = None
+            self._curr_testcase = self._add_node(header, self._curr_suite)
         else:
             self._curr_testcase = self._add_node(header, self._root)
+        self._curr_step = None
 
         # if self._specified_step or not self.header_in_specified_testcase(header):
         #     return None
@@ -114,7 +178,7 @@ class HeaderManager(object):
 
     def add_step(self, header):
         if self._curr_testcase:
-            self._curr_step = self._add_node(header, self._header_tree[self._curr_testcase])
+            self._curr_step = self._add_node(header, self._curr_testcase)
         else:
             self._curr_step = self._add_node(header, self._root)
         if (self._specified_step or self._specified_tc) and not self.header_in_specified_testcase(header):
@@ -145,6 +209,41 @@ class HeaderManager(object):
         """Return the previous ``VHeader`` object."""
         return self._header_tree[-2].name
 
+    def current_context(self):
+        """Return the ids of the general, suite, test case and step headers currently within.
+
+        The same ``dict`` is returned until another header is added, so it must not be modified.
+        """
+        if self._context is None:
+            general = self._curr_general.name if self._curr_general else None
+            suite = self._curr_suite.name if self._curr_suite else None
+            testcase = self._curr_testcase.name if self._curr_testcase else None
+            step = self._curr_step.name if self._curr_step else None
+            self._context = OrderedDict([
+                ("general", general.desc if general else None),
+                ("suite", suite.suite_name if suite else None),
+                ("test_case", testcase.test_case_name if testcase else None),
+                ("test_case_number", testcase.number if testcase else None),
+                ("step", step.number if step else None),
+            ])
+        return self._context
+
+    @staticmethod
+    def context_path(context):
+        """Return the path of the headers of a ``current_context()``, such as
+        ``TsSuite/TcTest/Step 1``.
+        """
+        if not context:
+            return ""
+        names = [context["general"], context["suite"], context["test_case"]]
+        if context["step"] is not None:
+            names.append("Step {}".format(context["step"]))
+        return "/".join(name for name in names if name)
+
+    def headers(self):
+        """Return the headers in the tree in the order they were added, excluding the root."""
+        return [node.name for node in self._header_tree[1:]]
+
     def std_log_in_specified_testcase(self):
         """Determines what logs are to be displayed based on test case and step specified.
 
@@ -167,17 +266,17 @@ class HeaderManager(object):
         display_log = False
         # Test Case number specified
         if display_tc_num >= 0 and self._curr_testcase:
-            if self._get_header(self._curr_testcase).number == display_tc_num:
+            if self._curr_testcase.name.number == display_tc_num:
                 display_log = True
 
         # Test Case name specified
         if display_tc_name and self._curr_testcase:
-            if self._get_header(self._curr_testcase).test_case_name == display_tc_name:
+            if self._curr_testcase.name.test_case_name == display_tc_name:
                 display_log = True
 
         # Test Case Step specified
         if self._specified_step and display_log:
-            if self._curr_step and self._get_header(self._curr_step).number != display_step:
+            if self._curr_step and self._curr_step.name.number != display_step:
                 display_log = False
             elif not self._curr_step:
                 display_log = False
@@ -196,7 +295,7 @@ class HeaderManager(object):
         testcase = header if header.logtype == VLogType.TEST_CASE_H else None
         step = None
         if header.logtype == VLogType.STEP_H:
-            testcase = self._get_header(self._curr_testcase)
+            testcase = self._curr_testcase.name
             step = header
 
         # Test Case number specified
@@ -250,6 +349,12 @@ class HeaderManager(object):
             header = self.current_header()
             header.end_time = end_time
 
+    def _update_failed_status(self, nodes=None):
+        """Update the status of headers with errors followed by tracebacks to failed."""
+        for node in self._iter_nodes(self._root) if nodes is None else nodes:
+            if node.name.has_failed_error():
+                self._update_tree_status(node, "Failed")
+
     def _update_tree_status(self, node, status):
         node.name.status = status
         if not node.is_root:
@@ -260,19 +365,82 @@ class HeaderManager(object):
         self._recursive_calc_end_time(self._root)
 
     def _add_node(self, header, parent):
-        """Add header node to tree and return index."""
-        node = Node(header, parent=parent)
+        """Add header node to tree and return it."""
+        if self._max_headers and len(self._header_tree) >= self._max_headers \
+                and self.is_test_start_time_added():
+            self._spill_completed()
+        node = _HeaderNode(header, parent=parent or self._root)
         self._header_tree.append(node)
-        return len(self._header_tree) - 1
+        self._context = None
+        return node
+
+    def _spill_completed(self):
+        """Replace the completed headers in the tree by their summaries stored in temporary files.
 
-    def _get_header(self, index):
-        """Return the ``VHeader`` object at the specified index."""
-        return self._header_tree[index].name
+        Headers are completed once a later sibling is added, which also sets their end times.
+        The completed children of each header are replaced by a single ``_SpilledHeaders`` node,
+        always the first child, containing the summary lines drawn as if the header was the
+        root of the tree and the summary records.
+        """
+        chain = self._header_tree[-1].path
+        for depth, parent in enumerate(chain[:-1]):
+            index = parent.children.index(chain[depth + 1])
+            completed = [child for child in parent.children[:index]
+                         if not isinstance(child.name, _SpilledHeaders)]
+            if not completed:
+                continue
+            if isinstance(parent.children[0].name, _SpilledHeaders):
+                spilled = parent.children[0].name
+            else:
+                spilled = _SpilledHeaders()
+                parent.children.insert(0, _HeaderNode(spilled))
+                parent.children[0].parent = parent
+
+            for node in completed:
+                self._recursive_calc_end_time(node)
+                self._update_failed_status(self._iter_nodes(node))
+                spilled.failed = spilled.failed or node.name.status_text == "Failed"
+                # Completed headers always have a later sibling
+                spilled.add(self._render_tree(node, "\u251c\u2500\u2500 ", "\u2502   ",
+                                              indent=4 * depth), self.summary_records_of(node))
+                parent.children.remove(node)
+
+        self._header_tree = [node for node in self._iter_nodes(self._root)
+                             if not isinstance(node.name, _SpilledHeaders)]
+        live = set(self._header_tree)
+        for name in ("_curr_general", "_curr_suite", "_curr_testcase", "_curr_step"):
+            if getattr(self, name) not in live:
+                setattr(self, name, None)
+
+    def summary_records_of(self, node):
+        """Generate the summary records of the node and its descendants."""
+        for descendant in self._iter_nodes(node, spilled=True):
+            if isinstance(descendant.name, _SpilledHeaders):
+                for record in descendant.name.records():
+                    yield record
+            else:
+                yield self._node_record(descendant)
+
+    @staticmethod
+    def _iter_nodes(node, spilled=False):
+        """Generate the node and its descendants in pre-order.
+
+        The descendants of spilled headers are only generated if ``spilled`` is True.
+        """
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield node
+            if spilled or not isinstance(node.name, _SpilledHeaders):
+                stack.extend(reversed(node.children))
 
     # Endtime Functions
     #####################################################################################################
 
     def _recursive_calc_end_time(self, node):
+        if isinstance(node.name, _SpilledHeaders):
+            return
+
         # Node is root
         if node.is_root:
             for child in node.children[::-1]:
@@ -319,6 +487,70 @@ class HeaderManager(object):
             return self._get_next_sibling_starttime(parent)
 
 
+class _HeaderNode(object):
+    """Node of the header tree, holding the header as its ``name`` like ``anytree.Node``."""
+
+    __slots__ = ("name", "parent", "children")
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.children = []
+        if parent is not None:
+            parent.children.append(self)
+
+    @property
+    def is_root(self):
+        return self.parent is None
+
+    @property
+    def is_leaf(self):
+        return not self.children
+
+    @property
+    def path(self):
+        """Nodes from the root down to this node."""
+        nodes = [self]
+        while nodes[-1].parent is not None:
+            nodes.append(nodes[-1].parent)
+        return tuple(reversed(nodes))
+
+
+class _SpilledHeaders(object):
+    """Summary lines and records of completed headers, stored in temporary files."""
+
+    def __init__(self):
+        self._lines = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+        self._records = tempfile.TemporaryFile()
+        self.failed = False
+        self.status = None
+
+    def has_failed_error(self):
+        """Return True if any of the headers failed, so their ancestors are marked as failed."""
+        return self.failed
+
+    def add(self, lines, records):
+        for line in lines:
+            self._lines.write(line + "\n")
+        for record in records:
+            pickle.dump(record, self._records, pickle.HIGHEST_PROTOCOL)
+
+    def lines(self):
+        self._lines.seek(0)
+        for line in self._lines:
+            yield line.rstrip("\n")
+        self._lines.seek(0, 2)
+
+    def records(self):
+        self._records.seek(0)
+        while True:
+            try:
+                yield pickle.load(self._records)
+            except EOFError:
+                break
+        self._records.seek(0, 2)
+
+
 class LogManager(object):
     """Provides log management functionality.
 
@@ -338,8 +570,14 @@ class LogManager(object):
 
     """
 
-    def __init__(self, display_log_types=None):
+    def __init__(self, display_log_types=None, max_held_logs=0):
+        """Initialize the LogManager.
+
+        :param int max_held_logs: Max number of logs queued while on hold, 0 for no limit.
+            Once reached, the logs are released even though on hold.
+        """
         self._display_log_types = display_log_types
+        self._max_held_logs = max_held_logs
         self._log_queue = []
         self._curr_log = None
         self._curr_log_type = None
@@ -354,6 +592,11 @@ class LogManager(object):
     def curr_log_type(self, logtype):
         self._curr_log_type = logtype
 
+    @property
+    def current_log(self):
+        """Return the latest log enqueued, which is held until the next log is enqueued."""
+        return self._curr_log
+
     @property
     def hold(self):
         return self._hold
@@ -371,7 +614,8 @@ class LogManager(object):
         """
         if self._curr_log:
             self._log_queue.append(self._curr_log)
-        elif log and isinstance(log, vlogline.Traceback) and log.logtype == VLogType.TRACEBACK:
+        elif log and isinstance(log, vlogline.Traceback) and log.logtype == VLogType.TRACEBACK \
+                and self._log_queue:
             prev_log = self._log_queue[-1]
             # if isinstance(prev_log, str):
             #     self._log_queue.append(self._curr_log)
@@ -384,7 +628,8 @@ class LogManager(object):
 
     def dequeue_logs(self):
         """Return all logs but current if not on hold."""
-        if self._hold:
+        if self._hold and not (self._max_held_logs
+                               and len(self._log_queue) >= self._max_held_logs):
             return []
         else:
             logs = self._log_queue
@@ -423,3 +668,101 @@ class LogManager(object):
                 and self._prev_log_type not in self._display_log_types:
             output = False
         return output
+
+
+class ApiCallManager(object):
+    """Pairs API requests with their responses to measure the latency of each API call.
+
+    Requests are held by id until the matching response is found, so memory is bounded by
+    the number of requests in flight rather than the size of the log.
+    Latencies are grouped by API method.
+    """
+
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, max_in_flight=10000):
+        """Initialize the ApiCallManager.
+
+        :param int max_in_flight: Max number of requests waiting on a response. The oldest
+            request is dropped when exceeded.
+        """
+        self._max_in_flight = max_in_flight
+        self._in_flight = OrderedDict()
+        self._latencies = {}
+        self._unmatched_requests = 0
+        self._unmatched_responses = 0
+
+    def add_log(self, log):
+        """Record the API request or response found in a standard log.
+
+        :param vlogline.Standard log: Standard log with its API calls formatted.
+        """
+        details = log.details
+        if details.request_id is not None:
+            if details.request_id in self._in_flight:
+                self._unmatched_requests += 1
+                del self._in_flight[details.request_id]
+            self._in_flight[details.request_id] = (details.request_method, log.datetime)
+            if len(self._in_flight) > self._max_in_flight:
+                self._in_flight.popitem(last=False)
+                self._unmatched_requests += 1
+        elif details.response_id is not None:
+            request = self._in_flight.pop(details.response_id, None)
+            if request is None:
+                self._unmatched_responses += 1
+                return
+            method, start_time = request
+            latency = (log.datetime - start_time).total_seconds()
+            self._latencies.setdefault(method, LatencyHistogram()).add(latency)
+
+    def has_calls(self):
+        """Return True if any request has been matched with its response."""
+        return bool(self._latencies)
+
+    def statistics(self):
+        """Return the latency statistics of each API method in milliseconds.
+
+        :rtype: dict
+        """
+        methods = OrderedDict()
+        for method in sorted(self._latencies):
+            histogram = self._latencies[method]
+            stats = OrderedDict()
+            stats["count"] = histogram.count
+            for percent in self.PERCENTILES:
+                stats["p%d_ms" % percent] = round(histogram.percentile(percent) * 1000, 3)
+            stats["max_ms"] = round(histogram.max * 1000, 3)
+            methods[method] = stats
+
+        output = OrderedDict()
+        output["methods"] = methods
+        output["in_flight_requests"] = len(self._in_flight)
+        output["unmatched_requests"] = self._unmatched_requests
+        output["unmatched_responses"] = self._unmatched_responses
+        return output
+
+    def generate_summary(self):
+        """Return a string containing a table of the API call latencies by method."""
+        stats = self.statistics()
+        methods = stats["methods"]
+        width = max([len("Method")] + [len(method) for method in methods])
+        row = "  {:<%d} {:>8} {:>12} {:>12} {:>12} {:>12}" % width
+
+        output = ["API Call Latency"]
+        output.append(row.format("Method", "Count", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)"))
+        for method, method_stats in methods.items():
+            output.append(row.format(method, method_stats["count"], method_stats["p50_ms"],
+                                     method_stats["p95_ms"], method_stats["p99_ms"],
+                                     method_stats["max_ms"]))
+        unanswered = stats["in_flight_requests"] + stats["unmatched_requests"]
+        if unanswered or stats["unmatched_responses"]:
+            output.append("  Requests without response: {}, Responses without request: {}".format(
+                unanswered, stats["unmatched_responses"]))
+        return "\n".join(output)
+
+    def write_json(self, filepath):
+        """Store the latency statistics as JSON in the given file."""
+        import json
+        with open(filepath, "w") as f:
+            json.dump(self.statistics(), f, indent=2)
+            f.write("\n")
@@ -0,0 +1,279 @@
+"""Module containing ``VFormatter`` variations used for specialized output modes."""
+
+import re
+from collections import deque
+
+from bin import vlogline
+from bin.vformatter import VFormatter
+from bin.vmanagers import HeaderManager, LogManager
+from bin.vutils import VLogType
+from bin.vutils import required_literals
+
+
+class SummaryFormatter(VFormatter):
+    """Build the header summary without rendering any log lines.
+
+    Only the log lines needed for the summary are processed:
+        - Header borders and descriptions
+        - Error logs and the tracebacks that follow them
+        - The first timestamp following each header, used to calculate runtimes
+
+    Every other log line is skipped with a prefix check, so only the timestamp of the last
+    skipped line is kept in order to calculate the end time of the log.
+    """
+
+    # Offset of the log type after the datetime of a standard log, such as
+    # "2017-10-30 19:13:32.208116 ", and after the millisecond datetime of an AT2 log, such as
+    # "2017-10-30 19:13:32,208 ", the two formats of VPatterns.TIME_RE_PATTERN
+    STD_TYPE_OFFSET = len("2017-10-30 19:13:32.208116 ")
+    AT2_TYPE_OFFSET = len("2017-10-30 19:13:32,208 ")
+
+    def __init__(self, config_interface):
+        """Initializes ``SummaryFormatter``
+
+        :ivar str last_time_log: Last skipped log line starting with a timestamp.
+        """
+        super(SummaryFormatter, self).__init__(config_interface)
+        self.last_time_log = None
+
+    def format(self, unf_str):
+        """Process the raw log line if needed for the summary.
+
+        :param str unf_str: Unformatted raw string
+        :rtype: list
+        :returns: Always an empty list as log lines are not displayed.
+        """
+        timestamped = unf_str[:1].isdigit()
+        if not self._summary_log(unf_str, timestamped):
+            self._log_count += 1
+            if timestamped:
+                self.last_time_log = unf_str
+            return []
+
+        if timestamped:
+            self.last_time_log = None
+        super(SummaryFormatter, self).format(unf_str)
+        return []
+
+    def send(self, fmt_logs):
+        """Log lines are not displayed in summary only mode."""
+        pass
+
+    def complete(self):
+        """Prints the summary."""
+        if self.last_time_log:
+            self._store_curr_time(self.last_time_log.rstrip("\n"))
+        super(SummaryFormatter, self).complete()
+
+    def _summary_log(self, unf_str, timestamped):
+        """Return True if the raw log line is needed to generate the summary."""
+        # Headers and tracebacks in progress
+        if self.border_flag or self.traceback_flag:
+            return True
+
+        # Header borders
+        first_char = unf_str[:1]
+        if first_char == "=" or first_char == "-":
+            return True
+
+        if timestamped:
+            # Error logs
+            if unf_str.startswith("ERROR", self.STD_TYPE_OFFSET) \
+                    or unf_str.startswith("ERROR", self.AT2_TYPE_OFFSET):
+                return True
+            # Start time of the log or current header
+            if not self._hm.is_test_start_time_added() \
+                    or isinstance(self._prev_fmt_log, vlogline.Header):
+                return True
+
+        # Start of traceback
+        if self.TRACEBACK_TOKEN in unf_str:
+            return True
+
+        # An error may still be followed by its traceback
+        curr_log = self._lm.current_log
+        return isinstance(curr_log, vlogline.Standard) and curr_log.logtype == VLogType.ERROR
+
+
+class _RawLog(object):
+    """Standard log held as context, only parsed into a ``vlogline.Standard`` once displayed."""
+
+    __slots__ = ("unf_str", "logtype")
+
+    def __init__(self, unf_str, logtype):
+        self.unf_str = unf_str
+        self.logtype = logtype
+
+    def parse(self):
+        return vlogline.Standard(self.unf_str, self.logtype)
+
+
+class ErrorContextFormatter(VFormatter):
+    """Display only errors and tracebacks along with the logs surrounding them.
+
+    Similar to ``grep -C``, each error, critical log or traceback is preceded by the last
+    ``before`` logs and followed by the next ``after`` logs of any type, including types that
+    are not specified to be displayed such as ``DEBUG``.
+    Logs that may precede an error are held in a ring buffer, so memory is bounded by
+    ``before``. Debug, info and notice logs are held as raw strings and only parsed when they
+    are displayed, as most of them never are.
+    Non-contiguous groups of logs are separated by ``GROUP_SEPARATOR``.
+    """
+
+    GROUP_SEPARATOR = "--"
+    # Types of logs that are never errors, as tracebacks are only added to errors and warnings
+    CONTEXT_TYPES = (VLogType.DEBUG, VLogType.INFO, VLogType.NOTICE)
+
+    def __init__(self, config_interface, before=5, after=5):
+        """Initializes ``ErrorContextFormatter``
+
+        :param int before: Number of logs to display before each error.
+        :param int after: Number of logs to display after each error.
+        """
+        super(ErrorContextFormatter, self).__init__(config_interface)
+        # Every log type is processed as any may be displayed as context
+        self._lm = LogManager(display_log_types=list(VLogType))
+        self._before = deque(maxlen=before)
+        self._after = after
+        self._after_remaining = 0
+        self._skipped = False
+        self._displayed = False
+
+    def send(self, fmt_logs):
+        """Prints errors and tracebacks along with the logs surrounding them.
+
+        :param list(``LogLine``|str|None) fmt_logs: The formatted log lines after ``format()``.
+        """
+        output = []
+        for log in fmt_logs:
+            if log is None:
+                continue
+            if self._is_error(log):
+                if self._skipped and self._displayed:
+                    output.append(self.GROUP_SEPARATOR)
+                output.extend(self._parsed(before) for before in self._before)
+                output.append(log)
+                self._before.clear()
+                self._after_remaining = self._after
+                self._skipped = False
+                self._displayed = True
+            elif self._after_remaining > 0:
+                output.append(self._parsed(log))
+                self._after_remaining -= 1
+            else:
+                if len(self._before) == self._before.maxlen:
+                    self._skipped = True
+                self._before.append(log)
+        super(ErrorContextFormatter, self).send(output)
+
+    def _create_log_line(self, unf_str, log_type):
+        """Hold debug, info and notice logs raw, unless their API calls are paired."""
+        if log_type in self.CONTEXT_TYPES and unf_str and not vlogline.Base.FORMAT_API \
+                and self._hm.std_log_in_specified_testcase():
+            self._store_curr_time(unf_str)
+            output = _RawLog(unf_str, log_type)
+            self._prev_fmt_log = output
+            return output
+        return super(ErrorContextFormatter, self)._create_log_line(unf_str, log_type)
+
+    @staticmethod
+    def _parsed(log):
+        return log.parse() if isinstance(log, _RawLog) else log
+
+    @staticmethod
+    def _is_error(log):
+        """Return True if the log is an error, critical log or contains a traceback."""
+        if isinstance(log, vlogline.Traceback):
+            return True
+        if isinstance(log, vlogline.Standard):
+            return log.logtype in (VLogType.ERROR, VLogType.CRITICAL) \
+                or bool(log.get_additional_logs())
+        return False
+
+
+class GrepFormatter(VFormatter):
+    """Display only the logs whose details match a regular expression.
+
+    The details of standard logs and the text of other logs of the types displayed are searched,
+    and each match is prefixed with the path of the headers it's within, such as
+    ``[TsSuite/TcTest/Step 1]``. Tracebacks are displayed with the log they follow.
+
+    The literal substrings every match must contain are found from the parsed pattern. Raw log
+    lines that don't contain them are skipped with substring searches before being parsed,
+    along with the tracebacks that follow them. Headers are always processed.
+    """
+
+    SUMMARY = False
+    STORE_CONTEXT = True
+
+    def __init__(self, config_interface, pattern, ignore_case=False):
+        """Initializes ``GrepFormatter``
+
+        :param str pattern: Regular expression searched for within the details of each log.
+        :param bool ignore_case: Match the pattern regardless of case.
+        :ivar int match_count: Number of logs displayed.
+        """
+        super(GrepFormatter, self).__init__(config_interface)
+        flags = re.IGNORECASE if ignore_case else 0
+        self._regex = re.compile(pattern, flags)
+        self._literals = required_literals(pattern, flags)
+        self._ignore_case = bool(self._regex.flags & re.IGNORECASE)
+        self._skipping = False  # The last log was skipped, so its traceback is skipped as well
+        self._skipping_traceback = False
+        self.match_count = 0
+
+    def format(self, unf_str):
+        """Process the raw log line unless it's ruled out by the literals of the pattern.
+
+        :param str unf_str: Unformatted raw string
+        :rtype: list(``LogLine``|str|None)
+        """
+        if self._skip_log(unf_str):
+            self._log_count += 1
+            return []
+        return super(GrepFormatter, self).format(unf_str)
+
+    def send(self, fmt_logs):
+        """Prints the logs matching the pattern prefixed with the headers they're within.
+
+        :param list(``LogLine``|str|None) fmt_logs: The formatted log lines after ``format()``.
+        """
+        output = []
+        for log in fmt_logs:
+            if isinstance(log, vlogline.Standard):
+                text = log.details.text
+            elif isinstance(log, vlogline.Other):
+                text = log.desc
+            else:
+                continue
+            if self._regex.search(text):
+                path = HeaderManager.context_path(log.context)
+                output.append("[{}] {}".format(path, log) if path else log)
+                self.match_count += 1
+        super(GrepFormatter, self).send(output)
+
+
+    def _skip_log(self, unf_str):
+        """Return True if the raw log line can't be part of a matching log."""
+        # Headers and tracebacks in progress
+        if not self._literals or self.border_flag or self.traceback_flag:
+            return False
+
+        # Header borders
+        first_char = unf_str[:1]
+        if first_char == "=" or first_char == "-":
+            self._skipping = self._skipping_traceback = False
+            return False
+
+        # Tracebacks belong to the previous log
+        if self.TRACEBACK_TOKEN in unf_str:
+            self._skipping_traceback = self._skipping
+            return self._skipping
+        if self._skipping_traceback:
+            if unf_str.strip() and not first_char.isdigit():
+                return True
+            self._skipping_traceback = False
+
+        line = unf_str.lower() if self._ignore_case else unf_str
+        self._skipping = not all(literal in line for literal in self._literals)
+        return self._skipping
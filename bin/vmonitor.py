@@ -0,0 +1,296 @@
+"""Module containing the monitors of live runs: a metrics exporter and a stall watchdog."""
+
+import datetime
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from bin.vutils import VLogType
+
+UNCLASSIFIED = "unclassified"
+
+
+def _escape_label(value):
+    """Return the value escaped as a Prometheus label value."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsExporter(object):
+    """Keeps a Prometheus textfile of the progress of a ``LollygagLogger`` run up to date.
+
+    The file is rewritten every ``interval`` seconds by a separate thread, atomically so the
+    textfile collector of node_exporter never reads a partial file, and once more when the run
+    is complete. The metrics are labeled with the run, so the files of many runs collected on
+    one host can be told apart.
+
+    .. code-block:: python
+
+        exporter = MetricsExporter("/var/lib/node_exporter/suite.prom", run="TsSuite")
+        logger = LollygagLogger(f, VFormatter(config))
+        exporter.install(logger)
+        exporter.start()
+        try:
+            logger.run()
+        finally:
+            exporter.stop()
+    """
+
+    def __init__(self, filepath, run="", interval=10.0, timer=time.time):
+        """
+        :param str filepath: Filepath of the textfile, which should end in ``.prom``.
+        :param str run: Value of the ``run`` label of each metric.
+        :param float interval: Seconds between each rewrite of the textfile.
+        """
+        self._filepath = filepath
+        self._labels = 'run="{}"'.format(_escape_label(run))
+        self._interval = interval
+        self._timer = timer
+        self._logger = None
+        self._hm = None
+        self._thread = None
+        self._stop = threading.Event()
+
+        # Every key is added up front, as the dict is read by the exporter thread
+        self.type_lines = OrderedDict((log_type.name.lower(), 0) for log_type in VLogType)
+        self.type_lines[UNCLASSIFIED] = 0
+        self.line_count = 0
+        self._start = None
+        self._last_line = None
+        self._last_write = None
+        self._last_write_count = 0
+        self._complete = False
+        self._context = {}
+
+    def install(self, logger):
+        """Wrap the reading of the ``LollygagLogger`` and the typing of each of its log lines."""
+        self._logger = logger
+        self._hm = logger.log_formatter._hm
+        logger.stream_handle = self._counted_stream(logger.stream_handle)
+        lm = logger.log_formatter._lm
+        lm.calc_log_type = self._counted_log_type(lm, lm.calc_log_type)
+
+    def _counted_stream(self, stream):
+        timer = self._timer
+        for line in stream:
+            self._last_line = timer()
+            self.line_count += 1
+            yield line
+
+    def _counted_log_type(self, lm, func):
+        type_lines = self.type_lines
+        names = dict((log_type, log_type.name.lower()) for log_type in VLogType)
+
+        def wrapper(unf_str):
+            func(unf_str)
+            if unf_str is not None:
+                type_lines[names.get(lm.curr_log_type, UNCLASSIFIED)] += 1
+        return wrapper
+
+    def start(self):
+        """Write the textfile and start rewriting it every interval."""
+        self._start = self._last_write = self._timer()
+        self.write()
+        self._thread = threading.Thread(target=self._run, name="MetricsExporter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop rewriting the textfile, and write it a last time as complete."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._complete = True
+        self.write()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.write()
+
+    def write(self):
+        """Atomically replace the textfile with the current metrics."""
+        directory = os.path.dirname(os.path.abspath(self._filepath))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".vlogger_metrics_",
+                                        suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.generate_metrics())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self._filepath)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def generate_metrics(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        now = self._timer()
+        lines_per_s = 0.0
+        if self._last_write is not None and now > self._last_write:
+            lines_per_s = (self.line_count - self._last_write_count) / (now - self._last_write)
+        self._last_write, self._last_write_count = now, self.line_count
+
+        output = []
+
+        def add(name, metric_type, help_text, samples):
+            output.append("# HELP vlogger_{} {}".format(name, help_text))
+            output.append("# TYPE vlogger_{} {}".format(name, metric_type))
+            for labels, value in samples:
+                output.append("vlogger_{}{{{}}} {}".format(
+                    name, ",".join([self._labels] + labels), value))
+
+        add("lines_total", "counter", "Log lines read.", [([], self.line_count)])
+        add("type_lines_total", "counter", "Log lines processed by log type.",
+            [(['type="{}"'.format(name)], count) for name, count in list(self.type_lines.items())])
+        add("errors_total", "counter", "ERROR logs processed.",
+            [([], self.type_lines[VLogType.ERROR.name.lower()])])
+        add("tracebacks_total", "counter", "Tracebacks processed.",
+            [([], self.type_lines[VLogType.TRACEBACK.name.lower()])])
+
+        try:
+            context = self._hm.current_context() if self._hm else {}
+        except AttributeError:  # Headers changed by the formatter thread while read
+            context = self._context
+        self._context = context
+        labels = ['{}="{}"'.format(key, _escape_label("" if context.get(key) is None
+                                                      else context[key]))
+                  for key in ("general", "suite", "test_case", "test_case_number", "step")]
+        add("current_header_info", "gauge", "Headers currently running.",
+            [(labels, 1)])
+
+        since_last_line = now - (self._last_line or self._start or now)
+        add("seconds_since_last_line", "gauge", "Seconds since the last log line was read.",
+            [([], round(since_last_line, 3))])
+        queue_depth = self._logger.queue.qsize() if self._logger else 0
+        add("queue_depth", "gauge", "Log lines read but not formatted yet.", [([], queue_depth)])
+        add("lines_per_second", "gauge", "Log lines read per second since the last update.",
+            [([], round(lines_per_s, 1))])
+        add("complete", "gauge", "1 once the run is complete.", [([], int(self._complete))])
+        add("last_update_timestamp_seconds", "gauge", "Time the metrics were last updated.",
+            [([], round(now, 3))])
+        return "\n".join(output) + "\n"
+
+
+class StallWatchdog(object):
+    """Reports when no log line has been read for ``timeout`` seconds.
+
+    The reader thread of a live run blocks until the run writes another line, so a hung step
+    would otherwise go unnoticed. The report names the header currently running and how long
+    it has been running, and is written to stderr, optionally appended to a file and passed
+    to a hook command. Each stall is reported once, until another line is read.
+
+    .. code-block:: python
+
+        watchdog = StallWatchdog(600, hook="notify-send vlogger stalled")
+        watchdog.install(logger)
+        watchdog.start()
+        try:
+            logger.run()
+        finally:
+            watchdog.stop()
+    """
+
+    def __init__(self, timeout, report_file=None, hook=None, output=None, timer=time.time):
+        """
+        :param float timeout: Seconds without a log line before reporting a stall.
+        :param str report_file: Filepath the reports are appended to.
+        :param str hook: Shell command run on each stall, with the report as its stdin and
+            ``VLOGGER_STALL_SECONDS`` and ``VLOGGER_STALL_HEADER`` set.
+        :param output: File the reports are written to, stderr by default.
+        """
+        self._timeout = timeout
+        self._report_file = report_file
+        self._hook = hook
+        self._output = output
+        self._timer = timer
+        self._hm = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_line = None
+        self._header_time = None  # Time the current header was read
+        self._reported = False
+        self.stall_count = 0
+
+    def install(self, logger):
+        """Wrap the reading of the ``LollygagLogger`` and the headers of its formatter."""
+        self._hm = logger.log_formatter._hm
+        logger.stream_handle = self._timed_stream(logger.stream_handle)
+        self._hm.update_current_log = self._timed_header(self._hm.update_current_log)
+
+    def _timed_stream(self, stream):
+        timer = self._timer
+        for line in stream:
+            self._last_line = timer()
+            self._reported = False
+            yield line
+
+    def _timed_header(self, func):
+        def wrapper(fmt_log):
+            self._header_time = self._timer()
+            return func(fmt_log)
+        return wrapper
+
+    def start(self):
+        self._last_line = self._header_time = self._timer()
+        self._thread = threading.Thread(target=self._run, name="StallWatchdog")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(min(self._timeout / 4.0, 1.0)):
+            self.check()
+
+    def check(self):
+        """Report a stall if no line was read within the timeout, and return True if so."""
+        stalled = self._timer() - self._last_line
+        if stalled < self._timeout or self._reported:
+            return False
+        self._reported = True
+        self.stall_count += 1
+        self.report(stalled)
+        return True
+
+    def generate_report(self, stalled):
+        """Return a string describing the stall and the header currently running."""
+        now = self._timer()
+        output = ["Stalled: no log line read for {}".format(
+            datetime.timedelta(seconds=int(stalled)))]
+        try:
+            context = self._hm.current_context() if self._hm else None
+        except AttributeError:  # Headers changed by the formatter thread while read
+            context = None
+        header_path = self._hm.context_path(context) if context else ""
+        if header_path:
+            output.append("  Running: {} for {}".format(
+                header_path, datetime.timedelta(seconds=int(now - self._header_time))))
+            start_time = self._hm.current_header().start_time
+            if start_time:
+                output.append("  Started: {} (log time)".format(start_time))
+        else:
+            output.append("  Running: no header read yet")
+        output.append("  Reported: {}".format(datetime.datetime.fromtimestamp(now)
+                                              .strftime("%Y-%m-%d %H:%M:%S")))
+        return "\n".join(output), header_path
+
+    def report(self, stalled):
+        report, header_path = self.generate_report(stalled)
+        output = self._output or sys.stderr
+        output.write(report + "\n")
+        output.flush()
+        if self._report_file:
+            with open(self._report_file, "a") as f:
+                f.write(report + "\n")
+        if self._hook:
+            env = dict(os.environ)
+            env["VLOGGER_STALL_SECONDS"] = str(int(stalled))
+            env["VLOGGER_STALL_HEADER"] = header_path
+            hook = subprocess.Popen(self._hook, shell=True, stdin=subprocess.PIPE, env=env,
+                                    universal_newlines=True)
+            hook.communicate(report + "\n")
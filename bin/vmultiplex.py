@@ -0,0 +1,162 @@
+"""Module containing the formatting of several live runs in parallel to a single console."""
+
+import os
+import sys
+import threading
+from queue import Full
+
+from bin import vlogline
+from bin.lollygag_logger import COMPLETED_SIGNAL, LollygagLogger
+from bin.vbatch import BatchResult, BatchSummary
+from bin.vformatter import VFormatter
+from bin.vutils import Colorize
+
+
+class OutputMultiplexer(object):
+    """Writes the output of several formatters to one stream, each line with their prefix.
+
+    Each call writes all the lines of one formatted log at once, so the lines of a multi-line
+    log such as a traceback aren't interleaved with the logs of another formatter.
+    """
+
+    def __init__(self, stream=None):
+        self._stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, prefix, text):
+        stream = self._stream or sys.stdout
+        lines = "".join(prefix + line + "\n" for line in text.split("\n"))
+        with self._lock:
+            stream.write(lines)
+            stream.flush()
+
+
+class PrefixedFormatter(VFormatter):
+    """Formatter writing its formatted logs through an ``OutputMultiplexer`` with a prefix.
+
+    The summary written when complete is kept rather than written, so the summaries of each
+    run can be displayed together once all runs are complete.
+    """
+
+    def __init__(self, config_interface, prefix, multiplexer):
+        """Initializes ``PrefixedFormatter``
+
+        :param str prefix: Prefix of each line of output, such as ``[TsSuite] ``.
+        :param OutputMultiplexer multiplexer: Multiplexer shared by the formatters.
+        """
+        super(PrefixedFormatter, self).__init__(config_interface)
+        self._prefix = prefix
+        self._multiplexer = multiplexer
+        self._completing = False
+        self._summary = []
+
+    def complete(self):
+        self.send(self._lm.flush_logs())
+        self._completing = True
+        super(PrefixedFormatter, self).complete()
+
+    @property
+    def summary(self):
+        """Return the summary and statistics written when complete."""
+        return "\n".join(str(output) for output in self._summary).strip("\n")
+
+    def _write_output(self, output):
+        if self._completing:
+            self._summary.append(output)
+        else:
+            self._multiplexer.write(self._prefix, str(output))
+
+
+def suite_name(suite):
+    """Return the name of the suite of a suite path, such as ``TsSuite`` for ``suites/TsSuite``."""
+    return os.path.basename(suite.rstrip("/")).split(".")[-1]
+
+
+def run_suites(suites, config, capture, stream=None):
+    """Run each suite at the same time, writing their formatted logs to one stream.
+
+    Each line is prefixed with the name of its suite, in a color of its own if colored.
+    Once all suites are complete, the summary of each suite is written, followed by a summary
+    combining the headers of every suite.
+
+    :param list(str) suites: Suite paths.
+    :param config: ``VConfigInterface`` of the formatters.
+    :param capture: Function returning the lines of the output of the run of a suite path,
+        such as ``vcapture.capture_vl_run``.
+    :returns: Dict of each suite to its ``BatchResult``.
+    """
+    stream = stream or sys.stdout
+    multiplexer = OutputMultiplexer(stream)
+    names = [suite_name(suite) for suite in suites]
+    width = max(len(name) for name in names)
+
+    max_line_len = vlogline.Base.get_max_line_len()
+    loggers = []
+    for i, name in enumerate(names):
+        prefix = "[{}]".format(name.ljust(width))
+        if vlogline.Base.COLORIZE:
+            prefix = Colorize.prefix_apply(prefix, i)
+        formatter = PrefixedFormatter(config, prefix + " ", multiplexer)
+        loggers.append(LollygagLogger(capture(suites[i]), formatter))
+    # The prefixes are included in the width of the console
+    vlogline.Base.set_max_line_len(vlogline.Base.get_max_line_len() - width - 3)
+
+    results = {}
+    errors = {}
+
+    def fail(suite, e):
+        errors.setdefault(suite, "{}: {}".format(type(e).__name__, e))
+
+    def run(suite, logger):
+        # Errors of the read and format threads of the logger are results of the suite as well
+        read, format_logs = logger.read, logger.format
+
+        def guarded_read():
+            try:
+                read()
+            except Exception as e:
+                fail(suite, e)
+                logger.kill()
+                try:
+                    # Wakes the format thread if it's waiting for another line
+                    logger.queue.put_nowait(COMPLETED_SIGNAL)
+                except Full:
+                    pass  # It stops at the next line instead
+
+        def guarded_format():
+            try:
+                format_logs()
+            except Exception as e:
+                fail(suite, e)
+                logger.kill()  # Stops the read thread
+
+        logger.read, logger.format = guarded_read, guarded_format
+        try:
+            logger.run()
+        except Exception as e:
+            fail(suite, e)
+
+    threads = [threading.Thread(target=run, args=(suite, logger), name=suite)
+               for suite, logger in zip(suites, loggers)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        vlogline.Base.set_max_line_len(max_line_len)
+
+    combined = BatchSummary(title="Combined Summary", unit="suites")
+    for suite, name, logger in zip(suites, names, loggers):
+        formatter = logger.log_formatter
+        if suite in errors:
+            result = BatchResult(None, [], errors[suite])
+        else:
+            result = BatchResult(None, formatter.summary_records(), None)
+        results[suite] = result
+        combined.add(name, result)
+        if formatter.summary:
+            stream.write("\n{}\n{}\n".format(name, formatter.summary))
+    if VFormatter.SUMMARY:
+        stream.write("\n{}\n".format(combined.generate_summary()))
+    return results
@@ -0,0 +1,285 @@
+"""Module containing the profilers of the time and memory used formatting log lines."""
+
+import sys
+import time
+from collections import OrderedDict
+
+from bin.vutils import VLogType
+
+# Stages of the formatter thread, in the order each line passes through them
+STAGES = OrderedDict([
+    ("queue_wait", "Queue wait"),
+    ("header", "_handle_raw_header"),
+    ("log_type", "calc_log_type"),
+    ("traceback", "_handle_raw_traceback"),
+    ("construct", "vlogline construction"),
+    ("render", "__str__ rendering"),
+    ("send", "send (write)"),
+    ("other", "Other format/send"),
+    ("complete", "complete (summary)"),
+])
+
+
+class StageProfiler(object):
+    """Times each stage of formatting a log line, and the cost of each log type.
+
+    The profiler wraps the methods of a single ``LollygagLogger`` and its formatter when
+    installed, so runs without it have no overhead.
+    The reader thread is timed separately from the formatter thread, as they run
+    concurrently: a formatter thread mostly waiting on the queue is bound by reading the log.
+
+    .. code-block:: python
+
+        profiler = StageProfiler()
+        logger = LollygagLogger(f, VFormatter(config))
+        profiler.install(logger)
+        logger.run()
+        sys.stderr.write(profiler.generate_report())
+    """
+
+    def __init__(self, timer=time.perf_counter):
+        self._timer = timer
+        self.times = OrderedDict((stage, 0.0) for stage in STAGES)
+        self.calls = OrderedDict((stage, 0) for stage in STAGES)
+        self.format_time = 0.0  # Total of format() and send() in the formatter thread
+        self.read_time = 0.0
+        self.line_count = 0
+        self.type_lines = OrderedDict()  # Type name -> Number of raw lines
+        self.type_logs = OrderedDict()  # Type name -> Number of logs constructed
+        self.type_times = OrderedDict()  # Type name -> Time to construct and render logs
+        self._start = None
+        self._end = None
+        self._pending_lines = 0  # Lines read that aren't counted as lines of a type yet
+        self._complete_write = 0.0  # Time rendering and writing within complete()
+
+    def install(self, logger):
+        """Wrap the reading, queue and formatter methods of the ``LollygagLogger``."""
+        formatter = logger.log_formatter
+        logger.stream_handle = self._timed_stream(logger.stream_handle)
+        logger.queue.get = self._timed(logger.queue.get, "queue_wait")
+        formatter.complete = self._timed_complete(formatter.complete)
+
+        formatter.format = self._timed_total(formatter.format, count_lines=True)
+        formatter.send = self._timed_total(formatter.send)
+        formatter._handle_raw_header = self._timed(formatter._handle_raw_header, "header")
+        formatter._lm.calc_log_type = self._timed(formatter._lm.calc_log_type, "log_type")
+        formatter._handle_raw_traceback = self._timed(formatter._handle_raw_traceback,
+                                                      "traceback")
+        formatter._display_log = self._counted_display(formatter, formatter._display_log)
+        formatter._create_log_line = self._timed_construct(formatter._create_log_line)
+        formatter._write_output = self._timed_write(formatter._write_output)
+
+    def _timed(self, func, stage):
+        timer, times, calls = self._timer, self.times, self.calls
+
+        def wrapper(*args, **kwargs):
+            start = timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                times[stage] += timer() - start
+                calls[stage] += 1
+        return wrapper
+
+    def _timed_total(self, func, count_lines=False):
+        timer = self._timer
+
+        def wrapper(*args, **kwargs):
+            start = timer()
+            if self._start is None:
+                self._start = start
+            if count_lines:
+                self.line_count += 1
+                self._pending_lines += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.format_time += timer() - start
+        return wrapper
+
+    def _timed_complete(self, func):
+        timer, times = self._timer, self.times
+
+        def wrapper():
+            start = timer()
+            written = times["render"] + times["send"]
+            try:
+                return func()
+            finally:
+                self._end = timer()
+                # The summary is rendered and written within complete(), but timed separately
+                self._complete_write += times["render"] + times["send"] - written
+                times["complete"] += self._end - start - self._complete_write
+                self.calls["complete"] += 1
+        return wrapper
+
+    def _timed_stream(self, stream):
+        timer = self._timer
+        iterator = iter(stream)
+        while True:
+            start = timer()
+            try:
+                line = next(iterator)
+            except StopIteration:
+                self.read_time += timer() - start
+                return
+            self.read_time += timer() - start
+            yield line
+
+    def _counted_display(self, formatter, func):
+        def wrapper(unf_str):
+            displayed = func(unf_str)
+            if not displayed and unf_str is not None:
+                self._add_type(formatter._lm.curr_log_type)
+            return displayed
+        return wrapper
+
+    def _timed_construct(self, func):
+        timer = self._timer
+
+        def wrapper(unf_str, log_type):
+            start = timer()
+            try:
+                return func(unf_str, log_type)
+            finally:
+                elapsed = timer() - start
+                self.times["construct"] += elapsed
+                self.calls["construct"] += 1
+                if unf_str:  # None while the lines of a header or traceback are stored
+                    name = self._add_type(log_type)
+                    self.type_logs[name] = self.type_logs.get(name, 0) + 1
+                    self.type_times[name] = self.type_times.get(name, 0.0) + elapsed
+        return wrapper
+
+    def _timed_write(self, func):
+        timer = self._timer
+
+        def wrapper(output):
+            start = timer()
+            text = str(output)
+            rendered = timer()
+            func(text)
+            end = timer()
+            self.times["render"] += rendered - start
+            self.calls["render"] += 1
+            self.times["send"] += end - rendered
+            self.calls["send"] += 1
+            name = self._type_name(getattr(output, "logtype", None))
+            self.type_times[name] = self.type_times.get(name, 0.0) + rendered - start
+        return wrapper
+
+    def _add_type(self, log_type):
+        """Count the lines read since the last log as lines of the type and return its name.
+
+        Lines of multi-line logs and blank lines are counted as lines of the next log.
+        """
+        name = self._type_name(log_type)
+        self.type_lines[name] = self.type_lines.get(name, 0) + self._pending_lines
+        self._pending_lines = 0
+        return name
+
+    @staticmethod
+    def _type_name(log_type):
+        return log_type.name if isinstance(log_type, VLogType) else "UNCLASSIFIED"
+
+    def generate_report(self):
+        """Return a string with the time share of each stage and the cost of each log type."""
+        if self._pending_lines:
+            self._add_type(None)
+        staged = sum(self.times[stage] for stage in STAGES if stage not in ("queue_wait",
+                                                                            "complete"))
+        staged -= self._complete_write
+        self.times["other"] = max(self.format_time - staged, 0.0)
+        self.calls["other"] = self.line_count
+        formatter_time = self.format_time + self.times["queue_wait"] + self.times["complete"]
+        elapsed = (self._end - self._start) if self._start is not None and self._end else 0.0
+
+        output = ["Profile"]
+        output.append("  {} lines in {:.3f} s ({:.0f} lines/s)".format(
+            self.line_count, elapsed, self.line_count / elapsed if elapsed else 0))
+        output.append("  Reader thread: {:.3f} s reading the log".format(self.read_time))
+        output.append("  Formatter thread: {:.3f} s".format(formatter_time))
+        output.append("    {:<24} {:>10} {:>7} {:>10} {:>9}".format(
+            "Stage", "Time (s)", "Share", "Calls", "us/call"))
+        for stage, label in STAGES.items():
+            stage_time, calls = self.times[stage], self.calls[stage]
+            output.append("    {:<24} {:>10.3f} {:>7.1%} {:>10} {:>9.1f}".format(
+                label, stage_time, stage_time / formatter_time if formatter_time else 0,
+                calls, stage_time / calls * 1e6 if calls else 0))
+
+        output.append("  Log types")
+        output.append("    {:<24} {:>10} {:>10} {:>10} {:>9}".format(
+            "Type", "Lines", "Logs", "Time (s)", "us/log"))
+        names = sorted(set(self.type_lines) | set(self.type_times),
+                       key=lambda name: self.type_times.get(name, 0.0), reverse=True)
+        for name in names:
+            if not self.type_lines.get(name) and not self.type_logs.get(name):
+                continue  # Only blank lines were rendered
+            logs = self.type_logs.get(name, 0)
+            type_time = self.type_times.get(name, 0.0)
+            output.append("    {:<24} {:>10} {:>10} {:>10.3f} {:>9.1f}".format(
+                name, self.type_lines.get(name, 0), logs, type_time,
+                type_time / logs * 1e6 if logs else 0))
+        return "\n".join(output)
+
+
+class MemoryReport(object):
+    """Traces the memory allocated while formatting logs and reports the top allocators.
+
+    Tracing slows formatting down, so it is only started when a report is requested.
+
+    .. code-block:: python
+
+        report = MemoryReport()
+        report.start()
+        LollygagLogger(f, VFormatter(config)).run()
+        sys.stderr.write(report.generate_report())
+    """
+
+    def __init__(self, limit=10, frames=1):
+        """
+        :param int limit: Number of top allocators reported.
+        :param int frames: Number of frames stored for each allocation.
+        """
+        self._limit = limit
+        self._frames = frames
+
+    def start(self):
+        import tracemalloc
+        tracemalloc.start(self._frames)
+
+    def generate_report(self):
+        """Stop tracing and return a string with the top allocators still holding memory."""
+        import tracemalloc
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ])
+        stats = snapshot.statistics("lineno")
+
+        output = ["Memory"]
+        output.append("  Traced: {:.1f} MB current, {:.1f} MB peak".format(
+            current / 1024.0 ** 2, peak / 1024.0 ** 2))
+        output.append("  Peak RSS: {:.1f} MB".format(peak_rss_mb()))
+        output.append("  Top {} allocators".format(self._limit))
+        output.append("    {:>10} {:>10}  {}".format("Size (KB)", "Blocks", "Location"))
+        for stat in stats[:self._limit]:
+            frame = stat.traceback[0]
+            output.append("    {:>10.1f} {:>10}  {}:{}".format(
+                stat.size / 1024.0, stat.count, frame.filename, frame.lineno))
+        return "\n".join(output)
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of the process in MB, 0 if not available."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / (1024.0 ** 2 if sys.platform == "darwin" else 1024.0)
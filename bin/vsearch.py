@@ -0,0 +1,253 @@
+"""Module containing the full-text search index over a directory of VL log files.
+
+Records of each log file are indexed into a SQLite FTS5 table along with the byte offset of
+the record within its file, so matching logs are read and formatted directly from the original
+log files without reparsing them.
+"""
+
+import os
+import re
+import sqlite3
+from collections import namedtuple
+
+from bin import vlogfield
+from bin import vlogline
+from bin.vmanagers import HeaderManager
+from bin.vutils import VLogType, VPatterns
+from bin.vutils import find_logs, header_string, iter_records
+from bin.vviewer import HEADER_CLASSES, ViewFormatter
+
+SearchHit = namedtuple("SearchHit", ["path", "offset", "length", "log_type", "context"])
+
+
+class SearchIndex(object):
+    """Full-text index of the logs within a directory of log files.
+
+    The details text, the exception types of tracebacks and the source modules of each record
+    are indexed, along with the path of the headers the record is within, such as
+    ``TsSuite/TcTest/Step 1``. Headers are indexed by their description.
+
+    Indexing is incremental: only log files that are new or have changed since they were last
+    indexed are indexed, and the entries of removed log files are deleted. Each log file is
+    indexed within its own transaction, so an interrupted update can be resumed.
+    """
+
+    FILENAME = ".vlogger_index.sqlite"
+    BATCH_SIZE = 1000  # Number of entries inserted at once while indexing a log file
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, mtime REAL, at2 INTEGER)""",
+        """CREATE VIRTUAL TABLE IF NOT EXISTS entries USING fts5(
+            details, exception, module, context, type UNINDEXED, file_id UNINDEXED,
+            offset UNINDEXED, length UNINDEXED)""",
+    ]
+
+    def __init__(self, log_dir, db_path=None):
+        """Open the index, creating it if it doesn't exist.
+
+        :param str log_dir: Directory of the log files, which may be within subdirectories.
+        :param str db_path: Filepath of the index, ``FILENAME`` within the directory by default.
+        """
+        self.log_dir = os.path.abspath(log_dir)
+        self.db_path = db_path or os.path.join(self.log_dir, self.FILENAME)
+        self._conn = sqlite3.connect(self.db_path, isolation_level=None)
+        for statement in self.SCHEMA:
+            self._conn.execute(statement)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def update(self, progress=None):
+        """Index the log files that are new or changed, and remove the log files deleted.
+
+        :param progress: Function called with the filepath of each log file before indexing it.
+        :returns: Number of log files indexed and removed.
+        :rtype: (int, int)
+        """
+        indexed = {}
+        for file_id, path, size, mtime in self._conn.execute(
+                "SELECT id, path, size, mtime FROM files"):
+            indexed[path] = (file_id, size, mtime)
+
+        indexed_count = 0
+        for filepath in find_logs(self.log_dir):
+            path = os.path.relpath(filepath, self.log_dir)
+            stat = os.stat(filepath)
+            entry = indexed.pop(path, None)
+            if entry and entry[1:] == (stat.st_size, stat.st_mtime):
+                continue
+            if progress:
+                progress(filepath)
+            self._index_file(path, stat, entry[0] if entry else None)
+            indexed_count += 1
+
+        for file_id, _, _ in indexed.values():
+            self._conn.execute("BEGIN")
+            self._delete_file(file_id)
+            self._conn.execute("COMMIT")
+        return indexed_count, len(indexed)
+
+    def search(self, query, limit=100):
+        """Return the records matching all of the terms of the query in file order.
+
+        Each term is matched as a phrase of whole words, so ``res.core`` matches the module
+        ``res.core``. Records of log files that have changed since they were indexed are
+        excluded. Matches are read in index order until the limit is reached, then only the
+        hits returned are sorted, so a query matching many records doesn't sort them all.
+
+        :param str query: Terms to search for.
+        :param int limit: Max number of hits returned.
+        :rtype: list(SearchHit)
+        """
+        terms = ['"{}"'.format(term.replace('"', '""')) for term in query.split()]
+        if not terms:
+            return []
+        rows = self._conn.execute(
+            """SELECT files.path, files.size, files.mtime, entries.offset, entries.length,
+                      entries.type, entries.context
+               FROM entries JOIN files ON files.id = entries.file_id
+               WHERE entries MATCH ?
+               ORDER BY entries.rowid""", (" ".join(terms),))
+
+        hits = []
+        current = {}  # path -> whether the file is unchanged since it was indexed
+        for path, size, mtime, offset, length, log_type, context in rows:
+            if path not in current:
+                try:
+                    stat = os.stat(os.path.join(self.log_dir, path))
+                    current[path] = (stat.st_size, stat.st_mtime) == (size, mtime)
+                except OSError:
+                    current[path] = False
+            if current[path]:
+                hits.append(SearchHit(path, offset, length, VLogType[log_type], context))
+                if len(hits) >= limit:
+                    break
+        return sorted(hits, key=lambda hit: (hit.path, hit.offset))
+
+    def read_hit(self, hit):
+        """Return the raw lines of the record of the hit from its log file."""
+        with open(os.path.join(self.log_dir, hit.path), "rb") as f:
+            f.seek(hit.offset)
+            data = f.read(hit.length).decode("utf-8", "replace")
+        return data.splitlines(True)
+
+    def is_at2_formatting(self, path):
+        """Return True if the log file of the path was found to use the AT2 format."""
+        row = self._conn.execute("SELECT at2 FROM files WHERE path = ?", (path,)).fetchone()
+        return bool(row and row[0])
+
+    def _index_file(self, path, stat, file_id=None):
+        """Replace the entries of the log file with the entries of its current records."""
+        self._conn.execute("BEGIN")
+        try:
+            if file_id is not None:
+                self._delete_file(file_id)
+            cursor = self._conn.execute(
+                "INSERT INTO files (path, size, mtime) VALUES (?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime))
+            file_id = cursor.lastrowid
+            at2 = self._insert_entries(path, file_id)
+            self._conn.execute("UPDATE files SET at2 = ? WHERE id = ?", (bool(at2), file_id))
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _insert_entries(self, path, file_id):
+        """Insert the entries of the records of the log file, ``BATCH_SIZE`` at a time.
+
+        :returns: Whether the log file uses the AT2 format, None if it has no standard logs.
+        """
+        hm = HeaderManager()
+        at2 = None
+        rows = []
+        with open(os.path.join(self.log_dir, path), "rb") as f:
+            for record in iter_records(f):
+                if record.log_type in HEADER_CLASSES:
+                    try:
+                        header = HEADER_CLASSES[record.log_type](header_string(record.lines))
+                    except (AttributeError, IndexError, ValueError):
+                        continue
+                    hm.update_current_log(header)
+                    details = " ".join(line.strip("=-") for line in record.lines[1:-1])
+                    module = exception = ""
+                else:
+                    if at2 is None and record.log_type in VPatterns.LOG_TYPES:
+                        at2 = bool(re.search(VPatterns.get_at2_time(), record.lines[0]))
+                    details, module, exception = self._parse_record(record, at2)
+                    if not (details or exception):
+                        continue
+                rows.append((details, exception, module,
+                             HeaderManager.context_path(hm.current_context()),
+                             record.log_type.name, file_id, record.offset,
+                             record.end - record.offset))
+                if len(rows) >= self.BATCH_SIZE:
+                    self._insert_rows(rows)
+                    rows = []
+        self._insert_rows(rows)
+        return at2
+
+    def _insert_rows(self, rows):
+        self._conn.executemany(
+            "INSERT INTO entries (details, exception, module, context, type, file_id, offset, "
+            "length) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _parse_record(self, record, at2):
+        """Return the details, source module and traceback exception types of the record."""
+        lines = record.lines
+        details = lines[0].strip()
+        module = ""
+        if record.log_type in VPatterns.LOG_TYPES:
+            tokens = lines[0].split(" ", 4 if at2 else 5)
+            try:
+                module = vlogfield.Source(tokens[3]).module
+                details = tokens[-1]
+            except (IndexError, ValueError):
+                pass
+
+        exceptions = []
+        if record.has_traceback or record.log_type == VLogType.TRACEBACK:
+            starts = [i for i, line in enumerate(lines)
+                      if re.match(VPatterns.get_traceback(), line)]
+            for start, end in zip(starts, starts[1:] + [len(lines)]):
+                try:
+                    traceback = vlogline.Traceback(lines[start:end])
+                except (AttributeError, IndexError, ValueError):
+                    continue
+                exceptions.append(traceback.exception.exception)
+            if record.log_type == VLogType.TRACEBACK:
+                details = ""
+        return details, module, " ".join(e for e in exceptions if e)
+
+    def _delete_file(self, file_id):
+        self._conn.execute("DELETE FROM entries WHERE file_id = ?", (file_id,))
+        self._conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+
+def search(log_dir, query, config_interface, limit=100):
+    """Print the formatted records matching the query within the indexed directory.
+
+    Each hit is preceded by its log file, byte offset and the path of its headers.
+
+    :returns: Number of hits.
+    """
+    formatter = ViewFormatter(config_interface, log_types=list(VLogType))
+    with SearchIndex(log_dir) as index:
+        hits = index.search(query, limit)
+        at2 = None
+        for hit in hits:
+            file_at2 = index.is_at2_formatting(hit.path)
+            if file_at2 != at2:
+                at2 = file_at2
+                config_interface.at2_format(at2)
+            print("{}:{}  {}".format(hit.path, hit.offset, hit.context))
+            for row in formatter.render(index.read_hit(hit)):
+                print(row)
+            print("")
+    return len(hits)
@@ -0,0 +1,67 @@
+"""Module containing the report of the modules imported on startup, from ``-X importtime``."""
+
+import os
+import subprocess
+import sys
+from collections import namedtuple
+
+VLOGGER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "vlogger.py")
+
+ImportTime = namedtuple("ImportTime", ["module", "self_us", "cumulative_us", "depth"])
+
+
+def parse_import_times(output):
+    """Return the ``ImportTime`` of each module listed in the ``-X importtime`` output.
+
+    :param str output: Stderr of a Python process run with ``-X importtime``.
+    :rtype: list(ImportTime)
+    """
+    import_times = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # Column headings
+        name = fields[2].rstrip()
+        module = name.lstrip()
+        depth = (len(name) - len(module) - 1) // 2
+        import_times.append(ImportTime(module, int(fields[0]), int(fields[1]), depth))
+    return import_times
+
+
+def run_import_times(argv, env=None):
+    """Run vlogger.py with the arguments and return the ``ImportTime`` of each module imported.
+
+    The output of the run is discarded.
+
+    :param list(str) argv: Arguments of vlogger.py.
+    :rtype: list(ImportTime)
+    """
+    process = subprocess.Popen([sys.executable, "-X", "importtime", VLOGGER] + list(argv),
+                               stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, env=env, universal_newlines=True)
+    _, stderr = process.communicate()
+    return parse_import_times(stderr)
+
+
+def import_report(argv, limit=20):
+    """Return a string listing the slowest top level imports of running vlogger.py.
+
+    Modules imported by the interpreter before vlogger.py starts, such as ``site``, are
+    included as they add to the startup time as well.
+
+    :param list(str) argv: Arguments of vlogger.py.
+    :param int limit: Max number of modules listed.
+    """
+    import_times = run_import_times(argv)
+    top_level = [t for t in import_times if t.depth == 0]
+    total = sum(t.cumulative_us for t in top_level)
+
+    output = ["Import Report: vlogger.py {}".format(" ".join(argv)).rstrip()]
+    output.append("  {} modules imported in {:.1f} ms".format(len(import_times), total / 1000.0))
+    output.append("  {:>10}  {:>10}  {}".format("self (ms)", "total (ms)", "module"))
+    for t in sorted(top_level, key=lambda t: t.cumulative_us, reverse=True)[:limit]:
+        output.append("  {:>10.1f}  {:>10.1f}  {}".format(
+            t.self_us / 1000.0, t.cumulative_us / 1000.0, t.module))
+    return "\n".join(output)
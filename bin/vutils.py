@@ -1,12 +1,19 @@
 """Module containing VL Utility classes and functions."""
 
+import math
 import re
 import time
 import sys
 import os
+import threading
+from collections import OrderedDict, namedtuple
 
 from enum import Enum
-from colorama import Fore, Back, Style
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
 
 """
 Different conditions of tracebacks:
@@ -87,40 +94,57 @@ class VLogStdFields(Enum):
 
 
 class Colorize:
-    """Provides methods to color logs based on their VLogType."""
-
-    TYPE_COLORS = {
-        'DEBUG': Fore.MAGENTA,
-        'INFO': Fore.BLUE,
-        'NOTICE': Fore.GREEN,
-        'WARNING': Fore.YELLOW,
-        'ERROR': Style.BRIGHT + Fore.RED,
-        'CRITICAL': Style.BRIGHT + Back.RED + Fore.YELLOW,
-        'OTHER': Style.RESET_ALL,
-        'STEP_H': Style.BRIGHT + Fore.MAGENTA,
-        'TEST_CASE_H': Style.BRIGHT + Fore.CYAN,
-        'SUITE_H': Style.BRIGHT + Fore.YELLOW,
-        'GENERAL_H': Style.BRIGHT + Fore.GREEN
-    }
-
-    COLORS = {
-        'traceback-header': Style.BRIGHT + Fore.YELLOW,
-        'traceback-exception': Style.BRIGHT + Fore.RED,
-        'traceback-description': Style.BRIGHT + Fore.YELLOW,
-        'traceback-line-num': Fore.YELLOW,
-        'traceback-filename': Fore.RED,
-        'traceback-funct': Fore.GREEN,
-
-        'json-post': Style.BRIGHT,
-        'api-id': Style.BRIGHT,
-        'api-request': Style.BRIGHT + Back.BLUE + Fore.WHITE,
-        'api-response': Style.BRIGHT + Back.MAGENTA + Fore.WHITE,
-
-        'passed-status': Fore.GREEN,
-        'passed-error-status': Fore.YELLOW,
-        'failed-status': Fore.RED
-    }
+    """Provides methods to color logs based on their VLogType.
+
+    colorama is imported and the colors are loaded the first time a log is colored, so runs
+    without colors don't import it.
+    """
 
+    TYPE_COLORS = None
+    COLORS = None
+    PREFIX_COLORS = None
+    RESET = None
+
+    @classmethod
+    def load_colors(cls):
+        """Load the console colors of each VLogType and color string from colorama."""
+        from colorama import Fore, Back, Style
+
+        cls.TYPE_COLORS = {
+            'DEBUG': Fore.MAGENTA,
+            'INFO': Fore.BLUE,
+            'NOTICE': Fore.GREEN,
+            'WARNING': Fore.YELLOW,
+            'ERROR': Style.BRIGHT + Fore.RED,
+            'CRITICAL': Style.BRIGHT + Back.RED + Fore.YELLOW,
+            'OTHER': Style.RESET_ALL,
+            'STEP_H': Style.BRIGHT + Fore.MAGENTA,
+            'TEST_CASE_H': Style.BRIGHT + Fore.CYAN,
+            'SUITE_H': Style.BRIGHT + Fore.YELLOW,
+            'GENERAL_H': Style.BRIGHT + Fore.GREEN
+        }
+
+        cls.COLORS = {
+            'traceback-header': Style.BRIGHT + Fore.YELLOW,
+            'traceback-exception': Style.BRIGHT + Fore.RED,
+            'traceback-description': Style.BRIGHT + Fore.YELLOW,
+            'traceback-line-num': Fore.YELLOW,
+            'traceback-filename': Fore.RED,
+            'traceback-funct': Fore.GREEN,
+
+            'json-post': Style.BRIGHT,
+            'api-id': Style.BRIGHT,
+            'api-request': Style.BRIGHT + Back.BLUE + Fore.WHITE,
+            'api-response': Style.BRIGHT + Back.MAGENTA + Fore.WHITE,
+
+            'passed-status': Fore.GREEN,
+            'passed-error-status': Fore.YELLOW,
+            'failed-status': Fore.RED
+        }
+        # Prefixes of the output of each suite run in parallel, in turn
+        cls.PREFIX_COLORS = [Fore.CYAN, Fore.MAGENTA, Fore.YELLOW, Fore.GREEN, Fore.BLUE,
+                             Fore.RED]
+        cls.RESET = Style.RESET_ALL
 
     @classmethod
     def apply(cls, text, color_str):
@@ -128,19 +152,32 @@ class Colorize:
 
         Note: Colors correspond to strings found in ``COLORS``.
         """
+        if cls.COLORS is None:
+            cls.load_colors()
         color = cls.COLORS[color_str]
-        return color + text + Style.RESET_ALL
+        return color + text + cls.RESET
 
     @classmethod
     def type_apply(cls, text, type=VLogType.OTHER):
         """Applies the console coloring to the given text based on the given VLogType."""
+        if cls.TYPE_COLORS is None:
+            cls.load_colors()
         color = cls.TYPE_COLORS[type.name]
-        return color + text + Style.RESET_ALL
+        return color + text + cls.RESET
+
+    @classmethod
+    def prefix_apply(cls, text, index):
+        """Applies the console coloring of the prefix of the output of the ``index``th suite."""
+        if cls.PREFIX_COLORS is None:
+            cls.load_colors()
+        return cls.PREFIX_COLORS[index % len(cls.PREFIX_COLORS)] + text + cls.RESET
 
     @classmethod
     def esc_len(cls, log_type):
         """Returns the length of escape characters in a given log line if used ``type_apply``."""
-        return len(cls.TYPE_COLORS[log_type.name]) + len(Style.RESET_ALL)
+        if cls.TYPE_COLORS is None:
+            cls.load_colors()
+        return len(cls.TYPE_COLORS[log_type.name]) + len(cls.RESET)
 
 
 class VPatterns(object):
@@ -161,6 +198,8 @@ class VPatterns(object):
     DETAIL_REQUEST_PATTERN_1 = "^Sending HTTP POST request to server_url: (.*); ({.*}|None).$"
     DETAIL_REQUEST_PATTERN_2 = "^JSON-RPC-POST: method=(.*), url=(.*), id=(\d+)$"
     DETAIL_RESPONSE_PATTERN = "^JSON-RPC-POST response: ({.*})$"
+    # Top level JSON-RPC id found at the start or end of the API payload
+    API_ID_PATTERN = "^{\"id\": (\d+), |, \"id\": (\d+)}$"
 
 
     # Suite Header Patterns
@@ -245,6 +284,11 @@ class VPatterns(object):
         """Return the regex ``str`` used for identifying response api call in the VL details field."""
         return cls.DETAIL_RESPONSE_PATTERN
 
+    @classmethod
+    def get_api_id(cls):
+        """Return the regex ``str`` used for identifying the top level id of an API payload."""
+        return cls.API_ID_PATTERN
+
     @classmethod
     def get_traceback(cls):
         """Return the regex ``str`` used for identifying VL tracebacks."""
@@ -295,6 +339,320 @@ class VPatterns(object):
         return cls.OTHER_PATTERN
 
 
+class LRUCache(object):
+    """Bounded key/value store that evicts the least recently used entry when full.
+
+    Hits and misses are counted so the effectiveness of the cache can be reported.
+    The cache can be shared by formatters running in several threads.
+    """
+
+    def __init__(self, max_size=1024):
+        """Initialize the cache.
+
+        :param int max_size: Max number of entries stored. A size of 0 disables the cache.
+        """
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Return the value stored for key and mark it as most recently used."""
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store the value for key, evicting the least recently used entries if full."""
+        if self._max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries and reset the hit and miss counts."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, value):
+        with self._lock:
+            self._max_size = value
+            while len(self._entries) > max(value, 0):
+                self._entries.popitem(last=False)
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    @property
+    def hit_rate(self):
+        """Return the fraction of lookups that were hits, 0.0 if there were no lookups."""
+        lookups = self._hits + self._misses
+        return float(self._hits) / lookups if lookups else 0.0
+
+
+def required_literals(pattern, flags=0):
+    """Return the literal substrings that every match of the regular expression contains.
+
+    Only runs of literal characters outside of repeats, alternations and character sets are
+    found, so the literals can be used to cheaply rule out lines before running the regex.
+    Literals are lowercase if the pattern ignores case.
+
+    :param str pattern: Regular expression.
+    :param int flags: ``re`` flags the pattern is compiled with.
+    :rtype: list(str)
+    """
+    runs = [""]
+    _literal_runs(sre_parse.parse(pattern, flags), runs)
+    literals = [run for run in runs if run]
+    if re.compile(pattern, flags).flags & re.IGNORECASE:
+        literals = [literal.lower() for literal in literals]
+    return literals
+
+
+def _literal_runs(items, runs):
+    """Append the characters of consecutive literals of the parsed pattern to the last run."""
+    for op, value in items:
+        if op == sre_parse.LITERAL:
+            runs[-1] += chr(value)
+        # Groups without inline flags
+        elif op == sre_parse.SUBPATTERN and not value[-3] and not value[-2]:
+            _literal_runs(value[-1], runs)
+        else:
+            runs.append("")
+
+
+class ApiMethodFilter(object):
+    """Rejects API calls by method name before their payloads are parsed.
+
+    Requests are checked with substring searches for the method name on the raw log line.
+    Responses don't include the method, so the ids of rejected requests are held until
+    their responses are found and rejected as well.
+    """
+
+    REQUEST_TOKENS = ("Sending HTTP POST request", "JSON-RPC-POST: ")
+    RESPONSE_TOKEN = "JSON-RPC-POST response: "
+    REQUEST_PAYLOAD_TOKEN = "; {"
+    REQUEST_ID_PATTERN = re.compile(", id=(\d+)$")
+    API_ID_PATTERN = re.compile(VPatterns.get_api_id())
+
+    def __init__(self, include=None, exclude=None, max_in_flight=10000):
+        """Initialize the filter.
+
+        :param list(str) include: Only API methods listed are accepted if specified.
+        :param list(str) exclude: API methods listed are rejected.
+        :param int max_in_flight: Max number of rejected request ids waiting on a response.
+        """
+        self._include = [self._method_tokens(method) for method in include or []]
+        self._exclude = [self._method_tokens(method) for method in exclude or []]
+        self._max_in_flight = max_in_flight
+        self._rejected_ids = OrderedDict()
+        self._rejected = 0
+
+    def reject(self, unf_str):
+        """Return True if the log line is an API call of a method that is filtered out.
+
+        :param str unf_str: Unformatted VL log line
+        """
+        if self.RESPONSE_TOKEN in unf_str:
+            api_id = self._payload_id(unf_str.split(self.RESPONSE_TOKEN, 1)[1].rstrip())
+            if api_id is not None and self._rejected_ids.pop(api_id, False):
+                self._rejected += 1
+                return True
+            return False
+
+        if not any(token in unf_str for token in self.REQUEST_TOKENS):
+            return False
+
+        rejected = False
+        if self._include:
+            rejected = not any(self._has_method(unf_str, tokens) for tokens in self._include)
+        if not rejected and self._exclude:
+            rejected = any(self._has_method(unf_str, tokens) for tokens in self._exclude)
+
+        if rejected:
+            self._rejected += 1
+            m = self.REQUEST_ID_PATTERN.search(unf_str.rstrip())
+            if m:
+                api_id = m.group(1)
+            else:
+                payload = unf_str.rstrip()[:-1]  # Without the trailing "."
+                start = payload.find(self.REQUEST_PAYLOAD_TOKEN)
+                api_id = self._payload_id(payload[start + 2:]) if start != -1 else None
+            if api_id is not None:
+                self._rejected_ids[api_id] = True
+                if len(self._rejected_ids) > self._max_in_flight:
+                    self._rejected_ids.popitem(last=False)
+        return rejected
+
+    @property
+    def rejected(self):
+        """Return the number of API requests and responses rejected."""
+        return self._rejected
+
+    @classmethod
+    def _payload_id(cls, payload):
+        """Return the top level id of the raw JSON payload as a ``str``, None if not found.
+
+        The payload is only parsed if the id isn't at its start or end.
+        """
+        m = cls.API_ID_PATTERN.search(payload)
+        if m:
+            return m.group(1) or m.group(2)
+        import json
+        try:
+            return str(json.loads(payload)["id"])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    @staticmethod
+    def _method_tokens(method):
+        """Return the strings identifying the method in either API request pattern."""
+        return ('"method": "{}"'.format(method), "method={},".format(method))
+
+    @staticmethod
+    def _has_method(unf_str, tokens):
+        return tokens[0] in unf_str or tokens[1] in unf_str
+
+
+class LatencyHistogram(object):
+    """Records latencies in logarithmic buckets to estimate percentiles in bounded memory.
+
+    Each bucket is ``GROWTH`` times wider than the last, so an estimated percentile is
+    within about 1% of the actual latency regardless of how many latencies are added.
+    """
+
+    GROWTH = 1.01
+    MIN_LATENCY = 0.000001  # Latencies at or below 1us share the first bucket
+
+    def __init__(self):
+        self._buckets = {}
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    def add(self, latency):
+        """Record a latency in seconds."""
+        index = self._bucket_index(latency)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        self._count += 1
+        self._total += latency
+        self._max = max(self._max, latency)
+
+    def percentile(self, percent):
+        """Return the estimated latency in seconds below which ``percent`` of latencies fall."""
+        if not self._count:
+            return 0.0
+        rank = max(1, int(math.ceil(self._count * percent / 100.0)))
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                return min(self._bucket_upper_bound(index), self._max)
+        return self._max
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def mean(self):
+        return self._total / self._count if self._count else 0.0
+
+    @property
+    def max(self):
+        return self._max
+
+    def _bucket_index(self, latency):
+        if latency <= self.MIN_LATENCY:
+            return 0
+        return int(math.ceil(math.log(latency / self.MIN_LATENCY, self.GROWTH)))
+
+    def _bucket_upper_bound(self, index):
+        return self.MIN_LATENCY * self.GROWTH ** index
+
+
+class WriterPool(object):
+    """Buffered file writers with a cap on the number of files open at once.
+
+    Writers are kept open in least recently used order. When the cap is reached the least
+    recently used writer is flushed and closed, and is reopened in append mode if written
+    to again. A file is truncated the first time it's written to by the pool.
+    """
+
+    def __init__(self, max_open=64, buffer_size=65536):
+        """Initialize the pool.
+
+        :param int max_open: Max number of files open at once.
+        :param int buffer_size: Size in bytes of each writer's buffer.
+        """
+        self._max_open = max(max_open, 1)
+        self._buffer_size = buffer_size
+        self._writers = OrderedDict()
+        self._opened = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, filepath, text):
+        """Write text to the file, opening it if necessary."""
+        writer = self._writers.get(filepath)
+        if writer is None:
+            writer = self._open(filepath)
+        else:
+            self._writers.move_to_end(filepath)
+        writer.write(text)
+
+    def close(self):
+        """Flush and close all open writers."""
+        while self._writers:
+            self._writers.popitem(last=False)[1].close()
+
+    @property
+    def filepaths(self):
+        """Return the filepaths written to in the order they were first opened."""
+        return list(self._opened)
+
+    def _open(self, filepath):
+        while len(self._writers) >= self._max_open:
+            self._writers.popitem(last=False)[1].close()
+        mode = "a" if filepath in self._opened else "w"
+        writer = open(filepath, mode, buffering=self._buffer_size)
+        self._opened[filepath] = True
+        self._writers[filepath] = writer
+        return writer
+
+
 def file_parse(file):
 
     tc_regex = "^Test Case (\d+): .*(Tc\w+).*$"
@@ -327,13 +685,104 @@ def file_parse(file):
                     pass
 
 
+RawRecord = namedtuple("RawRecord", ["offset", "end", "log_type", "lines", "has_traceback"])
+
+
+def iter_records(f):
+    """Generate the records of an open binary log file without formatting them.
+
+    A record is the group of raw lines formatted together: a standard log along with any
+    traceback following it, a header along with its borders, or any other line.
+    Headers are typed once their last border is read, and headers that aren't recognized
+    are typed as ``VLogType.OTHER``.
+
+    :param f: Log file opened in binary mode.
+    :returns: ``RawRecord`` of the byte offsets of the start and end of each record, its
+        ``VLogType``, its decoded lines without line endings, and whether it contains a traceback.
+    """
+    record = None  # [offset, log type, lines, has traceback]
+    border = ""
+    in_traceback = False
+    offset = 0
+    for raw_line in f:
+        line = raw_line.decode("utf-8", "replace").rstrip("\r\n")
+        is_border = re.match("={105}|-{105}", line)
+
+        # Header description or last border
+        if border:
+            record[2].append(line)
+            if is_border and line[0] == border:
+                log_type = VLogType.get_type(header_string(record[2]))
+                if log_type not in (VLogType.STEP_H, VLogType.TEST_CASE_H,
+                                    VLogType.SUITE_H, VLogType.GENERAL_H):
+                    log_type = VLogType.OTHER
+                record[1] = log_type
+                border = ""
+        # First border of a header
+        elif is_border:
+            if record:
+                yield RawRecord(record[0], offset, *record[1:])
+            record = [offset, None, [line], False]
+            border = line[0]
+            in_traceback = False
+        # Traceback attached to the current record
+        elif in_traceback and line and VLogType.get_type(line) in (None, VLogType.OTHER):
+            record[2].append(line)
+        else:
+            log_type = VLogType.get_type(line) or VLogType.OTHER
+            in_traceback = log_type == VLogType.TRACEBACK
+            if in_traceback and record:
+                record[2].append(line)
+                record[3] = True
+            else:
+                if record:
+                    yield RawRecord(record[0], offset, *record[1:])
+                record = [offset, log_type, [line], False]
+        offset += len(raw_line)
+
+    if record:
+        yield RawRecord(record[0], offset, record[1] or VLogType.OTHER, *record[2:])
+
+
+# Prefix of the logs formatted by vlogger, saved next to the log files they were formatted from
+OUTPUT_PREFIX = "fmt_"
+
+
+def find_logs(log_dir):
+    """Generate the filepaths of the log files within the directory and its subdirectories.
+
+    Filepaths are generated in sorted order. Hidden directories, the tc_logs directories of
+    extracted test case logs and formatted logs, prefixed with ``OUTPUT_PREFIX``, are skipped.
+    """
+    for root, dirs, files in os.walk(log_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d != "tc_logs")
+        for filename in sorted(files):
+            if filename.endswith(".log") and not filename.startswith(OUTPUT_PREFIX):
+                yield os.path.join(root, filename)
+
+
+def is_at2_formatting(filepath):
+    """Return True if the standard logs of the log file use the AT2 format, None if it has none."""
+    with open(filepath, 'r') as f:
+        for line in f:
+            if re.match(VPatterns.get_std(), line):
+                return bool(re.search(VPatterns.get_at2_time(), line))
+
+
+def header_string(lines):
+    """Return the header string of the raw lines of a header record, as parsed by the
+    ``vlogline`` headers, which is each line of the description enclosed in the border.
+    """
+    border = lines[0][0]
+    return "\n".join(border + line + border for line in lines[1:-1])
+
+
 class ProgressBar(object):
 
     TOTAL_BAR_LENGTH = 65.
 
     def __init__(self, total):
-        _, term_width = os.popen('stty size', 'r').read().split()
-        self.term_width = int(term_width)
+        self.term_width = None  # Read with stty once progress is first displayed
 
         self.last_time = time.time()
         self.begin_time = self.last_time
@@ -346,6 +795,10 @@ class ProgressBar(object):
         if not self.total:
             return
 
+        if self.term_width is None:
+            widths = os.popen('stty size 2>/dev/null', 'r').read().split()
+            self.term_width = int(widths[1]) if widths else 80
+
         if current == 0:
             self.begin_time = time.time()  # Reset for new bar.
 
@@ -0,0 +1,404 @@
+"""Module containing the interactive terminal viewer for VL log files.
+
+Log files are indexed in the background, and only the logs currently on screen are formatted,
+so arbitrarily large logs can be opened and scrolled instantly.
+"""
+
+import bisect
+import curses
+import os
+import threading
+from array import array
+
+from bin import vlogline
+from bin.vformatter import VFormatter
+from bin.vmanagers import HeaderManager, LogManager
+from bin.vutils import LRUCache
+from bin.vutils import VLogType
+from bin.vutils import header_string, iter_records
+
+HEADER_TYPES = [VLogType.STEP_H, VLogType.TEST_CASE_H, VLogType.SUITE_H, VLogType.GENERAL_H]
+HEADER_CLASSES = {
+    VLogType.STEP_H: vlogline.StepHeader,
+    VLogType.TEST_CASE_H: vlogline.TestCaseHeader,
+    VLogType.SUITE_H: vlogline.SuiteHeader,
+    VLogType.GENERAL_H: vlogline.GeneralHeader,
+}
+LOG_TYPES = list(VLogType)
+
+
+class LogIndex(object):
+    """Index of the records within a log file.
+
+    A record is the group of raw lines formatted together: a standard log along with any
+    traceback following it, a header along with its borders, or any other line.
+    The byte offset and log type of each record are stored, along with the headers found,
+    which are added to a ``HeaderManager`` tree.
+    The index can be built in a background thread with ``start()`` while it's being used.
+    """
+
+    def __init__(self, log_file):
+        """Initialize the index.
+
+        :param str log_file: Filepath of the log file to be indexed.
+        """
+        self.log_file = log_file
+        self._offsets = array("Q")
+        self._types = array("B")
+        self._tb_records = set()  # Records that contain a traceback
+        self._hm = HeaderManager()
+        self._header_records = {}  # id of header -> record
+        self._indexed_size = 0
+        self._complete = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def start(self):
+        """Build the index in a background thread."""
+        self._thread = threading.Thread(target=self.build)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def build(self):
+        """Build the index, returning once the entire file is indexed."""
+        with open(self.log_file, "rb") as f:
+            for record in iter_records(f):
+                self._add_record(record)
+        self._complete = True
+
+    def join(self):
+        """Wait for the background thread to complete the index."""
+        if self._thread:
+            self._thread.join()
+
+    @property
+    def complete(self):
+        return self._complete
+
+    @property
+    def indexed_size(self):
+        """Return the number of bytes of the log file indexed so far."""
+        return self._indexed_size
+
+    def record_type(self, record):
+        """Return the ``VLogType`` of the record."""
+        return LOG_TYPES[self._types[record]]
+
+    def has_traceback(self, record):
+        """Return True if the record contains a traceback."""
+        return record in self._tb_records
+
+    def read_record(self, f, record):
+        """Return the raw lines of the record from the open binary file ``f``."""
+        # The end of the last record is updated along with the offsets while indexing
+        with self._lock:
+            start = self._offsets[record]
+            end = self._offsets[record + 1] if record + 1 < len(self) else self._indexed_size
+        f.seek(start)
+        data = f.read(end - start).decode("utf-8", "replace")
+        return data.splitlines(True)
+
+    def header_records(self, types=None):
+        """Return the sorted records of the headers in the ``HeaderManager`` tree.
+
+        :param list(VLogType) types: Types of headers to include, all if not specified.
+        """
+        with self._lock:
+            headers = self._hm.headers()
+            records = [self._header_records[id(header)] for header in headers
+                       if types is None or header.logtype in types]
+        return records
+
+    def _add_record(self, record):
+        """Add the ``RawRecord``, adding headers to the tree."""
+        with self._lock:
+            self._offsets.append(record.offset)
+            self._types.append(LOG_TYPES.index(record.log_type))
+            if record.has_traceback:
+                self._tb_records.add(len(self) - 1)
+            self._indexed_size = record.end
+        if record.log_type in HEADER_CLASSES:
+            try:
+                header = HEADER_CLASSES[record.log_type](header_string(record.lines))
+            except (AttributeError, IndexError, ValueError):
+                return
+            with self._lock:
+                self._hm.update_current_log(header)
+                self._header_records[id(header)] = len(self) - 1
+
+
+class ViewFormatter(VFormatter):
+    """Formatter that renders individual records of a ``LogIndex`` into screen rows."""
+
+    SUMMARY = False
+
+    def __init__(self, config_interface, log_types=None):
+        """Initializes ``ViewFormatter``
+
+        :param list(VLogType) log_types: Types of logs displayed, DISPLAY_LOG_TYPES by default.
+        """
+        super(ViewFormatter, self).__init__(config_interface)
+        self.log_types = log_types or self.DISPLAY_LOG_TYPES
+
+    @property
+    def log_types(self):
+        return self._display_log_types
+
+    @log_types.setter
+    def log_types(self, types):
+        self._display_log_types = list(types)
+        self._lm = LogManager(display_log_types=self._display_log_types)
+
+    def render(self, lines):
+        """Return the formatted rows of the raw lines of a record.
+
+        :param list(str) lines: Raw lines of the record.
+        :rtype: list(str)
+        """
+        fmt_logs = []
+        for line in lines:
+            fmt_logs.extend(self.format(line))
+        fmt_logs.extend(self._lm.flush_logs())
+        # Incomplete headers or tracebacks are displayed as is
+        fmt_logs.extend(self.stored_logs)
+        self._reset()
+
+        rows = []
+        for log in fmt_logs:
+            if log is not None:
+                rows.extend(str(log).split("\n"))
+        return rows
+
+    def _reset(self):
+        """Reset the state carried between logs so the next record is formatted on its own."""
+        self.stored_logs = []
+        self.border_flag = ""
+        self.traceback_flag = False
+        self.tb_leading_char = ""
+        self._hm = HeaderManager()
+        self._lm = LogManager(display_log_types=self._display_log_types)
+
+    def _set_log_len(self):
+        """The max line length is set by the viewer from the window width."""
+        pass
+
+
+class Viewer(object):
+    """Interactive curses viewer that formats only the logs on screen.
+
+    Keys::
+
+        j, Down / k, Up         Scroll one line
+        Space, PgDn / b, PgUp   Scroll one page
+        g, Home / G, End        Go to the start / end of the log
+        n / N                   Next / previous header
+        u / U                   Next / previous suite header
+        c / C                   Next / previous test case header
+        s / S                   Next / previous step header
+        1 - 8                   Toggle DEBUG, INFO, NOTICE, WARNING, ERROR, CRITICAL,
+                                TRACEBACK and OTHER logs
+        9                       Toggle headers
+        q                       Quit
+    """
+
+    TOGGLE_KEYS = dict((str(i + 1), [log_type]) for i, log_type in enumerate(LOG_TYPES[:8]))
+    TOGGLE_KEYS["9"] = HEADER_TYPES
+    HEADER_KEYS = {
+        "n": None,
+        "u": [VLogType.SUITE_H],
+        "c": [VLogType.TEST_CASE_H],
+        "s": [VLogType.STEP_H],
+    }
+    TYPE_ATTRS = {
+        VLogType.DEBUG: (curses.COLOR_MAGENTA, 0),
+        VLogType.INFO: (curses.COLOR_BLUE, 0),
+        VLogType.NOTICE: (curses.COLOR_GREEN, 0),
+        VLogType.WARNING: (curses.COLOR_YELLOW, 0),
+        VLogType.ERROR: (curses.COLOR_RED, curses.A_BOLD),
+        VLogType.CRITICAL: (curses.COLOR_RED, curses.A_BOLD),
+        VLogType.TRACEBACK: (curses.COLOR_RED, 0),
+        VLogType.STEP_H: (curses.COLOR_MAGENTA, curses.A_BOLD),
+        VLogType.TEST_CASE_H: (curses.COLOR_CYAN, curses.A_BOLD),
+        VLogType.SUITE_H: (curses.COLOR_YELLOW, curses.A_BOLD),
+        VLogType.GENERAL_H: (curses.COLOR_GREEN, curses.A_BOLD),
+    }
+    ROW_CACHE_SIZE = 4096
+
+    def __init__(self, log_file, config_interface=None):
+        """Initialize the viewer and start indexing the log file.
+
+        :param str log_file: Filepath of the log file to be viewed.
+        """
+        self._index = LogIndex(log_file)
+        self._formatter = ViewFormatter(config_interface)
+        self._rows = LRUCache(self.ROW_CACHE_SIZE)
+        self._file = open(log_file, "rb")
+        self._top = 0  # Record at the top of the screen
+        self._top_row = 0  # Row of the top record at the top of the screen
+        self._attrs = {}
+
+    def run(self):
+        """Start indexing and display the viewer until it's quit."""
+        vlogline.Base.colorize(False)
+        self._index.start()
+        try:
+            curses.wrapper(self._main)
+        finally:
+            self.close()
+
+    def close(self):
+        self._file.close()
+
+    def rows(self, record):
+        """Return the formatted rows of the record, an empty list if the record isn't displayed."""
+        rows = self._rows.get(record)
+        if rows is None:
+            rows = []
+            if self._index.record_type(record) in self._formatter.log_types \
+                    or self._index.has_traceback(record):
+                rows = self._formatter.render(self._index.read_record(self._file, record))
+            self._rows.put(record, rows)
+        return rows
+
+    def screen(self, height):
+        """Return the rows displayed on a screen of the given height with their record types."""
+        output = []
+        record, row = self._top, self._top_row
+        while len(output) < height and record < len(self._index):
+            rows = self.rows(record)
+            log_type = self._index.record_type(record)
+            output.extend((line, log_type) for line in rows[row:row + height - len(output)])
+            record, row = record + 1, 0
+        return output
+
+    def scroll(self, lines):
+        """Scroll down by the number of rows, or up if negative."""
+        for _ in range(abs(lines)):
+            if lines > 0 and not self._scroll_down():
+                break
+            if lines < 0 and not self._scroll_up():
+                break
+
+    def go_to(self, record):
+        """Display the record at the top of the screen."""
+        self._top = max(min(record, len(self._index) - 1), 0)
+        self._top_row = 0
+
+    def jump_header(self, types=None, forward=True):
+        """Go to the next or previous header of the types, any header if types is None."""
+        records = self._index.header_records(types)
+        if forward:
+            i = bisect.bisect_right(records, self._top)
+            if i < len(records):
+                self.go_to(records[i])
+        else:
+            i = bisect.bisect_left(records, self._top)
+            if i > 0:
+                self.go_to(records[i - 1])
+
+    def toggle_types(self, types):
+        """Toggle whether the log types are displayed."""
+        display_log_types = self._formatter.log_types
+        if all(log_type in display_log_types for log_type in types):
+            display_log_types = [t for t in display_log_types if t not in types]
+        else:
+            display_log_types = display_log_types + list(types)
+        self._formatter.log_types = display_log_types
+        self._rows.clear()
+
+    def resize(self, width):
+        """Format logs to fit the window width."""
+        vlogline.Base.set_max_line_len(width)
+        self._rows.clear()
+
+    def _scroll_down(self):
+        if self._top_row + 1 < len(self.rows(self._top)):
+            self._top_row += 1
+            return True
+        for record in range(self._top + 1, len(self._index)):
+            if self.rows(record):
+                self._top, self._top_row = record, 0
+                return True
+        return False
+
+    def _scroll_up(self):
+        if self._top_row > 0:
+            self._top_row -= 1
+            return True
+        for record in range(self._top - 1, -1, -1):
+            rows = self.rows(record)
+            if rows:
+                self._top, self._top_row = record, len(rows) - 1
+                return True
+        return False
+
+    def _main(self, stdscr):
+        curses.curs_set(0)
+        stdscr.timeout(250)  # Refresh the status while indexing
+        self._init_colors()
+        height, width = stdscr.getmaxyx()
+        self.resize(width - 1)
+        while True:
+            self._draw(stdscr, height, width)
+            key = stdscr.getch()
+            char = chr(key) if 0 <= key < 256 else ""
+            page = height - 2
+            if char == "q":
+                break
+            elif key == curses.KEY_RESIZE:
+                height, width = stdscr.getmaxyx()
+                self.resize(width - 1)
+            elif char == "j" or key == curses.KEY_DOWN:
+                self.scroll(1)
+            elif char == "k" or key == curses.KEY_UP:
+                self.scroll(-1)
+            elif char == " " or key == curses.KEY_NPAGE:
+                self.scroll(page)
+            elif char == "b" or key == curses.KEY_PPAGE:
+                self.scroll(-page)
+            elif char == "g" or key == curses.KEY_HOME:
+                self.go_to(0)
+            elif char == "G" or key == curses.KEY_END:
+                self.go_to(len(self._index) - 1)
+                self.scroll(-page)
+            elif char.lower() in self.HEADER_KEYS:
+                self.jump_header(self.HEADER_KEYS[char.lower()], forward=char.islower())
+            elif char in self.TOGGLE_KEYS:
+                self.toggle_types(self.TOGGLE_KEYS[char])
+
+    def _init_colors(self):
+        if not curses.has_colors():
+            return
+        curses.use_default_colors()
+        for i, (log_type, (color, attr)) in enumerate(self.TYPE_ATTRS.items()):
+            curses.init_pair(i + 1, color, -1)
+            self._attrs[log_type] = curses.color_pair(i + 1) | attr
+
+    def _draw(self, stdscr, height, width):
+        stdscr.erase()
+        for y, (line, log_type) in enumerate(self.screen(height - 1)):
+            stdscr.addnstr(y, 0, line, width - 1, self._attrs.get(log_type, 0))
+        stdscr.addnstr(height - 1, 0, self._status().ljust(width - 1), width - 1,
+                       curses.A_REVERSE)
+        stdscr.refresh()
+
+    def _status(self):
+        display_log_types = self._formatter.log_types
+        toggles = " ".join("%s:%s" % (key, types[0].name[0] if len(types) == 1 else "H")
+                           if all(t in display_log_types for t in types) else "%s:-" % key
+                           for key, types in sorted(self.TOGGLE_KEYS.items()))
+        if self._index.complete:
+            progress = "%d records" % len(self._index)
+        else:
+            size = os.path.getsize(self._index.log_file) or 1
+            progress = "indexing %d%%" % (100 * self._index.indexed_size // size)
+        return " %s | %d/%s | %s | q:quit n/N:header c/C:test case s/S:step " % (
+            os.path.basename(self._index.log_file), self._top + 1, progress, toggles)
+
+
+def view(log_file, config_interface=None):
+    """Open the log file in the interactive terminal viewer."""
+    Viewer(log_file, config_interface).run()
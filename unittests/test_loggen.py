@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+
+from benchmarks.loggen import LogGenerator
+from benchmarks.loggen import parse_size
+from benchmarks.run_benchmarks import compare
+from benchmarks.run_benchmarks import count_lines
+from bin import vlogfield
+from bin import vlogline
+from bin.vformatter import VFormatter
+from bin.vutils import VLogType
+from bin.vutils import is_at2_formatting
+from unittests.test_vmodes import run_formatter
+
+
+class TestLogGenerator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.tmp_dir, "bench.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        vlogline.Base.at2_format(False)
+        vlogfield.Datetime.at2_format(False)
+        VFormatter.display_summary(False)
+        VFormatter.display_log_types(list(VLogType))
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("512KB"), 512 * 1024)
+        self.assertEqual(parse_size("1.5mb"), 1536 * 1024)
+        self.assertEqual(parse_size("10 GB"), 10 * 1024 ** 3)
+        self.assertEqual(parse_size(100), 100)
+        with self.assertRaises(ValueError):
+            parse_size("10TB")
+
+    def test_deterministic(self):
+        other_file = os.path.join(self.tmp_dir, "other.log")
+        LogGenerator(seed=3).write(self.log_file, 50000)
+        LogGenerator(seed=3).write(other_file, 50000)
+        with open(self.log_file) as f, open(other_file) as other:
+            self.assertEqual(f.read(), other.read())
+        self.assertGreaterEqual(os.path.getsize(self.log_file), 50000)
+
+    def format_log(self, at2):
+        LogGenerator(at2=at2).write(self.log_file, 100000)
+        self.assertEqual(is_at2_formatting(self.log_file), at2)
+        vlogline.Base.colorize(False)
+        vlogline.Base.at2_format(at2)
+        vlogfield.Datetime.at2_format(at2)
+        # Headers following logs not displayed are stored before their type is known
+        VFormatter.display_summary(True)
+        VFormatter.display_log_types([t for t in VLogType if t != VLogType.DEBUG])
+        return run_formatter(VFormatter(None), self.log_file)
+
+    def test_format(self):
+        output = self.format_log(at2=False)
+        self.assertIn("Test Summary", output)
+        self.assertIn("Status: Failed at", output)
+        self.assertIn("Starting Step 2 for TcBenchmark0", output)
+
+    def test_format_at2(self):
+        output = self.format_log(at2=True)
+        self.assertIn("Test Summary", output)
+        self.assertNotIn("MainProcess", output)
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_compare(self):
+        baseline = {"results": {"default": OrderedDict([
+            ("lines_per_s", 1000.0), ("peak_rss_mb", 20.0), ("first_line_s", 0.01)])}}
+        results = OrderedDict([("default", OrderedDict([
+            ("lines_per_s", 800.0), ("peak_rss_mb", 21.0), ("first_line_s", 0.005)]))])
+        report, regressions = compare(baseline, results, tolerance=0.1)
+        self.assertEqual(regressions, ["default lines_per_s"])
+        self.assertIn("-20.0%  REGRESSION", report)
+
+    def test_count_lines(self):
+        with tempfile.NamedTemporaryFile("wb", suffix=".log", delete=False) as f:
+            f.write(b"one\ntwo\nthree")
+        self.addCleanup(os.remove, f.name)
+        self.assertEqual(count_lines(f.name), 3)
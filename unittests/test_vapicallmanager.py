@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from bin.vmanagers import ApiCallManager
+from bin import vlogfield
+from bin import vlogline
+
+
+class TestApiCallManager(unittest.TestCase):
+
+    REQUEST = "2017-10-30 19:13:%s DEBUG [res.core:636] [MainProcess:MainThread] " \
+              "Sending HTTP POST request to server_url: https://10.10.10.10:443/json-rpc/10.0; " \
+              "{\"params\": {}, \"method\": \"%s\", \"id\": %d}."
+    RESPONSE = "2017-10-30 19:13:%s DEBUG [res.core:640] [MainProcess:MainThread] " \
+               "JSON-RPC-POST response: {\"id\": %d, \"result\": {}}"
+
+    def setUp(self):
+        vlogline.Base.at2_format(False)
+        vlogfield.Datetime.at2_format(False)
+        vlogline.Base.format_api()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        vlogline.Base.format_api(False)
+        shutil.rmtree(self.tmp_dir)
+
+    def _add(self, manager, line):
+        manager.add_log(vlogline.Standard(line))
+
+    def test_pair_requests(self):
+        manager = ApiCallManager()
+        self._add(manager, self.REQUEST % ("01.000000", "ListVolumes", 1))
+        self._add(manager, self.REQUEST % ("01.500000", "CreateVolume", 2))
+        self._add(manager, self.RESPONSE % ("02.000000", 2))
+        self._add(manager, self.RESPONSE % ("03.000000", 1))
+        self._add(manager, self.RESPONSE % ("04.000000", 3))
+
+        stats = manager.statistics()
+        self.assertEqual(list(stats["methods"]), ["CreateVolume", "ListVolumes"])
+        self.assertEqual(stats["methods"]["CreateVolume"]["count"], 1)
+        self.assertEqual(stats["methods"]["CreateVolume"]["max_ms"], 500.0)
+        self.assertEqual(stats["methods"]["ListVolumes"]["max_ms"], 2000.0)
+        self.assertAlmostEqual(stats["methods"]["ListVolumes"]["p50_ms"], 2000.0, delta=20)
+        self.assertEqual(stats["in_flight_requests"], 0)
+        self.assertEqual(stats["unmatched_responses"], 1)
+        self.assertIn("CreateVolume", manager.generate_summary())
+
+    def test_in_flight_bounded(self):
+        manager = ApiCallManager(max_in_flight=2)
+        for api_id in range(5):
+            self._add(manager, self.REQUEST % ("01.000000", "ListVolumes", api_id))
+        stats = manager.statistics()
+        self.assertEqual(stats["in_flight_requests"], 2)
+        self.assertEqual(stats["unmatched_requests"], 3)
+
+    def test_write_json(self):
+        manager = ApiCallManager()
+        self._add(manager, self.REQUEST % ("01.000000", "ListVolumes", 1))
+        self._add(manager, self.RESPONSE % ("01.250000", 1))
+        filepath = os.path.join(self.tmp_dir, "api.json")
+        manager.write_json(filepath)
+        with open(filepath) as f:
+            stats = json.load(f)
+        self.assertEqual(stats["methods"]["ListVolumes"]["count"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
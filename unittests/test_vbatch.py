@@ -0,0 +1,90 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from bin import vlogfield
+from bin import vlogline
+from bin.vbatch import BatchResult
+from bin.vbatch import BatchSummary
+from bin.vbatch import FileFormatter
+from bin.vbatch import OUTPUT_PREFIX
+from bin.vbatch import batch_logs
+from bin.vbatch import map_logs
+from bin.vformatter import VFormatter
+from bin.vutils import VLogType
+
+SUITE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_test.log")
+
+
+class TestMapLogs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.tmp_dir, "sub"))
+        for name in ["a.log", os.path.join("sub", "b.log"), OUTPUT_PREFIX + "a.log"]:
+            shutil.copy(SUITE_LOG, os.path.join(self.tmp_dir, name))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_batch_logs(self):
+        self.assertEqual(batch_logs(self.tmp_dir), [os.path.join(self.tmp_dir, "a.log"),
+                                                    os.path.join(self.tmp_dir, "sub", "b.log")])
+
+    def test_map_logs(self):
+        log_files = batch_logs(self.tmp_dir)
+        expected = dict((log_file, os.path.getsize(SUITE_LOG)) for log_file in log_files)
+        self.assertEqual(dict(map_logs(os.path.getsize, log_files, processes=2)), expected)
+        self.assertEqual(dict(map_logs(os.path.getsize, log_files, processes=1)), expected)
+
+
+class TestBatchSummary(unittest.TestCase):
+
+    def setUp(self):
+        vlogline.Base.colorize(False)
+        vlogline.Base.at2_format(False)
+        vlogfield.Datetime.at2_format(False)
+        VFormatter.display_summary(True)
+        VFormatter.display_log_types([t for t in VLogType if t != VLogType.DEBUG])
+
+    def tearDown(self):
+        VFormatter.display_summary(False)
+        VFormatter.display_log_types(list(VLogType))
+
+    def format_records(self):
+        output = io.StringIO()
+        formatter = FileFormatter(None, output)
+        with open(SUITE_LOG) as f:
+            for line in f:
+                formatter.send(formatter.format(line))
+        formatter.complete()
+        self.assertIn("Test Summary", output.getvalue())
+        return formatter.summary_records()
+
+    def test_summary_records(self):
+        records = self.format_records()
+        self.assertEqual(records[0]["path"], [])
+        self.assertEqual(records[0]["status"], "Failed")
+        step = records[3]
+        self.assertEqual(step["path"], ["TsSuite: Starting Setup of TsSuite",
+                                        "Test Case 0: Starting Test of TcTest",
+                                        "Step 1: Create a volume."])
+        self.assertEqual(step["status"], "Failed")
+        self.assertEqual(str(step["runtime"]), "0:00:01.350000")
+        self.assertEqual(len(step["exceptions"]), 1)
+
+    def test_merge(self):
+        records = self.format_records()
+        summary = BatchSummary()
+        summary.add("a.log", BatchResult("fmt_a.log", records, None))
+        summary.add("b.log", BatchResult("fmt_b.log", records, None))
+        summary.add("c.log", BatchResult("fmt_c.log", [], "ValueError: bad log"))
+        output = summary.generate_summary()
+        self.assertIn("3 logs: 2 Failed, 1 Error", output)
+        self.assertIn("c.log: Error: ValueError: bad log", output)
+        self.assertEqual(output.count("Step 1: Create a volume."), 1)
+        self.assertIn("Failed in: a.log, b.log", output)
+        self.assertIn("2x ApiCallMethodException: DoesNotExist.", output)
+        self.assertIn("Runtime: avg 0:00:01.350000, max 0:00:01.350000", output)
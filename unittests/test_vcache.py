@@ -0,0 +1,227 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.error import HTTPError
+
+from bin.vcache import AT2LogCache, ExtractionCache, HttpFetcher
+
+
+class TestExtractionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp_dir, "tc_logs")
+        self.source = self._write_source("test.log", "line\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write_source(self, filename, text):
+        source = os.path.join(self.tmp_dir, filename)
+        with open(source, "w") as f:
+            f.write(text)
+        return source
+
+    def _cached_files(self):
+        return sorted(os.listdir(self.cache_dir))
+
+    def test_lookup(self):
+        cache = ExtractionCache(self.cache_dir)
+        self.assertIsNone(cache.lookup("TcTest.log", self.source))
+        with cache.writer("TcTest.log", self.source) as f:
+            f.write("extracted\n")
+        self.assertEqual(ExtractionCache(self.cache_dir).lookup("TcTest.log", self.source),
+                         os.path.join(self.cache_dir, "TcTest.log"))
+
+    def test_interrupted_write(self):
+        cache = ExtractionCache(self.cache_dir)
+        with self.assertRaises(KeyboardInterrupt):
+            with cache.writer("TcTest.log", self.source) as f:
+                f.write("partial")
+                raise KeyboardInterrupt()
+        self.assertIsNone(cache.lookup("TcTest.log", self.source))
+        self.assertEqual(self._cached_files(), [])
+
+    def test_invalidated_source(self):
+        cache = ExtractionCache(self.cache_dir)
+        with cache.writer("TcTest.log", self.source) as f:
+            f.write("extracted\n")
+        other_source = self._write_source("other.log", "line\n")
+        self.assertIsNone(cache.lookup("TcTest.log", other_source))
+        self._write_source("test.log", "line\nappended\n")
+        self.assertIsNone(ExtractionCache(self.cache_dir).lookup("TcTest.log", self.source))
+
+    def test_eviction(self):
+        cache = ExtractionCache(self.cache_dir, max_size=20)
+        for name in ("Tc1.log", "Tc2.log", "Tc3.log"):
+            with cache.writer(name, self.source) as f:
+                f.write("x" * 8)
+            cache.lookup("Tc1.log", self.source)
+        self.assertEqual(self._cached_files(), [".manifest.json", "Tc1.log", "Tc3.log"])
+        self.assertEqual(cache.total_size, 16)
+
+    def test_stale_temp_files(self):
+        os.makedirs(self.cache_dir)
+        stale = os.path.join(self.cache_dir, ".TcTest.log.%d.abc.tmp" % (2 ** 22 + 1))
+        writing = os.path.join(self.cache_dir, ".TcOther.log.%d.abc.tmp" % os.getpid())
+        for path in (stale, writing):
+            open(path, "w").close()
+        ExtractionCache(self.cache_dir)
+        self.assertEqual(self._cached_files(), [os.path.basename(writing)])
+
+    def test_shared_manifest(self):
+        first = ExtractionCache(self.cache_dir)
+        second = ExtractionCache(self.cache_dir)
+        with first.writer("Tc1.log", self.source) as f:
+            f.write("first\n")
+        with second.writer("Tc2.log", self.source) as f:
+            f.write("second\n")
+        cache = ExtractionCache(self.cache_dir)
+        self.assertIsNotNone(cache.lookup("Tc1.log", self.source))
+        self.assertIsNotNone(cache.lookup("Tc2.log", self.source))
+
+
+class _At2Handler(BaseHTTPRequestHandler):
+    """Serves the logs of the server at /steps/<step_id>/log, counting the requests."""
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        step_id = self.path.split("/")[2]
+        if step_id not in self.server.logs:
+            self.send_error(404)
+            return
+        body = self.server.logs[step_id].encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAT2LogCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.server = HTTPServer(("127.0.0.1", 0), _At2Handler)
+        self.server.logs = {"1": "step one\n" * 10, "2": "step two\n" * 10,
+                            "3": "step one\n" * 10}
+        self.server.requests = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.fetch = HttpFetcher("http://127.0.0.1:{}/steps/{{step_id}}/log".format(
+            self.server.server_address[1]), timeout=5)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_hit(self):
+        cache = AT2LogCache(self.tmp_dir)
+        filepath = cache.get("1", self.fetch)
+        with open(filepath) as f:
+            self.assertEqual(f.read(), self.server.logs["1"])
+        self.assertEqual(os.path.basename(filepath), "1.log")
+
+        # Another run reads the log locally
+        cache = AT2LogCache(self.tmp_dir)
+        self.assertEqual(cache.get("1", self.fetch), filepath)
+        self.assertEqual(self.server.requests, ["/steps/1/log"])
+        self.assertEqual((cache.stats["hits"], cache.stats["misses"]), (1, 1))
+        self.assertIn("1 hits, 1 misses (50.0% hit rate)", cache.generate_statistics())
+
+    def test_refresh(self):
+        cache = AT2LogCache(self.tmp_dir)
+        cache.get("1", self.fetch)
+        self.server.logs["1"] = "rerun\n"
+        with open(cache.get("1", self.fetch, refresh=True)) as f:
+            self.assertEqual(f.read(), "rerun\n")
+        self.assertEqual(len(self.server.requests), 2)
+        # The log it replaced is removed
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp_dir, "objects"))), 1)
+
+    def test_content_addressed(self):
+        cache = AT2LogCache(self.tmp_dir)
+        cache.get("1", self.fetch)
+        cache.get("3", self.fetch)
+        # Steps with the same log share one stored log
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp_dir, "objects"))), 1)
+        self.assertEqual(cache.total_size, len(self.server.logs["1"]))
+
+    def test_evict(self):
+        size = len(self.server.logs["1"])
+        cache = AT2LogCache(self.tmp_dir, max_size=size)
+        cache.get("1", self.fetch)
+        cache.get("2", self.fetch)
+        self.assertIsNone(cache.lookup("1"))
+        self.assertFalse(os.path.exists(os.path.dirname(cache.path("1"))))
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp_dir, "objects"))), 1)
+        self.assertEqual(cache.total_size, size)
+        self.assertEqual(cache.stats["evictions"], 1)
+
+    def test_evict_keeps_outputs(self):
+        size = len(self.server.logs["1"])
+        cache = AT2LogCache(self.tmp_dir, max_size=size)
+        step_dir = os.path.dirname(cache.get("1", self.fetch))
+        open(os.path.join(step_dir, "fmt_1.log"), "w").close()
+        cache.get("2", self.fetch)
+        self.assertIsNone(cache.lookup("1"))
+        self.assertEqual(os.listdir(step_dir), ["fmt_1.log"])
+
+    def test_leftover_link(self):
+        cache = AT2LogCache(self.tmp_dir)
+        os.makedirs(os.path.dirname(cache.path("1")))
+        with open(cache.path("1") + ".tmp", "w") as f:
+            f.write("partial")
+        filepath = cache.get("1", self.fetch)
+        self.assertEqual(os.stat(filepath).st_nlink, 2)
+        self.assertEqual(os.listdir(os.path.dirname(filepath)), ["1.log"])
+
+    def test_shared_index(self):
+        first = AT2LogCache(self.tmp_dir)
+        second = AT2LogCache(self.tmp_dir)
+        first.get("1", self.fetch)
+        second.get("2", self.fetch)
+        cache = AT2LogCache(self.tmp_dir)
+        self.assertIsNotNone(cache.lookup("1"))
+        self.assertIsNotNone(cache.lookup("2"))
+        self.assertEqual(cache.stats["misses"], 2)
+
+    def test_stale_files(self):
+        cache = AT2LogCache(self.tmp_dir)
+        cache.get("1", self.fetch)
+        objects_dir = os.path.join(self.tmp_dir, "objects")
+        for name in (".fetch.%d.abc.tmp" % (2 ** 22 + 1), "unused.log"):
+            open(os.path.join(objects_dir, name), "w").close()
+        AT2LogCache(self.tmp_dir)
+        self.assertEqual(len(os.listdir(objects_dir)), 1)
+        self.assertIsNotNone(AT2LogCache(self.tmp_dir).lookup("1"))
+
+    def test_lru(self):
+        size = len(self.server.logs["1"])
+        cache = AT2LogCache(self.tmp_dir, max_size=size * 2)
+        cache.get("1", self.fetch)
+        cache.get("2", self.fetch)
+        cache.get("1", self.fetch)
+        self.server.logs["4"] = "step 4th\n" * 10
+        cache.get("4", self.fetch)
+        self.assertIsNotNone(cache.lookup("1"))
+        self.assertIsNone(cache.lookup("2"))
+
+    def test_failed_fetch(self):
+        cache = AT2LogCache(self.tmp_dir)
+        with self.assertRaises(HTTPError):
+            cache.get("5", self.fetch)
+        self.assertIsNone(cache.lookup("5"))
+        self.assertEqual(os.listdir(os.path.join(self.tmp_dir, "objects")), [])
+        self.assertEqual(cache.stats["misses"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
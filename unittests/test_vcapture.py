@@ -0,0 +1,44 @@
+import sys
+import time
+import unittest
+
+from bin.vcapture import PtyCapture
+from bin.vcapture import decode_lines
+
+
+class TestDecodeLines(unittest.TestCase):
+
+    def test_split_chunks(self):
+        text = "café ok\r\nsecond\nthird".encode("utf-8")
+        chunks = [text[i:i + 1] for i in range(len(text))]  # Splits the two bytes of é
+        self.assertEqual(list(decode_lines(chunks)), ["café ok\n", "second\n", "third"])
+
+    def test_errors(self):
+        chunks = [b"bad \xff byte\n", b"\xe2\x82"]  # Truncated character at the end
+        self.assertEqual(list(decode_lines(chunks)), ["bad � byte\n", "�"])
+        with self.assertRaises(UnicodeDecodeError):
+            list(decode_lines(chunks, errors="strict"))
+
+
+class TestPtyCapture(unittest.TestCase):
+
+    def test_lines(self):
+        script = "import sys; print(sys.stdout.isatty()); print('café'); sys.stdout.write('end')"
+        capture = PtyCapture([sys.executable, "-c", script])
+        self.assertEqual(list(capture), ["True\n", "café\n", "end"])
+        self.assertEqual(capture.returncode, 0)
+
+    def test_latency(self):
+        # Through a pipe, the line would only arrive once the command exits
+        script = "import time; print('first'); time.sleep(2)"
+        start = time.time()
+        with PtyCapture([sys.executable, "-c", script]) as capture:
+            for line in capture:
+                self.assertEqual(line, "first\n")
+                self.assertLess(time.time() - start, 1.5)
+                break
+            capture.terminate()
+
+
+if __name__ == '__main__':
+    unittest.main()
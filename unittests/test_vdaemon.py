@@ -0,0 +1,66 @@
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+
+from bin import vdaemon
+
+
+def _main(argv):
+    print("cwd {}".format(os.getcwd()))
+    print("columns {}".format(os.environ.get("COLUMNS")))
+    sys.stderr.write("argv {}\n".format(" ".join(argv)))
+    if argv and argv[0] == "fail":
+        raise ValueError("failed")
+    sys.exit(len(argv))
+
+
+class TestDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, "vlogger.sock")
+        self.server = vdaemon.make_server(self.socket_path, _main)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.tmp_dir)
+
+    def request(self, argv):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.socket_path)
+        request = {"argv": argv, "cwd": self.tmp_dir, "columns": 120}
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        rfile = sock.makefile("rb")
+        frames = {}
+        while True:
+            frame = vdaemon.recv_frame(rfile)
+            if frame is None:
+                break
+            frames[frame[0]] = frames.get(frame[0], b"") + frame[1]
+        sock.close()
+        return frames
+
+    def test_request(self):
+        frames = self.request(["a.log", "-s"])
+        cwd = os.path.realpath(self.tmp_dir)
+        self.assertEqual(frames[vdaemon.STDOUT].decode("utf-8"),
+                         "cwd {}\ncolumns 120\n".format(cwd))
+        self.assertEqual(frames[vdaemon.STDERR], b"argv a.log -s\n")
+        self.assertEqual(frames[vdaemon.EXIT], b"2")
+
+    def test_socket_permissions(self):
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o777, 0o600)
+
+    def test_request_exception(self):
+        frames = self.request(["fail"])
+        self.assertIn(b"ValueError: failed", frames[vdaemon.STDERR])
+        self.assertEqual(frames[vdaemon.EXIT], b"1")
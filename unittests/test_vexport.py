@@ -0,0 +1,126 @@
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from bin import vlogfield
+from bin import vlogline
+from bin.vexport import NdjsonFormatter
+from bin.vexport import SqliteFormatter
+
+SUITE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_test.log")
+
+
+class TestNdjsonFormatter(unittest.TestCase):
+
+    def setUp(self):
+        vlogline.Base.colorize(False)
+        vlogline.Base.format_api(True)
+        vlogline.Base.at2_format(False)
+        vlogfield.Datetime.at2_format(False)
+        output = io.StringIO()
+        formatter = NdjsonFormatter(None, stream=output)
+        with open(SUITE_LOG) as f:
+            for line in f:
+                formatter.send(formatter.format(line))
+        formatter.complete()
+        self.records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.record_count = formatter.record_count
+
+    def tearDown(self):
+        vlogline.Base.format_api(False)
+
+    def test_records(self):
+        self.assertEqual(len(self.records), self.record_count)
+        self.assertEqual([record["type"] for record in self.records[:5]],
+                         ["SUITE_H", "INFO", "TEST_CASE_H", "INFO", "STEP_H"])
+        self.assertEqual(self.records[-1]["details"], "done")
+        self.assertEqual(self.records[-1]["context"]["general"], "Final Report")
+
+    def test_standard_record(self):
+        record = self.records[1]
+        self.assertEqual(record["timestamp"], "2017-10-30T19:13:00.151000")
+        self.assertEqual(record["source"], {"module": "suite.setup", "line": 10})
+        self.assertEqual(record["thread"], {"process": "MainProcess", "thread": "MainThread"})
+        self.assertEqual(record["context"]["suite"], "TsSuite")
+        self.assertIsNone(record["context"]["test_case"])
+
+    def test_api_record(self):
+        request = [r for r in self.records if r.get("api", {}).get("method") == "CreateVolume"][0]
+        self.assertEqual(request["api"]["id"], 20)
+        self.assertEqual(request["api"]["params"], {"name": "v1"})
+        response = [r for r in self.records
+                    if r.get("api", {}).get("call") == "response" and r["api"]["id"] == 20][0]
+        self.assertEqual(response["api"]["result"], {"volumeID": 3})
+
+    def test_traceback_record(self):
+        error = [record for record in self.records if record["type"] == "ERROR"][0]
+        self.assertEqual(error["context"]["test_case"], "TcTest")
+        self.assertEqual(error["context"]["step"], 1)
+        traceback = error["tracebacks"][0]
+        self.assertEqual(traceback["frames"][0]["function"], "_call_cluster_api")
+        self.assertEqual(traceback["exception"]["type"], "ApiCallMethodException")
+
+
+class TestSqliteFormatter(unittest.TestCase):
+
+    def setUp(self):
+        vlogline.Base.colorize(False)
+        vlogline.Base.format_api(True)
+        vlogline.Base.at2_format(False)
+        vlogfield.Datetime.at2_format(False)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "logs.sqlite")
+        for _ in range(2):
+            formatter = SqliteFormatter(None, self.db_path, source=SUITE_LOG)
+            formatter.BATCH_SIZE = 4
+            with open(SUITE_LOG) as f:
+                for line in f:
+                    formatter.send(formatter.format(line))
+            formatter.complete()
+        self.conn = sqlite3.connect(self.db_path)
+
+    def tearDown(self):
+        vlogline.Base.format_api(False)
+        self.conn.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def query(self, sql, *params):
+        return self.conn.execute(sql, params).fetchall()
+
+    def test_runs(self):
+        self.assertEqual(self.query("SELECT id, record_count FROM runs"), [(1, 23), (2, 23)])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM logs WHERE run_id = 2"), [(16,)])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM headers WHERE run_id = 2"), [(7,)])
+
+    def test_headers(self):
+        self.assertEqual(self.query(
+            "SELECT path, type, parent_seq, start_time, end_time FROM headers "
+            "WHERE run_id = 1 AND name = 'TcTest' AND number = 2"),
+            [("TsSuite/TcTest/Step 2", "STEP_H", 1,
+              "2017-10-30T19:13:01.801000", "2017-10-30T19:13:01.951000")])
+
+    def test_logs(self):
+        self.assertEqual(self.query(
+            "SELECT path, module, line, details FROM errors WHERE run_id = 1"),
+            [("TsSuite/TcTest/Step 1", "tc", 50, "Something failed")])
+        self.assertEqual(self.query(
+            "SELECT exception, file, function FROM tracebacks "
+            "JOIN traceback_frames USING (run_id, log_seq) WHERE run_id = 2"),
+            [("ApiCallMethodException", "/home/http_utils.py", "_call_cluster_api")])
+        self.assertEqual(self.query(
+            "SELECT payload FROM api_calls WHERE run_id = 1 AND method = 'CreateVolume'"),
+            [('{"name": "v1"}',)])
+
+    def test_indexes(self):
+        indexes = [row[0] for row in self.query("SELECT name FROM sqlite_master "
+                                                "WHERE type = 'index' AND sql IS NOT NULL")]
+        self.assertEqual(sorted(indexes), sorted(index.split()[5]
+                                                 for index in SqliteFormatter.INDEXES))
+
+
+if __name__ == '__main__':
+    unittest.main()
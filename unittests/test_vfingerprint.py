@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from bin import vlogline
+from bin.vfingerprint import ExceptionClusters
+from bin.vfingerprint import cluster_logs
+from bin.vfingerprint import fingerprint
+from bin.vfingerprint import fingerprint_log
+
+SUITE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_test.log")
+COLOR_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "color_test.log")
+
+TRACEBACK = ["Traceback (most recent call last):",
+             '  File "/builds/1234/http_utils.py", line %d, in _call_cluster_api',
+             "    check_json_rpc_response(json_response, retry_faults, method)",
+             "ApiCallMethodException: DoesNotExist. JSON response: {u'id': %d}"]
+
+
+def create_traceback(build, line_num, api_id):
+    lines = list(TRACEBACK)
+    lines[1] = lines[1].replace("1234", str(build)) % line_num
+    lines[3] = lines[3] % api_id
+    return vlogline.Traceback(lines)
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def test_ignores_line_numbers_and_ids(self):
+        self.assertEqual(fingerprint(create_traceback(1234, 1078, 63)),
+                         fingerprint(create_traceback(987, 1080, 64)))
+
+    def test_exception_and_frames(self):
+        traceback = create_traceback(1234, 1078, 63)
+        other = vlogline.Traceback([line.replace("ApiCallMethodException", "KeyError")
+                                    for line in TRACEBACK[:3]] + ["KeyError: 'id'"])
+        self.assertNotEqual(fingerprint(traceback), fingerprint(other))
+
+
+class TestExceptionClusters(unittest.TestCase):
+
+    def setUp(self):
+        vlogline.Base.at2_format(False)
+        self.tmp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.tmp_dir, "sub"))
+        shutil.copy(SUITE_LOG, os.path.join(self.tmp_dir, "suite.log"))
+        shutil.copy(SUITE_LOG, os.path.join(self.tmp_dir, "sub", "suite.log"))
+        shutil.copy(COLOR_LOG, os.path.join(self.tmp_dir, "sub", "color.log"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_fingerprint_log(self):
+        clusters = fingerprint_log(SUITE_LOG, "suite.log")
+        self.assertEqual(len(clusters), 1)
+        cluster = list(clusters)[0]
+        self.assertEqual(cluster.exception, "ApiCallMethodException")
+        self.assertEqual(cluster.frames, [("/home/http_utils.py", "_call_cluster_api")])
+        self.assertEqual(cluster.first_seen.context, "TsSuite/TcTest/Step 1")
+        self.assertEqual(str(cluster.first_seen.time), "2017-10-30 19:13:01.651000")
+
+    def test_merge(self):
+        clusters = ExceptionClusters()
+        for name in ["a.log", "b.log"]:
+            clusters.merge(fingerprint_log(SUITE_LOG, name))
+        self.assertEqual(clusters.log_count, 2)
+        self.assertEqual(clusters.traceback_count, 2)
+        cluster = list(clusters)[0]
+        self.assertEqual(cluster.log_files, set(["a.log", "b.log"]))
+        self.assertEqual([location.log_file for location in cluster.examples],
+                         ["a.log", "b.log"])
+
+    def test_cluster_logs(self):
+        clusters = cluster_logs(self.tmp_dir, processes=2)
+        self.assertEqual(clusters.log_count, 3)
+        self.assertEqual([cluster.count for cluster in clusters], [2, 1])
+        self.assertEqual(clusters.generate_report(),
+                         cluster_logs(self.tmp_dir, processes=1).generate_report())
+        self.assertIn("3 tracebacks in 2 clusters across 3 logs", clusters.generate_report())
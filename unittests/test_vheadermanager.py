@@ -1,7 +1,7 @@
 import unittest
 
-from datetime import datetime
-from bin.vutils import VLogStdFields
+from datetime import datetime, timedelta
+from bin.vutils import VLogStdFields, VLogType
 
 from bin.vmanagers import HeaderManager
 from bin import vlogline
@@ -64,5 +64,86 @@ class TestHeaderManager(unittest.TestCase):
 
         print("".join(["\n\n", headman.generate_summary()]))
 
+    def _add_run(self, headman):
+        """Add suites of test cases and steps with errors, some followed by tracebacks."""
+        time = datetime(2018, 5, 8, 13, 33, 22, 984875)
+        headman.start_time(time, root=True)
+        for suite_num in range(3):
+            time += timedelta(seconds=1)
+            headman.add_suite(vlogline.SuiteHeader(
+                "=Test Suite: Starting Setup of TsSuite%d=" % suite_num))
+            headman.start_time(time)
+            for tc_num in range(4):
+                time += timedelta(seconds=1)
+                headman.add_testcase(vlogline.TestCaseHeader(
+                    "=Test Case %d: Starting Test of TcTest=" % tc_num))
+                headman.start_time(time)
+                for step_num in range(3):
+                    time += timedelta(seconds=1)
+                    headman.add_step(vlogline.StepHeader(
+                        "-Starting Step %d for TcTest: Verify Something\n"
+                        "Expect: Something else-" % step_num))
+                    headman.start_time(time)
+                    if (suite_num + tc_num + step_num) % 4 == 0:
+                        error = vlogline.Standard(
+                            time.strftime("%Y-%m-%d %H:%M:%S.%f") +
+                            " ERROR [res.core:1] [MainProcess:MainThread] Failed", VLogType.ERROR)
+                        if step_num % 2:
+                            error.add_additional_logs(vlogline.Traceback([
+                                "Traceback (most recent call last):",
+                                '  File "test.py", line 1, in test',
+                                "    verify()",
+                                "AssertionError: Step %d failed" % step_num]))
+                        headman.add_error(error)
+        headman.add_general(vlogline.GeneralHeader("=Final Report="))
+        headman.start_time(time + timedelta(seconds=1))
+        headman.end_time(time + timedelta(seconds=2), root=True)
+
+    def test_spilled_summary(self):
+        headman = HeaderManager()
+        self._add_run(headman)
+        spilled_headman = HeaderManager(max_headers=5)
+        self._add_run(spilled_headman)
+
+        self.assertLessEqual(len(spilled_headman._header_tree), 6)
+        self.assertEqual(headman.generate_summary(), spilled_headman.generate_summary())
+        self.assertEqual(headman.summary_records(), spilled_headman.summary_records())
+
+    def test_max_errors(self):
+        vlogline.Header.max_errors(2)
+        self.addCleanup(vlogline.Header.max_errors, 0)
+        headman = HeaderManager()
+        headman.start_time(datetime(2018, 5, 8, 13, 33, 22), root=True)
+        headman.add_testcase(vlogline.TestCaseHeader("=Test Case 0: Starting Test of TcTest="))
+        for i in range(4):
+            error = vlogline.Standard("2018-05-08 13:33:2%d.000000 ERROR [res.core:1] "
+                                      "[MainProcess:MainThread] Failed" % i, VLogType.ERROR)
+            headman.add_error(error)
+            if i == 2:
+                # Tracebacks are added after the error, even if it isn't stored by the header
+                error.add_additional_logs(vlogline.Traceback([
+                    "Traceback (most recent call last):", "AssertionError: Failed"]))
+
+        summary = headman.generate_summary()
+        self.assertIn("Status: Failed at 13:33:20.000000, 13:33:21.000000 and 2 more", summary)
+        self.assertEqual(headman.summary_records()[1]["errors"], 4)
+        self.assertEqual(len(headman.current_header().errors), 2)
+
+    def test_context_of_second_suite(self):
+        headman = HeaderManager()
+        headman.add_suite(vlogline.SuiteHeader("=Test Suite: Starting Setup of TsFirst="))
+        headman.add_testcase(vlogline.TestCaseHeader("=Test Case 0: Starting Test of TcTest="))
+        headman.add_step(vlogline.StepHeader("-Starting Step 1 for TcTest: Verify Something\n"
+                                             "Expect: Something else-"))
+        headman.add_suite(vlogline.SuiteHeader("=Test Suite: Starting Setup of TsSecond="))
+        context = headman.current_context()
+        self.assertEqual(context["suite"], "TsSecond")
+        self.assertEqual((context["test_case"], context["step"]), (None, None))
+
+        headman.add_testcase(vlogline.TestCaseHeader("=Test Case 1: Starting Test of TcOther="))
+        context = headman.current_context()
+        self.assertEqual((context["test_case"], context["step"]), ("TcOther", None))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -67,6 +67,59 @@ class TestFieldCreation(unittest.TestCase):
         response_log.format_api_calls()
         self.assertEqual(str(response_log), display_response)
 
+    def test_api_format_cache(self):
+        api_response = """JSON-RPC-POST response: {"id": %d, "result": {"asyncResultIDs": [], """ \
+                       """"status": "running"}}"""
+        vlogfield.Details.API_CACHE.clear()
+
+        first = vlogfield.Details(api_response % 8)
+        first.format_api_calls()
+        self.assertEqual(vlogfield.Details.API_CACHE.misses, 1)
+        self.assertEqual(vlogfield.Details.API_CACHE.hits, 0)
+
+        # Polling repeats the same payload with a new id
+        second = vlogfield.Details(api_response % 9)
+        second.format_api_calls()
+        self.assertEqual(vlogfield.Details.API_CACHE.hits, 1)
+        self.assertEqual(str(first).replace("id: 8", "id: 9"), str(second))
+        self.assertEqual(vlogfield.Details.API_CACHE.hit_rate, 0.5)
+
+    def test_api_format_cache_request(self):
+        api_request = """Sending HTTP POST request to server_url: %s; {"params": {"asyncHandle": 5}, """ \
+                      """"method": "GetAsyncResult", "id": %d}."""
+        vlogfield.Details.API_CACHE.clear()
+
+        first = vlogfield.Details(api_request % ("https://10.10.10.10:443/json-rpc/10.0", 8))
+        first.format_api_calls()
+        second = vlogfield.Details(api_request % ("https://10.10.10.10:443/json-rpc/10.0", 9))
+        second.format_api_calls()
+        other_url = vlogfield.Details(api_request % ("https://10.10.10.11:443/json-rpc/10.0", 10))
+        other_url.format_api_calls()
+
+        self.assertEqual(vlogfield.Details.API_CACHE.hits, 1)
+        self.assertEqual(vlogfield.Details.API_CACHE.misses, 2)
+        self.assertIn("(id: 9)", str(second))
+        self.assertIn("10.10.10.11", str(other_url))
+
+    def test_api_format_cache_id_in_middle(self):
+        api_response = """JSON-RPC-POST response: {"result": {"status": "running"}, "id": 7, """ \
+                       """"jsonrpc": "2.0"}"""
+        api_request = """Sending HTTP POST request to server_url: https://10.10.10.10:443; """ \
+                      """{"method": "GetAsyncResult", "id": 3, "params": {"asyncHandle": 5}}."""
+        vlogfield.Details.API_CACHE.clear()
+
+        # The id can't be removed from the key, so each repeat keeps the id it was parsed with
+        for _ in range(2):
+            response = vlogfield.Details(api_response)
+            response.format_api_calls()
+            self.assertEqual(response.response_id, 7)
+            self.assertIn("id: 7", str(response))
+            request = vlogfield.Details(api_request)
+            request.format_api_calls()
+            self.assertEqual(request.request_id, 3)
+            self.assertEqual(request.request_method, "GetAsyncResult")
+        self.assertEqual(vlogfield.Details.API_CACHE.hits, 2)
+
     def test_correct_traceback_tokens(self):
         step_token = '  File "/home/http_utils.py", line 1078, in _call_cluster_api\n' \
                      '    check_json_rpc_response(json_response, retry_faults, method)'
@@ -0,0 +1,258 @@
+import contextlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from bin import vlogfield
+from bin import vlogline
+from bin.vformatter import VFormatter
+from bin.vmodes import ErrorContextFormatter
+from bin.vmodes import GrepFormatter
+from bin.vmodes import SummaryFormatter
+from bin.vmodes import _RawLog
+from bin.vutils import VLogType
+from bin.vutils import VPatterns
+
+SUITE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_test.log")
+
+
+def run_formatter(formatter, filepath=SUITE_LOG):
+    """Return the output of the formatter after passing each line of the file."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        with open(filepath) as f:
+            for line in f:
+                formatter.send(formatter.format(line))
+        formatter.complete()
+    return output.getvalue()
+
+
+class FormatterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        vlogline.Base.colorize(False)
+        vlogline.Base.condense_line(False)
+        vlogline.Base.format_api(False)
+        vlogline.Base.at2_format(False)
+        vlogfield.Datetime.at2_format(False)
+        VFormatter.display_summary(True)
+        VFormatter.display_log_types([t for t in VLogType if t != VLogType.DEBUG])
+
+    def tearDown(self):
+        VFormatter.display_summary(False)
+        VFormatter.display_log_types(list(VLogType))
+
+
+class TestSummaryFormatter(FormatterTestCase):
+
+    def test_summary_matches_full_format(self):
+        full_output = run_formatter(VFormatter(None))
+        summary_output = run_formatter(SummaryFormatter(None))
+        summary = full_output[full_output.index("Test Summary"):]
+        self.assertEqual(summary_output.strip(), summary.strip())
+
+    def test_summary_contents(self):
+        output = run_formatter(SummaryFormatter(None))
+        self.assertNotIn("Checking", output)
+        self.assertIn("Runtime: 0:00:02.250000", output)
+        self.assertIn("Status: Failed at 19:13:01.651000", output)
+        self.assertIn("ApiCallMethodException: DoesNotExist.", output)
+
+
+    def test_type_offsets(self):
+        # The log type follows the datetime of each timestamp format
+        datetime = re.compile(VPatterns.get_std_datetime() + " ")
+        for line in ("2017-10-30 19:13:32.208116 ERROR [tc:1] [MainProcess:MainThread] failed",
+                     "2017-10-30 19:13:32,208 ERROR [tc:1] failed"):
+            self.assertIn(datetime.match(line).end(), (SummaryFormatter.STD_TYPE_OFFSET,
+                                                       SummaryFormatter.AT2_TYPE_OFFSET))
+
+
+class TestErrorContextFormatter(FormatterTestCase):
+
+    def setUp(self):
+        super(TestErrorContextFormatter, self).setUp()
+        VFormatter.display_summary(False)
+
+    def test_context(self):
+        output = run_formatter(ErrorContextFormatter(None, before=2, after=2))
+        self.assertNotIn('"id": 12', output)
+        self.assertIn("19:13:01.351000 DEBUG", output)
+        self.assertIn('"id": 20', output)
+        self.assertIn("Something failed", output)
+        self.assertIn("ApiCallMethodException", output)
+        self.assertIn("Starting Step 2 for TcTest", output)
+        self.assertIn("Checking", output)
+        self.assertNotIn("Hmm", output)
+        self.assertNotIn(ErrorContextFormatter.GROUP_SEPARATOR, output.splitlines())
+
+    def test_separator(self):
+        lines = ["2017-10-30 19:13:00.%d51000 %s [tc:1] [MainProcess:MainThread] line %d\n"
+                 % (i, "ERROR" if i in (1, 7) else "INFO", i) for i in range(10)]
+        with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as f:
+            f.writelines(lines)
+        self.addCleanup(os.remove, f.name)
+        output = run_formatter(ErrorContextFormatter(None, before=1, after=1), f.name)
+        self.assertEqual([line.split()[-1] for line in output.splitlines() if line],
+                         ["0", "1", "2", "--", "6", "7", "8"])
+
+    def test_context_parsed_when_displayed(self):
+        lines = ["2017-10-30 19:13:00.%d51000 %s [tc:1] [MainProcess:MainThread] line %d\n"
+                 % (i, "ERROR" if i == 1 else "DEBUG", i) for i in range(6)]
+        with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as f:
+            f.writelines(lines)
+        self.addCleanup(os.remove, f.name)
+        formatter = ErrorContextFormatter(None, before=2, after=1)
+        output = run_formatter(formatter, f.name)
+        self.assertIn("DEBUG [tc:1] [MainProcess:MainThread] line 0", output)
+        self.assertIn("DEBUG [tc:1] [MainProcess:MainThread] line 2", output)
+        # Logs never displayed are only held raw
+        self.assertEqual([log.unf_str.split()[-1] for log in formatter._before], ["4", "5"])
+        self.assertTrue(all(isinstance(log, _RawLog) for log in formatter._before))
+
+
+class TestGrepFormatter(FormatterTestCase):
+
+    def setUp(self):
+        super(TestGrepFormatter, self).setUp()
+        VFormatter.display_summary(False)
+
+    def test_matches(self):
+        formatter = GrepFormatter(None, "Check|doing")
+        output = run_formatter(formatter).splitlines()
+        self.assertEqual(formatter.match_count, 2)
+        self.assertTrue(output[0].startswith("[TsSuite/TcTest/Step 2] "))
+        self.assertTrue(output[0].endswith("Checking"))
+        self.assertTrue(output[1].startswith("[TsSuite/TcOther/Step 1] "))
+        self.assertTrue(output[1].endswith("doing"))
+
+    def test_traceback_and_ignore_case(self):
+        output = run_formatter(GrepFormatter(None, "SOMETHING f", ignore_case=True))
+        self.assertIn("[TsSuite/TcTest/Step 1] ", output)
+        self.assertIn("ApiCallMethodException: DoesNotExist.", output)
+        # Only details are searched
+        self.assertEqual(run_formatter(GrepFormatter(None, "MainThread")), "")
+
+    def test_skipped_traceback(self):
+        lines = ["2017-10-30 19:13:00.151000 INFO [tc:1] [MainProcess:MainThread] needle\n",
+                 "2017-10-30 19:13:00.251000 ERROR [tc:2] [MainProcess:MainThread] other\n",
+                 "Traceback (most recent call last):\n",
+                 '  File "/home/test.py", line 10, in test\n',
+                 "    run()\n",
+                 "ValueError: needle\n",
+                 "2017-10-30 19:13:00.351000 INFO [tc:3] [MainProcess:MainThread] needle\n"]
+        with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as f:
+            f.writelines(lines)
+        self.addCleanup(os.remove, f.name)
+        output = run_formatter(GrepFormatter(None, "needle"), f.name)
+        self.assertEqual(output.splitlines(), [lines[0].rstrip(), lines[-1].rstrip()])
+
+    def test_skipped_traceback_before_header(self):
+        # The suite log up to the header of step 2, after a skipped log and its traceback
+        with open(SUITE_LOG) as f:
+            lines = f.readlines()[:29] + ["> needle printed by the test\n"]
+        with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as f:
+            f.writelines(lines)
+        self.addCleanup(os.remove, f.name)
+        output = run_formatter(GrepFormatter(None, "needle"), f.name)
+        self.assertEqual(output.splitlines(),
+                         ["[TsSuite/TcTest/Step 2] > needle printed by the test"])
+
+
+class TestTcLogs(FormatterTestCase):
+
+    def setUp(self):
+        super(TestTcLogs, self).setUp()
+        VFormatter.display_summary(False)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.tmp_dir, "suite_test.log")
+        shutil.copy(SUITE_LOG, self.log_file)
+
+    def tearDown(self):
+        super(TestTcLogs, self).tearDown()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_split_matches_parse(self):
+        filepaths = VFormatter(None).split_log(self.log_file, max_open_files=1)
+        tc_dir = os.path.join(self.tmp_dir, "tc_logs")
+        self.assertEqual([os.path.basename(path) for path in filepaths], [
+            "TcTest.log", "TcOther.log",
+            "TcTest_Step-1.log", "TcTest_Step-2.log", "TcOther_Step-1.log"])
+        split_logs = {}
+        for path in filepaths:
+            with open(path) as f:
+                split_logs[os.path.basename(path)] = f.read()
+        shutil.rmtree(tc_dir)
+
+        tc_file = VFormatter(None).parse_test_case(self.log_file, tc_name="TcTest")
+        step_file = VFormatter(None).parse_step(tc_file, 2)
+        with open(tc_file) as f:
+            self.assertEqual(f.read(), split_logs["TcTest.log"])
+        with open(step_file) as f:
+            self.assertEqual(f.read(), split_logs["TcTest_Step-2.log"])
+        self.assertNotIn("Final Report", split_logs["TcOther.log"])
+        self.assertIn("doing", split_logs["TcOther_Step-1.log"])
+
+    def test_split_used_by_parse(self):
+        formatter = VFormatter(None)
+        filepaths = formatter.split_log(self.log_file)
+        tc_file = formatter.parse_test_case(self.log_file, tc_name="TcOther")
+        self.assertIn(tc_file, filepaths)
+        self.assertIn(formatter.parse_step(tc_file, 1), filepaths)
+        self.assertEqual(sorted(os.listdir(os.path.dirname(tc_file))), sorted(
+            [".manifest.json"] + [os.path.basename(path) for path in filepaths]))
+
+    def test_extract_streamed(self):
+        lines = list(VFormatter(None).extract_logs(self.log_file, tc_num=0, step_num=2))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, "tc_logs")))
+        tc_file = VFormatter(None).parse_test_case(self.log_file, tc_num=0)
+        with open(VFormatter(None).parse_step(tc_file, 2)) as f:
+            self.assertEqual(lines, f.readlines())
+
+    def test_extract_cached(self):
+        step_file = VFormatter(None).split_log(self.log_file)[-1]
+        with open(step_file, "a") as f:
+            f.write("cached\n")
+        lines = list(VFormatter(None).extract_logs(self.log_file, tc_name="TcOther", step_num=1))
+        self.assertEqual(lines[-1], "cached\n")
+
+
+class TestBoundedMemory(FormatterTestCase):
+
+    def tearDown(self):
+        super(TestBoundedMemory, self).tearDown()
+        VFormatter.max_stored_logs(0)
+        VFormatter.max_summary_headers(0)
+
+    def test_max_stored_logs(self):
+        VFormatter.max_stored_logs(10)
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        log_file = os.path.join(tmp_dir, "unterminated.log")
+        with open(log_file, "w") as f:
+            f.write("2017-10-30 19:13:00.000000 ERROR [tc:1] [MainProcess:MainThread] Failed\n")
+            f.write("Traceback (most recent call last):\n")
+            for i in range(50):
+                f.write('  File "test.py", line %d, in test\n' % i)
+            f.write("2017-10-30 19:13:01.000000 INFO [tc:2] [MainProcess:MainThread] Done\n")
+
+        formatter = VFormatter(None)
+        output = run_formatter(formatter, log_file)
+        self.assertLessEqual(len(formatter.stored_logs), 10)
+        self.assertIn('  File "test.py", line 49, in test', output)
+        self.assertIn("Done", output)
+
+    def test_max_summary_headers(self):
+        output = run_formatter(VFormatter(None))
+        VFormatter.max_summary_headers(2)
+        formatter = VFormatter(None)
+        self.assertEqual(run_formatter(formatter), output)
+        # Headers still in progress are kept: the root, suite, test case, step and a new header
+        self.assertLessEqual(len(formatter._hm._header_tree), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from bin import vlogline
+from bin.lollygag_logger import LollygagLogger
+from bin.vformatter import VFormatter
+from bin.vmonitor import MetricsExporter
+from bin.vmonitor import StallWatchdog
+
+SUITE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_test.log")
+
+
+class TestMetricsExporter(unittest.TestCase):
+
+    def setUp(self):
+        vlogline.Base.colorize(False)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.metrics_file = os.path.join(self.tmp_dir, "suite.prom")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def read_metrics(self):
+        metrics = {}
+        with open(self.metrics_file) as f:
+            for line in f:
+                if not line.startswith("#"):
+                    name, value = line.rsplit(" ", 1)
+                    metrics[name] = float(value)
+        return metrics
+
+    def test_export(self):
+        exporter = MetricsExporter(self.metrics_file, run='Ts"Suite', interval=0.01)
+        with open(SUITE_LOG) as f, contextlib.redirect_stdout(io.StringIO()):
+            logger = LollygagLogger(f, VFormatter(None))
+            exporter.install(logger)
+            exporter.start()
+            self.assertEqual(self.read_metrics()['vlogger_complete{run="Ts\\"Suite"}'], 0)
+            try:
+                logger.run()
+            finally:
+                exporter.stop()
+
+        with open(SUITE_LOG) as f:
+            line_count = sum(1 for _ in f)
+        metrics = self.read_metrics()
+        self.assertEqual(os.listdir(self.tmp_dir), ["suite.prom"])
+        self.assertEqual(metrics['vlogger_lines_total{run="Ts\\"Suite"}'], line_count)
+        self.assertEqual(metrics['vlogger_type_lines_total{run="Ts\\"Suite",type="step_h"}'], 3)
+        self.assertEqual(metrics['vlogger_errors_total{run="Ts\\"Suite"}'], 1)
+        self.assertEqual(metrics['vlogger_tracebacks_total{run="Ts\\"Suite"}'], 1)
+        self.assertEqual(metrics['vlogger_queue_depth{run="Ts\\"Suite"}'], 0)
+        self.assertEqual(metrics['vlogger_complete{run="Ts\\"Suite"}'], 1)
+        self.assertIn('vlogger_current_header_info{run="Ts\\"Suite",general="Final Report",'
+                      'suite="",test_case="",test_case_number="",step=""}', metrics)
+
+
+class TestStallWatchdog(unittest.TestCase):
+
+    def setUp(self):
+        vlogline.Base.colorize(False)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_stall(self):
+        report_file = os.path.join(self.tmp_dir, "stalls.log")
+        hook_file = os.path.join(self.tmp_dir, "hook.log")
+        output = io.StringIO()
+        watchdog = StallWatchdog(0.2, report_file=report_file, output=output,
+                                 hook='echo "$VLOGGER_STALL_HEADER" > ' + hook_file)
+        reported = threading.Event()
+        watchdog.report = self.wrap_report(watchdog.report, reported)
+
+        def stalled_lines():
+            with open(SUITE_LOG) as f:
+                lines = f.readlines()
+            for line in lines[:30]:  # Within step 2 of TcTest
+                yield line
+            reported.wait(5)
+            for line in lines[30:]:
+                yield line
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            logger = LollygagLogger(stalled_lines(), VFormatter(None))
+            watchdog.install(logger)
+            watchdog.start()
+            try:
+                logger.run()
+            finally:
+                watchdog.stop()
+
+        self.assertEqual(watchdog.stall_count, 1)
+        report = output.getvalue()
+        self.assertTrue(report.startswith("Stalled: no log line read for 0:00:00\n"))
+        self.assertIn("  Running: TsSuite/TcTest/Step 2 for 0:00:00\n", report)
+        with open(report_file) as f:
+            self.assertEqual(f.read(), report)
+        with open(hook_file) as f:
+            self.assertEqual(f.read(), "TsSuite/TcTest/Step 2\n")
+
+    @staticmethod
+    def wrap_report(func, reported):
+        def wrapper(stalled):
+            func(stalled)
+            reported.set()
+        return wrapper
@@ -0,0 +1,88 @@
+import io
+import os
+import re
+import unittest
+
+from bin import vlogline
+from bin.vformatter import VFormatter
+from bin.vmultiplex import run_suites
+from bin.vmultiplex import suite_name
+from bin.vutils import VLogType
+
+SUITE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_test.log")
+
+
+class TestRunSuites(unittest.TestCase):
+
+    def setUp(self):
+        vlogline.Base.colorize(False)
+        vlogline.Base.condense_line(False)
+        VFormatter.display_summary(True)
+        VFormatter.display_log_types([t for t in VLogType if t != VLogType.DEBUG])
+
+    def tearDown(self):
+        VFormatter.display_summary(False)
+        VFormatter.display_log_types(list(VLogType))
+
+    def capture(self, suite):
+        with open(SUITE_LOG) as f:
+            lines = f.readlines()
+        if suite.endswith("TsOther"):
+            return iter([line.replace("TsSuite", "TsOther") for line in lines])
+        return iter(lines)
+
+    def test_run_suites(self):
+        output = io.StringIO()
+        results = run_suites(["suites/TsSuite", "suites.TsOther"], None, self.capture, output)
+        output = output.getvalue()
+
+        body, summaries = output.split("\nTsSuite\nTest Summary", 1)
+        lines = body.splitlines()
+        self.assertTrue(all(re.match(r"\[(TsSuite|TsOther)\] ", line) for line in lines))
+        self.assertEqual(len([line for line in lines if line.startswith("[TsSuite]")]),
+                         len([line for line in lines if line.startswith("[TsOther]")]))
+        # Lines of a traceback are written together
+        traceback = [i for i, line in enumerate(lines) if "Traceback" in line][0]
+        self.assertEqual(lines[traceback + 1][:9], lines[traceback][:9])
+
+        self.assertIn("\nTsOther\nTest Summary", summaries)
+        self.assertIn("Combined Summary\n  2 suites: 2 Failed\n  TsOther: Failed", summaries)
+        self.assertEqual(sorted(results), ["suites.TsOther", "suites/TsSuite"])
+        self.assertEqual(results["suites/TsSuite"].records[0]["status"], "Failed")
+
+    def test_format_error(self):
+        def format_other(unf_str):
+            raise ValueError("bad line")
+
+        def capture(suite):
+            return self.capture(suite) if suite.endswith("TsSuite") else iter(["line\n"] * 50000)
+
+        output = io.StringIO()
+        original = VFormatter.format
+        VFormatter.format = lambda formatter, unf_str: (
+            format_other(unf_str) if formatter._prefix.startswith("[TsOther")
+            else original(formatter, unf_str))
+        self.addCleanup(setattr, VFormatter, "format", original)
+        results = run_suites(["suites/TsSuite", "suites.TsOther"], None, capture, output)
+
+        self.assertEqual(results["suites.TsOther"].error, "ValueError: bad line")
+        self.assertIsNone(results["suites/TsSuite"].error)
+        self.assertIn("TsOther: Error: ValueError: bad line", output.getvalue())
+
+    def test_read_error(self):
+        def capture(suite):
+            if suite.endswith("TsSuite"):
+                return self.capture(suite)
+            return (line if i < 5 else 1 / 0 for i, line in enumerate(self.capture(suite)))
+
+        results = run_suites(["suites/TsSuite", "suites.TsOther"], None, capture, io.StringIO())
+        self.assertEqual(results["suites.TsOther"].error, "ZeroDivisionError: division by zero")
+        self.assertIsNone(results["suites/TsSuite"].error)
+
+    def test_suite_name(self):
+        self.assertEqual(suite_name("suites/TsSuite"), "TsSuite")
+        self.assertEqual(suite_name("suites.sub.TsSuite"), "TsSuite")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import contextlib
+import io
+import os
+import unittest
+
+from bin import vlogline
+from bin.lollygag_logger import LollygagLogger
+from bin.vformatter import VFormatter
+from bin.vprofile import MemoryReport
+from bin.vprofile import STAGES
+from bin.vprofile import StageProfiler
+from bin.vutils import VLogType
+
+SUITE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_test.log")
+
+
+class TestStageProfiler(unittest.TestCase):
+
+    def setUp(self):
+        vlogline.Base.colorize(False)
+        VFormatter.display_summary(True)
+
+    def tearDown(self):
+        VFormatter.display_summary(False)
+
+    def run_logger(self, profiler=None):
+        output = io.StringIO()
+        with open(SUITE_LOG) as f, contextlib.redirect_stdout(output):
+            logger = LollygagLogger(f, VFormatter(None))
+            if profiler:
+                profiler.install(logger)
+            logger.run()
+        return output.getvalue()
+
+    def test_profile(self):
+        profiler = StageProfiler()
+        output = self.run_logger(profiler)
+        self.assertEqual(output, self.run_logger())
+
+        with open(SUITE_LOG) as f:
+            line_count = sum(1 for _ in f)
+        self.assertEqual(profiler.line_count, line_count)
+        self.assertEqual(sum(profiler.type_lines.values()), line_count)
+        self.assertEqual(profiler.calls["queue_wait"], line_count + 1)  # Completed signal
+        self.assertEqual(profiler.calls["complete"], 1)
+        self.assertEqual(profiler.type_logs[VLogType.STEP_H.name], 3)
+        self.assertEqual(profiler.type_logs[VLogType.TRACEBACK.name], 1)
+        self.assertGreater(profiler.read_time, 0)
+
+        report = profiler.generate_report()
+        self.assertIn("{} lines".format(line_count), report)
+        for label in STAGES.values():
+            self.assertIn(label, report)
+
+
+class TestMemoryReport(unittest.TestCase):
+
+    def test_report(self):
+        report = MemoryReport(limit=3)
+        report.start()
+        with open(SUITE_LOG) as f, contextlib.redirect_stdout(io.StringIO()):
+            LollygagLogger(f, VFormatter(None)).run()
+        output = report.generate_report().splitlines()
+        self.assertTrue(output[1].startswith("  Traced:"))
+        self.assertEqual(output[3], "  Top 3 allocators")
+        self.assertEqual(len(output), 8)
+        self.assertIn(".py:", output[-1])
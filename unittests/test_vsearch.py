@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from bin import vlogfield
+from bin import vlogline
+from bin.vsearch import SearchIndex
+from bin.vutils import VLogType
+
+SUITE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_test.log")
+COLOR_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "color_test.log")
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        vlogline.Base.colorize(False)
+        vlogline.Base.at2_format(False)
+        vlogfield.Datetime.at2_format(False)
+        self.log_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.log_dir, "sub"))
+        shutil.copy(SUITE_LOG, os.path.join(self.log_dir, "suite.log"))
+        self.index = SearchIndex(self.log_dir)
+        self.assertEqual(self.index.update(), (1, 0))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.log_dir)
+
+    def test_search_exception(self):
+        hits = self.index.search("ApiCallMethodException")
+        self.assertEqual(len(hits), 1)
+        hit = hits[0]
+        self.assertEqual(hit.path, "suite.log")
+        self.assertEqual(hit.log_type, VLogType.ERROR)
+        self.assertEqual(hit.context, "TsSuite/TcTest/Step 1")
+        lines = self.index.read_hit(hit)
+        self.assertIn("Something failed", lines[0])
+        self.assertTrue(lines[-1].startswith("ApiCallMethodException: "))
+
+    def test_search_module_and_details(self):
+        self.assertEqual(len(self.index.search("res.core")), 8)
+        hits = self.index.search("tc2 doing")
+        self.assertEqual([hit.context for hit in hits], ["TsSuite/TcOther/Step 1"])
+        self.assertEqual(self.index.search("NoSuchTerm"), [])
+        self.assertEqual(len(self.index.search("res.core", limit=3)), 3)
+
+    def test_incremental_update(self):
+        self.assertEqual(self.index.update(), (0, 0))
+        # Formatted logs aren't indexed
+        shutil.copy(SUITE_LOG, os.path.join(self.log_dir, "fmt_suite.log"))
+        self.assertEqual(self.index.update(), (0, 0))
+
+        shutil.copy(COLOR_LOG, os.path.join(self.log_dir, "sub", "color.log"))
+        self.assertEqual(self.index.update(), (1, 0))
+        paths = set(hit.path for hit in self.index.search("ApiCallMethodException"))
+        self.assertEqual(paths, set(["suite.log", os.path.join("sub", "color.log")]))
+
+        os.remove(os.path.join(self.log_dir, "suite.log"))
+        self.assertEqual(self.index.update(), (0, 1))
+        paths = set(hit.path for hit in self.index.search("ApiCallMethodException"))
+        self.assertEqual(paths, set([os.path.join("sub", "color.log")]))
+
+    def test_changed_file(self):
+        with open(os.path.join(self.log_dir, "suite.log"), "a") as f:
+            f.write("2017-10-30 19:14:00.000000 INFO [appended:1] [MainProcess:MainThread] "
+                    "Appended\n")
+        # Hits of changed files are excluded until they're indexed again
+        self.assertEqual(self.index.search("ApiCallMethodException"), [])
+        self.assertEqual(self.index.update(), (1, 0))
+        self.assertEqual(len(self.index.search("ApiCallMethodException")), 1)
+        self.assertEqual(len(self.index.search("appended")), 1)
+
+    def test_batched_insert(self):
+        hits = self.index.search("res.core")
+        self.index.BATCH_SIZE = 3
+        os.utime(os.path.join(self.log_dir, "suite.log"), (0, 0))
+        self.assertEqual(self.index.update(), (1, 0))
+        self.assertEqual(self.index.search("res.core"), hits)
+
+    def test_failed_index_rolled_back(self):
+        shutil.copy(SUITE_LOG, os.path.join(self.log_dir, "sub", "other.log"))
+
+        def fail(*args):
+            raise ValueError("bad record")
+        self.index._parse_record = fail
+        with self.assertRaises(ValueError):
+            self.index.update()
+        self.assertFalse(self.index._conn.in_transaction)
+        self.assertEqual(set(hit.path for hit in self.index.search("ApiCallMethodException")),
+                         set(["suite.log"]))
+        del self.index._parse_record
+        self.assertEqual(self.index.update(), (1, 0))
@@ -0,0 +1,74 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from bin.vstartup import ImportTime
+from bin.vstartup import VLOGGER
+from bin.vstartup import parse_import_times
+from bin.vstartup import run_import_times
+
+SUITE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_test.log")
+
+# Max seconds of the fastest of several cold starts, well above the expected time so only
+# regressions such as a heavy module imported on startup fail
+HELP_BUDGET = 0.3
+FORMAT_BUDGET = 0.6
+
+
+class TestParseImportTimes(unittest.TestCase):
+
+    def test_parse_import_times(self):
+        output = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |   _signal",
+            "import time:       800 |       2644 |     shutil",
+            "import time:      1979 |      15818 | argparse",
+            "Traceback (most recent call last):",
+        ])
+        self.assertEqual(parse_import_times(output), [
+            ImportTime("_signal", 120, 120, 1),
+            ImportTime("shutil", 800, 2644, 2),
+            ImportTime("argparse", 1979, 15818, 0),
+        ])
+
+
+class TestStartup(unittest.TestCase):
+
+    def setUp(self):
+        # Cold start includes creating the config file
+        self.home = tempfile.mkdtemp()
+        self.env = dict(os.environ, HOME=self.home)
+
+    def tearDown(self):
+        shutil.rmtree(self.home)
+
+    def startup_time(self, argv, runs=3):
+        times = []
+        for _ in range(runs):
+            start = time.time()
+            subprocess.check_call([sys.executable, VLOGGER] + argv, env=self.env,
+                                  stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+            times.append(time.time() - start)
+        return min(times)
+
+    def test_help_budget(self):
+        self.assertLess(self.startup_time(["--help"]), HELP_BUDGET)
+
+    def test_format_budget(self):
+        self.assertLess(self.startup_time([SUITE_LOG]), FORMAT_BUDGET)
+
+    def test_help_imports(self):
+        modules = set(t.module for t in run_import_times(["--help"], env=self.env))
+        self.assertIn("argparse", modules)
+        for module in ["anytree", "colorama", "pprint", "bin.vformatter"]:
+            self.assertNotIn(module, modules)
+
+    def test_format_imports(self):
+        modules = set(t.module for t in run_import_times([SUITE_LOG], env=self.env))
+        self.assertIn("bin.vformatter", modules)
+        for module in ["pprint", "bin.vcache", "bin.vexport", "subprocess"]:
+            self.assertNotIn(module, modules)
@@ -1,7 +1,17 @@
+import os
+import re
+import tempfile
+import threading
 import unittest
+from collections import OrderedDict
 
+from bin.vutils import ApiMethodFilter
+from bin.vutils import LatencyHistogram
+from bin.vutils import LRUCache
 from bin.vutils import VLogType
 from bin.vutils import VPatterns
+from bin.vutils import WriterPool
+from bin.vutils import required_literals
 
 
 class TestGetType(unittest.TestCase):
@@ -78,5 +88,158 @@ class TestGetPatterns(unittest.TestCase):
             self.assertEqual(VPatterns.get_std_details(), details_pattern)
 
 
+class TestLRUCache(unittest.TestCase):
+
+    def test_eviction(self):
+        cache = LRUCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertNotIn("b", cache)
+        self.assertIn("a", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_hit_rate(self):
+        cache = LRUCache(max_size=2)
+        self.assertEqual(cache.hit_rate, 0.0)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("b")
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hit_rate, 0.5)
+
+    def test_resize(self):
+        cache = LRUCache(max_size=3)
+        for key in "abc":
+            cache.put(key, key)
+        cache.max_size = 1
+        self.assertEqual(len(cache), 1)
+        self.assertIn("c", cache)
+
+    def test_put_during_get(self):
+        cache = LRUCache(max_size=1)
+        cache.put("a", 1)
+        threads = []
+
+        class Entries(OrderedDict):
+            def __getitem__(self, key):
+                value = OrderedDict.__getitem__(self, key)
+                # Another thread evicts the key while it's being looked up
+                thread = threading.Thread(target=cache.put, args=("b", 2))
+                thread.start()
+                thread.join(0.1)
+                threads.append(thread)
+                return value
+
+        cache._entries = Entries(cache._entries)
+        self.assertEqual(cache.get("a"), 1)
+        threads[0].join()
+        cache._entries = OrderedDict(cache._entries)
+        self.assertEqual(cache.get("b"), 2)
+        self.assertNotIn("a", cache)
+
+
+class TestApiMethodFilter(unittest.TestCase):
+
+    REQUEST = "2017-10-30 19:13:32.208116 DEBUG [res.core:636] [MainProcess:MainThread] " \
+              "Sending HTTP POST request to server_url: https://10.10.10.10:443/json-rpc/10.0; " \
+              "{\"params\": {}, \"method\": \"%s\", \"id\": %d}."
+    REQUEST_2 = "2017-10-30 19:13:32.208116 DEBUG [res.core:636] [MainProcess:MainThread] " \
+                "JSON-RPC-POST: method=%s, url=https://10.10.10.10:443/json-rpc/10.0, id=%d"
+    RESPONSE = "2017-10-30 19:13:32.208116 DEBUG [res.core:640] [MainProcess:MainThread] " \
+               "JSON-RPC-POST response: {\"id\": %d, \"result\": {}}"
+
+    def test_include(self):
+        api_filter = ApiMethodFilter(include=["CreateVolume"])
+        self.assertFalse(api_filter.reject(self.REQUEST % ("CreateVolume", 1)))
+        self.assertTrue(api_filter.reject(self.REQUEST % ("CreateVolumeAccessGroup", 2)))
+        self.assertTrue(api_filter.reject(self.REQUEST_2 % ("ListVolumes", 3)))
+        self.assertFalse(api_filter.reject(self.RESPONSE % 1))
+        self.assertTrue(api_filter.reject(self.RESPONSE % 2))
+        self.assertTrue(api_filter.reject(self.RESPONSE % 3))
+        self.assertEqual(api_filter.rejected, 4)
+
+    def test_exclude(self):
+        api_filter = ApiMethodFilter(exclude=["GetAsyncResult"])
+        self.assertTrue(api_filter.reject(self.REQUEST % ("GetAsyncResult", 1)))
+        self.assertFalse(api_filter.reject(self.REQUEST % ("CreateVolume", 2)))
+        self.assertTrue(api_filter.reject(self.RESPONSE % 1))
+        self.assertFalse(api_filter.reject(self.RESPONSE % 2))
+
+    def test_id_position(self):
+        api_filter = ApiMethodFilter(exclude=["GetAsyncResult"])
+        request = "2017-10-30 19:13:32.208116 DEBUG [res.core:636] [MainProcess:MainThread] " \
+                  "Sending HTTP POST request to server_url: https://10.10.10.10:443; " \
+                  "{\"id\": %d, \"method\": \"%s\", \"params\": {}}."
+        response = "2017-10-30 19:13:32.208116 DEBUG [res.core:640] [MainProcess:MainThread] " \
+                   "JSON-RPC-POST response: {\"result\": {}, \"id\": %d, \"jsonrpc\": \"2.0\"}"
+        self.assertTrue(api_filter.reject(request % (1, "GetAsyncResult")))
+        self.assertFalse(api_filter.reject(request % (2, "CreateVolume")))
+        self.assertTrue(api_filter.reject(response % 1))
+        self.assertFalse(api_filter.reject(response % 2))
+        self.assertTrue(api_filter.reject((self.REQUEST % ("GetAsyncResult", 3)) + "\n"))
+        self.assertTrue(api_filter.reject(self.RESPONSE.replace("{\"id\": %d, ", "{")[:-1] +
+                                          ", \"id\": 3}\n"))
+
+    def test_non_api_log(self):
+        api_filter = ApiMethodFilter(include=["CreateVolume"])
+        line = "2017-10-30 19:13:32.208116 DEBUG [res.core:636] [MainProcess:MainThread] Waiting"
+        self.assertFalse(api_filter.reject(line))
+
+
+class TestRequiredLiterals(unittest.TestCase):
+
+    def test_literals(self):
+        self.assertEqual(required_literals("VolumeNotFound"), ["VolumeNotFound"])
+        self.assertEqual(required_literals("Volume(?:Not)?Found: \\d+"), ["Volume", "Found: "])
+        self.assertEqual(required_literals("(Create)Volume"), ["CreateVolume"])
+        self.assertEqual(required_literals("Create|Delete"), [])
+
+    def test_ignore_case(self):
+        self.assertEqual(required_literals("Volume", re.IGNORECASE), ["volume"])
+        self.assertEqual(required_literals("(?i)Volume"), ["volume"])
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for ms in range(1, 101):
+            histogram.add(ms / 1000.0)
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(histogram.max, 0.1)
+        self.assertAlmostEqual(histogram.percentile(50), 0.05, delta=0.0005)
+        self.assertAlmostEqual(histogram.percentile(95), 0.095, delta=0.001)
+        self.assertEqual(histogram.percentile(100), 0.1)
+
+    def test_empty(self):
+        histogram = LatencyHistogram()
+        self.assertEqual(histogram.percentile(99), 0.0)
+        self.assertEqual(histogram.mean, 0.0)
+
+
+class TestWriterPool(unittest.TestCase):
+
+    def test_max_open(self):
+        tmp_dir = tempfile.mkdtemp()
+        paths = [os.path.join(tmp_dir, "%d.log" % i) for i in range(3)]
+        with open(paths[0], "w") as f:
+            f.write("stale\n")
+        with WriterPool(max_open=2) as writers:
+            for i in range(4):
+                for path in paths:
+                    writers.write(path, "%d\n" % i)
+                self.assertLessEqual(len(writers._writers), 2)
+        self.assertEqual(writers.filepaths, paths)
+        for path in paths:
+            with open(path) as f:
+                self.assertEqual(f.read(), "0\n1\n2\n3\n")
+            os.remove(path)
+        os.rmdir(tmp_dir)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
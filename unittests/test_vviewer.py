@@ -0,0 +1,88 @@
+import os
+import unittest
+
+from bin import vlogfield
+from bin import vlogline
+from bin.vutils import VLogType
+from bin.vutils import iter_records
+from bin.vviewer import LogIndex
+from bin.vviewer import Viewer
+
+SUITE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_test.log")
+
+
+class TestLogIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = LogIndex(SUITE_LOG)
+        self.index.start()
+        self.index.join()
+
+    def test_records(self):
+        self.assertTrue(self.index.complete)
+        self.assertEqual(len(self.index), 23)
+        self.assertEqual(self.index.record_type(0), VLogType.SUITE_H)
+        self.assertEqual(self.index.record_type(13), VLogType.ERROR)
+        self.assertTrue(self.index.has_traceback(13))
+        with open(SUITE_LOG, "rb") as f:
+            lines = self.index.read_record(f, 13)
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[-1].startswith("ApiCallMethodException"))
+
+    def test_read_while_indexing(self):
+        index = LogIndex(SUITE_LOG)
+        with open(SUITE_LOG, "rb") as f, open(SUITE_LOG, "rb") as reader:
+            for record in iter_records(f):
+                index._add_record(record)
+                # The last record indexed so far is read whole
+                self.assertEqual([line.rstrip("\r\n") for line in
+                                  index.read_record(reader, len(index) - 1)], record.lines)
+
+    def test_header_records(self):
+        self.assertEqual(self.index.header_records(), [0, 2, 4, 14, 17, 19, 21])
+        self.assertEqual(self.index.header_records([VLogType.TEST_CASE_H]), [2, 17])
+
+
+class TestViewer(unittest.TestCase):
+
+    def setUp(self):
+        vlogline.Base.colorize(False)
+        vlogline.Base.condense_line(False)
+        vlogline.Base.format_api(False)
+        vlogline.Base.at2_format(False)
+        vlogfield.Datetime.at2_format(False)
+        self.viewer = Viewer(SUITE_LOG)
+        self.addCleanup(self.viewer.close)
+        self.viewer._index.build()
+
+    def rows(self, height):
+        return [row for row, _ in self.viewer.screen(height)]
+
+    def test_screen(self):
+        rows = self.rows(5)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1], "Test Suite: Starting Setup of TsSuite")
+        self.viewer.scroll(1)
+        self.assertEqual(self.rows(1), ["Test Suite: Starting Setup of TsSuite"])
+        self.viewer.scroll(-5)
+        self.assertTrue(self.rows(1)[0].startswith("="))
+
+    def test_jump_header(self):
+        self.viewer.jump_header([VLogType.TEST_CASE_H])
+        self.viewer.jump_header([VLogType.TEST_CASE_H])
+        self.assertEqual(self.rows(2)[1], "Test Case 1: Starting Test of TcOther")
+        self.viewer.jump_header(forward=False)
+        self.assertEqual(self.rows(2)[1], "Starting Step 2 for TcTest: Check it.")
+
+    def test_toggle_types(self):
+        self.viewer.jump_header([VLogType.STEP_H])
+        self.viewer.toggle_types([VLogType.DEBUG])
+        rows = self.rows(10)
+        self.assertIn("Something failed", rows[4])
+        self.assertTrue(rows[5].startswith("Traceback"))
+        self.viewer.toggle_types([VLogType.DEBUG])
+        self.assertIn("DEBUG", self.rows(10)[4])
+
+
+if __name__ == '__main__':
+    unittest.main()
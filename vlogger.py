@@ -5,17 +5,30 @@
 import argparse
 import os
 import re
-
-from bin.lollygag_logger import LollygagLogger
-from bin.vconfiginterface import VConfigInterface
-from bin.vformatter import VFormatter
+import sys
 
 FILE_PATTERN = "^(?:\w|-|/|\.)+\.log$"
 AT2_PATTERN = "^\d+$"
 SUITE_PATTERN = "^(?:\w|-|/|\.)*Ts(?:\w|-)+$"
 
 
-def args():
+def _method_list(value):
+    """Return the API methods of a comma separated list."""
+    return [method.strip() for method in value.split(",") if method.strip()]
+
+
+def _non_negative_int(value):
+    """Return the number of a command line argument that must be 0 or more."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        raise argparse.ArgumentTypeError("must be 0 or more: '{}'".format(value))
+    return number
+
+
+def parse_args(argv=None):
     """Args for vlogger."""
 
     # Descriptions for arg parse
@@ -25,39 +38,259 @@ def args():
                   "tool can format logs from the 'vl run' command, stored log file, or an at2 task " \
                   "step instance. When formatting logs from the 'vl run' command, the tool will " \
                   "execute the command directly and the output will be in real time."
-    log_source = "Log File (*.log) | AT2 Task Inst. Step ID | Suite Path (path.to.suite.Ts*)"
+    log_source = "Log File (*.log) | AT2 Task Inst. Step ID | Suite Path (path.to.suite.Ts*) " \
+                 "| Log Directory (with --batch, --index, --search or --clusters)"
     testcase_desc = "(tc_name|tc_number)[:step number] - List specified test case and optionally step"
     format_api_desc = "Display API calls"
+    api_methods_desc = "Only display API calls of the comma separated API methods. Implies -a."
+    api_exclude_desc = "Don't display API calls of the comma separated API methods. Implies -a."
     save_desc = "Store formatted logs to a file at a default location. " \
                 "The storage location can be specified in the .ini file, but " \
                 "defaults to ~/vl_artifacts."
+    api_stats_desc = "Store API call latency statistics by method as JSON in the given file. " \
+                     "Implies -a for log files and AT2 steps."
+    refresh_desc = "Fetch the logs of the AT2 step again even if they're cached in " \
+                   "<save_dir>/at2_logs."
+    summary_only_desc = "Only display the summary. Log lines not needed for the summary are skipped."
+    cache_tc_logs_desc = "Store the test case or step logs specified with -t in tc_logs/ " \
+                         "for later use instead of streaming them from the log."
+    output_format_desc = "Format of the output: formatted text (default) or ndjson, one JSON " \
+                         "object per log containing its parsed fields and enclosing headers."
+    ingest_desc = "Load the parsed logs into tables of the given SQLite database as a new run " \
+                  "instead of displaying them."
+    view_desc = "Open the log in an interactive viewer that only formats the logs on screen."
+    split_desc = "Split every test case and step of the log into separate files in tc_logs/ " \
+                 "and exit."
+    errors_desc = "Only display errors, critical logs and tracebacks along with the logs " \
+                  "before and after them, including logs of types not displayed."
+    grep_desc = "Only display the logs whose details match the regular expression, prefixed " \
+                "with the suite, test case and step they're within."
+    ignore_case_desc = "Match the --grep pattern regardless of case"
+    before_desc = "Number of logs displayed before each error with --errors (default: 5)"
+    after_desc = "Number of logs displayed after each error with --errors (default: 5)"
+    index_desc = "Index the log files within the log directory for --search. Only log files " \
+                 "added or changed since the last index are indexed."
+    search_desc = "Display the logs within the indexed log directory matching all of the " \
+                  "terms of the query, such as exception types, source modules or details."
+    batch_desc = "Format every log file within the log directory to a file next to it " \
+                 "prefixed with fmt_, then display a summary combining the headers of every log."
+    clusters_desc = "Group the tracebacks of every log file within the log directory by " \
+                    "exception type and frames, and report each group with its count, first " \
+                    "and last occurrence and example locations."
+    jobs_desc = "Number of processes used to process the logs of a log directory " \
+                "(default: number of CPUs)"
+    limit_desc = "Max number of logs displayed with --search (default: 100)"
+    daemon_desc = "Run a daemon that formats logs for vloggerc.py clients over a Unix socket, " \
+                  "avoiding the startup time of each vlogger.py run."
+    socket_desc = "Filepath of the Unix socket of the daemon (default: ~/.vlogger.sock)"
+    stats_desc = "Append run statistics such as the API format and AT2 log cache hit rates"
+    profile_desc = "Time each stage of formatting the log lines and the cost of each log type, " \
+                   "reported on stderr when complete."
+    mem_report_desc = "Trace the memory allocated while formatting the log lines and report " \
+                      "the top allocators and peak RSS on stderr when complete."
+    metrics_desc = "Keep a Prometheus textfile of the progress of the run up to date, such as " \
+                   "the lines processed by type, the current step and the seconds since the " \
+                   "last log line."
+    metrics_interval_desc = "Seconds between each update of the --metrics file (default: 10)"
+    stall_timeout_desc = "Report on stderr the header currently running when no log line has " \
+                         "been read for the number of seconds, such as a hung step of a live run."
+    stall_file_desc = "Also append the stall reports to the file"
+    stall_hook_desc = "Shell command run on each stall, with the report as its stdin and " \
+                      "VLOGGER_STALL_SECONDS and VLOGGER_STALL_HEADER set"
+    more_suites_desc = "More suites run at the same time as the first, their formatted logs " \
+                       "prefixed with the suite name and followed by a combined summary."
+    capture_desc = "How the output of a local VL run is captured: pty runs 'vl run' under a " \
+                   "pseudo-terminal so each line is formatted as soon as it's written, pipe " \
+                   "runs it through a pipe (default: pty)"
+    import_report_desc = "Run with the other arguments, discarding the output, and display the " \
+                         "modules imported on startup and how long each one took."
     epilog = "The configuration file (.ini) is located at ~/.vlogger.ini. " \
              "When executing a suite, only options specified in the .ini file are considered."
 
     # Argument setup and parsing
     parser = argparse.ArgumentParser(prog=program, description=description, epilog=epilog)
-    parser.add_argument("log_source", nargs=1, help=log_source)
+    parser.add_argument("log_source", nargs="?", help=log_source)
+    parser.add_argument("more_suites", nargs="*", metavar="suite", help=more_suites_desc)
     parser.add_argument("-t", "--testcase", action="store", dest="testcase", help=testcase_desc)
-    parser.add_argument("-a", "--api", action="store_true", dest="format_api", help=format_api_desc)
+    parser.add_argument("-a", "--api", action="store_true", dest="format_api",
+                        help=format_api_desc)
+    parser.add_argument("--api-methods", action="store", type=_method_list, dest="api_methods",
+                        metavar="METHODS", help=api_methods_desc)
+    parser.add_argument("--api-exclude", action="store", type=_method_list, dest="api_exclude",
+                        metavar="METHODS", help=api_exclude_desc)
+    parser.add_argument("--api-stats", action="store", dest="api_stats", metavar="FILE",
+                        help=api_stats_desc)
     parser.add_argument("-s", "--save", action="store_true", dest="save", help=save_desc)
-    return parser.parse_args()
+    parser.add_argument("--refresh", action="store_true", dest="refresh", help=refresh_desc)
+    parser.add_argument("--summary-only", action="store_true", dest="summary_only",
+                        help=summary_only_desc)
+    parser.add_argument("--cache-tc-logs", action="store_true", dest="cache_tc_logs",
+                        help=cache_tc_logs_desc)
+    parser.add_argument("--output-format", action="store", choices=["text", "ndjson"],
+                        default="text", dest="output_format", help=output_format_desc)
+    parser.add_argument("--ingest", action="store", dest="ingest", metavar="DB",
+                        help=ingest_desc)
+    parser.add_argument("--view", action="store_true", dest="view", help=view_desc)
+    parser.add_argument("--split", action="store_true", dest="split", help=split_desc)
+    parser.add_argument("-e", "--errors", action="store_true", dest="errors", help=errors_desc)
+    parser.add_argument("--grep", action="store", dest="grep", metavar="PATTERN",
+                        help=grep_desc)
+    parser.add_argument("-i", "--ignore-case", action="store_true", dest="ignore_case",
+                        help=ignore_case_desc)
+    parser.add_argument("-B", "--before", action="store", type=_non_negative_int, default=5, dest="before",
+                        metavar="N", help=before_desc)
+    parser.add_argument("-A", "--after", action="store", type=_non_negative_int, default=5, dest="after",
+                        metavar="N", help=after_desc)
+    parser.add_argument("--index", action="store_true", dest="index", help=index_desc)
+    parser.add_argument("--search", action="store", dest="search", metavar="QUERY",
+                        help=search_desc)
+    parser.add_argument("--batch", action="store_true", dest="batch", help=batch_desc)
+    parser.add_argument("--clusters", action="store_true", dest="clusters", help=clusters_desc)
+    parser.add_argument("-j", "--jobs", action="store", type=int, dest="jobs", metavar="N",
+                        help=jobs_desc)
+    parser.add_argument("--limit", action="store", type=int, default=100, dest="limit",
+                        metavar="N", help=limit_desc)
+    parser.add_argument("--daemon", action="store_true", dest="daemon", help=daemon_desc)
+    parser.add_argument("--socket", action="store", dest="socket", metavar="PATH",
+                        help=socket_desc)
+    parser.add_argument("--stats", action="store_true", dest="stats", help=stats_desc)
+    parser.add_argument("--profile", action="store_true", dest="profile", help=profile_desc)
+    parser.add_argument("--mem-report", action="store_true", dest="mem_report",
+                        help=mem_report_desc)
+    parser.add_argument("--metrics", action="store", dest="metrics", metavar="FILE",
+                        help=metrics_desc)
+    parser.add_argument("--metrics-interval", action="store", type=float, default=10.0,
+                        dest="metrics_interval", metavar="SECONDS", help=metrics_interval_desc)
+    parser.add_argument("--stall-timeout", action="store", type=float, dest="stall_timeout",
+                        metavar="SECONDS", help=stall_timeout_desc)
+    parser.add_argument("--stall-file", action="store", dest="stall_file", metavar="FILE",
+                        help=stall_file_desc)
+    parser.add_argument("--stall-hook", action="store", dest="stall_hook", metavar="COMMAND",
+                        help=stall_hook_desc)
+    parser.add_argument("--capture", action="store", choices=["pty", "pipe"], default="pty",
+                        dest="capture", help=capture_desc)
+    parser.add_argument("--import-report", action="store_true", dest="import_report",
+                        help=import_report_desc)
+    # Options can be given between the suites of a parallel run, such as TsA --stats TsB
+    args = parser.parse_intermixed_args(argv)
+    if not args.log_source and not (args.daemon or args.import_report):
+        parser.error("the following arguments are required: log_source")
+    return args
 
 
-if __name__ == '__main__':
+def main(argv=None, config_interface=None):
+    """Format the logs of the log source specified by the command line arguments.
+
+    :param list(str) argv: Command line arguments, ``sys.argv`` by default.
+    :param config_interface: Configuration already loaded, such as the one of the daemon.
+        Loaded from the config file if not given.
+    """
 
     # Variable Init ***********************************************************
 
-    args = args()
+    args = parse_args(argv)
+
+    # Import report ***********************************************************
+
+    if args.import_report:
+        from bin import vstartup
+        argv = sys.argv[1:] if argv is None else argv
+        print(vstartup.import_report([arg for arg in argv if arg != "--import-report"]))
+        exit(0)
+
+    # Modules are imported once the arguments are parsed, so --help doesn't wait for them
+    from bin.lollygag_logger import LollygagLogger
+    from bin.vconfiginterface import VConfigInterface
+    from bin.vformatter import VFormatter
 
     logger = None
-    config = VConfigInterface()
-    log_source = args.log_source[0]
+    config = config_interface or VConfigInterface()
+    log_source = args.log_source
     logfile = ""
+    at2_cache = None
+
+    # Daemon ******************************************************************
+
+    if args.daemon:
+        from bin import vdaemon
+        vdaemon.serve(main, socket_path=args.socket or vdaemon.DEFAULT_SOCKET,
+                      config_interface=config)
+        exit(0)
 
     savedfile = re.match(FILE_PATTERN, log_source)
     at2_instance = re.match(AT2_PATTERN, log_source)
     suite = re.match(SUITE_PATTERN, log_source)
 
+    # Log directory ***********************************************************
+    # - Index and search the log files within a directory
+
+    if os.path.isdir(log_source):
+        if not (args.batch or args.index or args.search or args.clusters):
+            print("A log directory requires --batch, --index, --search or --clusters.")
+            exit(1)
+
+        if args.batch:
+            from bin import vbatch
+            log_files = vbatch.batch_logs(log_source)
+            options = {"format_api": args.format_api, "api_methods": args.api_methods,
+                       "api_exclude": args.api_exclude}
+            results = {}
+            for i, (log_file, result) in enumerate(vbatch.map_logs(
+                    vbatch.format_log, log_files, processes=args.jobs,
+                    initializer=vbatch.init_worker, initargs=(options,)), 1):
+                log_name = os.path.relpath(log_file, log_source)
+                print("[{}/{}] {} -> {}".format(i, len(log_files), log_name,
+                                                result.error or result.output))
+                results[log_name] = result
+            summary = vbatch.BatchSummary()
+            for log_name in sorted(results):
+                summary.add(log_name, results[log_name])
+            print("\n" + summary.generate_summary())
+
+        if args.index:
+            from bin.vsearch import SearchIndex
+            with SearchIndex(log_source) as index:
+                indexed, removed = index.update(progress=lambda path: print("Indexing", path))
+            print("Indexed {} log files, removed {}".format(indexed, removed))
+        if args.search:
+            from bin.vsearch import search
+            count = search(log_source, args.search, config, limit=args.limit)
+            print("{} matching logs".format(count))
+        if args.clusters:
+            from bin.vfingerprint import cluster_logs
+            print(cluster_logs(log_source, processes=args.jobs).generate_report())
+        exit(0)
+
+    # Parallel suites *********************************************************
+    # - Run several suites at the same time, multiplexing their formatted logs
+
+    if args.more_suites:
+        suites = [log_source] + args.more_suites
+        if not all(re.match(SUITE_PATTERN, source) for source in suites):
+            print("Only suites can be run at the same time.")
+            exit(1)
+        # Options choosing the formatter, writing one output file or monitoring one logger
+        single_suite_options = [
+            ("--summary-only", args.summary_only), ("--grep", args.grep), ("-e", args.errors),
+            ("--ingest", args.ingest), ("--output-format", args.output_format != "text"),
+            ("-s", args.save), ("--api-stats", args.api_stats), ("--metrics", args.metrics),
+            ("--stall-timeout", args.stall_timeout), ("--profile", args.profile),
+            ("--mem-report", args.mem_report)]
+        used = [option for option, value in single_suite_options if value]
+        if used:
+            print("{} can only be used with a single suite.".format(", ".join(used)))
+            exit(1)
+        if args.stats:
+            config.display_statistics()
+        from bin import vcapture
+        from bin.vmultiplex import run_suites
+        try:
+            run_suites(suites, config,
+                       capture=lambda source: vcapture.capture_vl_run(source, args.capture))
+        except KeyboardInterrupt:
+            print("Keyboard Interrupt: Exiting Logger")
+        exit(0)
+
     # Log source **************************************************************
     # - Handle any log source specific operations
 
@@ -65,12 +298,25 @@ if __name__ == '__main__':
         logfile = log_source
 
     elif at2_instance:
-        from plugins import at2_task
-        logfile = at2_task.logs_from_at2(log_source)
+        from bin.vcache import AT2LogCache, HttpFetcher
+        at2_cache = AT2LogCache(os.path.join(config.get_save_dir(), "at2_logs"),
+                                max_size=config.get_at2_cache_size() * 1024 * 1024)
+        if config.get_at2_log_url():
+            fetch = HttpFetcher(config.get_at2_log_url())
+        else:
+            def fetch(step_id, filepath):
+                import shutil
+                from plugins import at2_task
+                shutil.copyfile(at2_task.logs_from_at2(step_id), filepath)
+        try:
+            logfile = at2_cache.get(log_source, fetch, refresh=args.refresh)
+        except Exception as e:
+            print("Failed to fetch the logs of AT2 step {}: {}".format(log_source, e))
+            exit(1)
 
     elif suite:
-        from plugins import vl_run
-        logfile = vl_run.execute_local_run(log_source)
+        from bin import vcapture
+        logfile = vcapture.capture_vl_run(log_source, backend=args.capture)
 
     else:
         print("Invalid log source.")
@@ -78,20 +324,40 @@ if __name__ == '__main__':
 
     # Test Cases **************************************************************
 
+    # Interactive viewer
+    if (savedfile or at2_instance) and args.view:
+        from bin.vviewer import view
+        view(logfile, config)
+        exit(0)
+
+    # Split all test cases and steps into separate files
+    if (savedfile or at2_instance) and args.split:
+        config.use_unformatted()
+        tmp_formatter = VFormatter(config)
+        filepaths = tmp_formatter.split_log(logfile)
+        print("Split {} test case and step logs into {}".format(
+            len(filepaths), os.path.join(os.path.dirname(logfile), "tc_logs")))
+        exit(0)
+
     # Display specific test cases and steps
+    log_lines = None
     if (savedfile or at2_instance) and args.testcase:
         config.use_unformatted()
         tmp_formatter = VFormatter(config)
         m = re.match("^(\d+|Tc\w*)(:(\d+))*$", args.testcase)
-        # Test case specified
-        if m.group(1):
-            if m.group(1).isdigit():
-                logfile = tmp_formatter.parse_test_case(logfile, tc_num=int(m.group(1)))
-            else:
-                logfile = tmp_formatter.parse_test_case(logfile, tc_name=m.group(1))
-        # Step specified
-        if m.group(3) and m.group(3).isdigit():
-            logfile = tmp_formatter.parse_step(logfile, step_num=int(m.group(3)))
+        tc_name = None if m.group(1).isdigit() else m.group(1)
+        tc_num = int(m.group(1)) if m.group(1).isdigit() else None
+        step_num = int(m.group(3)) if m.group(3) else None
+        extract_kwargs = dict(tc_name=tc_name, tc_num=tc_num, step_num=step_num,
+                              cache=args.cache_tc_logs)
+        log_lines = tmp_formatter.extract_logs(logfile, **extract_kwargs)
+        if args.save:
+            # Counted in a pass of its own for the progress bar, so the logs aren't held in memory
+            log_count = sum(1 for _ in VFormatter(config).extract_logs(logfile, **extract_kwargs))
+        # Name of the logs, used when saving the formatted logs
+        log_name = tc_name if tc_name else "Tc-%d" % tc_num
+        if step_num is not None:
+            log_name = "%s_Step-%d" % (log_name, step_num)
         config.load_config_file()
 
     # Additional Configuration ************************************************
@@ -102,28 +368,117 @@ if __name__ == '__main__':
             config.at2_format()
 
         if args.save:
-            save_filename = "fmt_{}".format(os.path.basename(logfile))
+            if log_lines is not None:
+                save_filename = "fmt_{}.log".format(log_name)
+                word_count = log_count
+            else:
+                save_filename = "fmt_{}".format(os.path.basename(logfile))
+                word_count = sum(1 for line in open(logfile))
             save_filepath = os.path.join(os.path.dirname(logfile), save_filename)
             print("Saving formatted logs to {}...".format(save_filepath))
             open(save_filepath, 'w').close()
-            word_count = sum(1 for line in open(logfile))
             config.save_file(save_filepath, word_count)
 
-        if args.format_api:
+        if args.format_api or args.api_methods or args.api_exclude or args.api_stats:
             config.format_api()
+            config.filter_api_methods(include=args.api_methods, exclude=args.api_exclude)
+
+    if args.api_stats:
+        config.api_statistics_file(args.api_stats)
+
+    if args.stats:
+        config.display_statistics()
+
+    if args.summary_only:
+        config.display_summary()
 
     # Execute vlogger *********************************************************
 
-    vl_console_output = VFormatter(config)
+    if args.ingest:
+        from bin.vexport import SqliteFormatter
+        config.format_api()
+        vl_console_output = SqliteFormatter(config, args.ingest, source=log_source)
+    elif args.output_format == "ndjson":
+        from bin.vexport import NdjsonFormatter
+        config.format_api()
+        vl_console_output = NdjsonFormatter(config)
+    elif args.summary_only:
+        from bin.vmodes import SummaryFormatter
+        vl_console_output = SummaryFormatter(config)
+    elif args.grep:
+        from bin.vmodes import GrepFormatter
+        vl_console_output = GrepFormatter(config, args.grep, ignore_case=args.ignore_case)
+    elif args.errors:
+        from bin.vmodes import ErrorContextFormatter
+        vl_console_output = ErrorContextFormatter(config, before=args.before, after=args.after)
+    else:
+        vl_console_output = VFormatter(config)
+
+    profiler = None
+    if args.profile:
+        from bin.vprofile import StageProfiler
+        profiler = StageProfiler()
+    mem_report = None
+    if args.mem_report:
+        from bin.vprofile import MemoryReport
+        mem_report = MemoryReport()
+        mem_report.start()
+    monitors = []
+    if args.metrics:
+        from bin.vmonitor import MetricsExporter
+        monitors.append(MetricsExporter(args.metrics, run=os.path.basename(log_source.rstrip("/")),
+                                        interval=args.metrics_interval))
+    if args.stall_timeout:
+        from bin.vmonitor import StallWatchdog
+        monitors.append(StallWatchdog(args.stall_timeout, report_file=args.stall_file,
+                                      hook=args.stall_hook))
+
     try:
         if suite:
-            logger = LollygagLogger(iter(logfile.stdout.readline, b''), vl_console_output)
-            logger.run()
+            logger = LollygagLogger(logfile, vl_console_output)
+            run_logger(logger, profiler, monitors)
+        elif log_lines is not None:
+            logger = LollygagLogger(log_lines, vl_console_output)
+            run_logger(logger, profiler, monitors)
         else:
             with open(logfile, "r") as logfile:
                 logger = LollygagLogger(logfile, vl_console_output)
-                logger.run()
+                run_logger(logger, profiler, monitors)
     except KeyboardInterrupt:
         logger.kill()
         print("Keyboard Interrupt: Exiting Logger")
         exit(0)
+
+    if profiler:
+        sys.stderr.write(profiler.generate_report() + "\n")
+    if mem_report:
+        sys.stderr.write(mem_report.generate_report() + "\n")
+
+    if at2_cache and args.stats:
+        print(at2_cache.generate_statistics())
+
+    if args.ingest:
+        print("Ingested {} records into {} as run {}".format(
+            vl_console_output.record_count, args.ingest, vl_console_output.run_id))
+
+
+def run_logger(logger, profiler=None, monitors=()):
+    """Run the ``LollygagLogger``, profiling it if a ``StageProfiler`` is given.
+
+    :param monitors: Monitors of the run from ``bin.vmonitor``, started with the run and
+        stopped once it's complete.
+    """
+    if profiler:
+        profiler.install(logger)
+    for monitor in monitors:
+        monitor.install(logger)
+        monitor.start()
+    try:
+        logger.run()
+    finally:
+        for monitor in monitors:
+            monitor.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""Thin client formatting logs with a running ``vlogger.py --daemon``.
+
+Takes the same arguments as vlogger.py. The arguments are sent to the daemon, which formats
+the logs and streams the output back. If no daemon is running, or the interactive viewer is
+requested, vlogger.py is run directly instead.
+"""
+
+import json
+import os
+import socket
+import struct
+import sys
+
+SOCKET_ENV = "VLOGGER_SOCKET"
+DEFAULT_SOCKET = os.path.join(os.path.expanduser("~"), ".vlogger.sock")
+FRAME_HEADER = struct.Struct(">cI")
+
+
+def run_locally(argv):
+    """Replace the process with vlogger.py run with the arguments."""
+    vlogger = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vlogger.py")
+    os.execv(sys.executable, [sys.executable, vlogger] + argv)
+
+
+def main(argv):
+    if "--view" in argv or "--daemon" in argv:
+        run_locally(argv)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(os.environ.get(SOCKET_ENV, DEFAULT_SOCKET))
+    except (IOError, OSError):
+        run_locally(argv)
+
+    try:
+        columns = os.get_terminal_size(sys.stdout.fileno()).columns
+    except (AttributeError, ValueError, OSError):
+        columns = 0
+    request = {"argv": argv, "cwd": os.getcwd(), "columns": columns}
+    sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+
+    rfile = sock.makefile("rb")
+    outputs = {b"o": sys.stdout.buffer, b"e": sys.stderr.buffer}
+    status = 1
+    try:
+        while True:
+            header = rfile.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                break
+            frame_type, length = FRAME_HEADER.unpack(header)
+            payload = rfile.read(length)
+            if frame_type == b"x":
+                status = int(payload)
+                break
+            outputs[frame_type].write(payload)
+            outputs[frame_type].flush()
+    except KeyboardInterrupt:
+        status = 130
+    finally:
+        sock.close()
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))